@@ -0,0 +1,210 @@
+# backend/app/admission.py
+# Control de admisión para los endpoints caros (login/registro, crear
+# comentario, crear pedido). Sin esto una ráfaga de logins (KDF lento) o de
+# comentarios satura el worker y degrada TODAS las rutas.
+# - Límite de concurrencia por grupo de rutas con una cola acotada: si la cola
+#   está llena, o la espera supera `wait`, -> 503. Nunca se encola sin límite.
+# - Token bucket por cliente (IP), opcional: por encima de la tasa -> 429.
+#   Viene DESACTIVADO: detrás de un NAT, un proxy sin TRUST_FORWARDED o la
+#   prueba de JMeter (50 hilos desde un mismo host) todos comparten IP y se
+#   cortarían logins legítimos. Activarlo sólo con la IP real del cliente.
+# Ambos con Retry-After. El estado es por worker de uvicorn.
+#
+# Variables de entorno (GRUPO = AUTH | COMENTARIOS | ORDERS):
+#   ADMISSION_ENABLED=1                 0 apaga todo el control de admisión
+#   ADMISSION_<GRUPO>_CONCURRENCY       handlers simultáneos del grupo
+#   ADMISSION_<GRUPO>_QUEUE             requests que pueden esperar turno
+#   ADMISSION_<GRUPO>_WAIT              segundos máximos de espera -> 503
+#   ADMISSION_<GRUPO>_RATE=0            tokens/s por IP; 0 = sin bucket
+#   ADMISSION_<GRUPO>_BURST             tamaño del bucket (por defecto ceil(RATE))
+#   ADMISSION_TRUST_FORWARDED=0         1: la IP sale de X-Forwarded-For
+#   ADMISSION_MAX_CLIENTS=10000         buckets en memoria por grupo
+# Ejemplo con buckets: ADMISSION_AUTH_RATE=5 ADMISSION_AUTH_BURST=20
+import asyncio
+import math
+import os
+import time
+from collections import deque
+from typing import Any
+
+from fastapi import HTTPException, Request
+
+from .cache import TTLCache
+from .metrics import Counter, Gauge, Histogram, registry
+
+ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "1") == "1"
+# Detrás de un proxy (nginx, Render...) la IP real viene en X-Forwarded-For
+TRUST_FORWARDED = os.getenv("ADMISSION_TRUST_FORWARDED", "0") == "1"
+MAX_CLIENTS = int(os.getenv("ADMISSION_MAX_CLIENTS", "10000"))  # buckets en memoria
+
+REJECTED = registry.register(Counter(
+    "admission_rejected_total", "Requests rechazadas por control de admisión", ("limiter", "reason"),
+))
+WAIT_SECONDS = registry.register(Histogram(
+    "admission_wait_seconds", "Espera en cola hasta obtener un turno", ("limiter",),
+    buckets=(0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+))
+
+
+def client_key(request: Request) -> str:
+    if TRUST_FORWARDED:
+        fwd = request.headers.get("x-forwarded-for")
+        if fwd:
+            return fwd.split(",", 1)[0].strip()
+    return request.client.host if request.client else "?"
+
+
+class Limiter:
+    """
+    Dependencia de FastAPI (con yield): ocupa un turno mientras corre el
+    handler. Uso: @router.post(..., dependencies=[Depends(limiters["auth"])]).
+    """
+
+    def __init__(
+        self,
+        name: str,
+        concurrency: int,
+        queue: int,
+        wait: float,
+        rate: float = 0.0,
+        burst: int = 0,
+    ):
+        self.name = name
+        self.concurrency = max(1, concurrency)
+        self.queue = max(0, queue)
+        self.wait = wait
+        self.rate = rate                    # tokens por segundo y cliente
+        self.burst = max(1, burst or math.ceil(rate))
+        self.in_flight = 0
+        self._waiters: deque[asyncio.Future] = deque()
+        self._buckets = TTLCache(maxsize=MAX_CLIENTS, ttl=self._bucket_ttl())
+
+    @classmethod
+    def from_env(cls, name: str, **defaults) -> "Limiter":
+        def env(key: str, cast):
+            return cast(os.getenv(f"ADMISSION_{name.upper()}_{key.upper()}", defaults[key]))
+
+        return cls(
+            name,
+            concurrency=env("concurrency", int),
+            queue=env("queue", int),
+            wait=env("wait", float),
+            rate=env("rate", float),
+            burst=env("burst", int),
+        )
+
+    def _bucket_ttl(self) -> float:
+        # un bucket sin uso durante lo que tarda en llenarse ya no aporta nada
+        return self.burst / self.rate if self.rate > 0 else 1.0
+
+    def _reject(self, status: int, reason: str, retry_after: float, detail: str):
+        REJECTED.inc((self.name, reason))
+        raise HTTPException(
+            status_code=status,
+            detail=detail,
+            headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+        )
+
+    # ----- token bucket por cliente -----
+    def take_token(self, key: str) -> None:
+        if self.rate <= 0:
+            return
+        now = time.monotonic()
+        tokens, last = self._buckets.get(key) or (float(self.burst), now)
+        tokens = min(float(self.burst), tokens + (now - last) * self.rate)
+        if tokens < 1.0:
+            self._buckets.set(key, (tokens, now))
+            self._reject(429, "rate", (1.0 - tokens) / self.rate, "Demasiadas solicitudes, intenta más tarde")
+        self._buckets.set(key, (tokens - 1.0, now))
+
+    # ----- concurrencia -----
+    async def acquire(self) -> None:
+        if self.in_flight < self.concurrency and not self._waiters:
+            self.in_flight += 1
+            return
+        if len(self._waiters) >= self.queue:
+            self._reject(503, "queue_full", self.wait, "Servidor ocupado, intenta de nuevo")
+        fut = asyncio.get_running_loop().create_future()
+        self._waiters.append(fut)
+        queued = time.perf_counter()
+        try:
+            # release() le pasa el turno directamente (in_flight no baja)
+            await asyncio.wait_for(fut, self.wait)
+        except asyncio.TimeoutError:
+            self._reject(503, "timeout", self.wait, "Servidor ocupado, intenta de nuevo")
+        except asyncio.CancelledError:
+            # el cliente se fue; si justo recibió el turno, se devuelve
+            if fut.done() and not fut.cancelled():
+                self.release()
+            raise
+        finally:
+            if fut in self._waiters:
+                self._waiters.remove(fut)
+            WAIT_SECONDS.observe(time.perf_counter() - queued, (self.name,))
+
+    def release(self) -> None:
+        while self._waiters:
+            fut = self._waiters.popleft()
+            if not fut.done():
+                fut.set_result(None)
+                return
+        self.in_flight -= 1
+
+    async def __call__(self, request: Request):
+        if not ADMISSION_ENABLED:
+            yield
+            return
+        self.take_token(client_key(request))
+        await self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def reset(self) -> None:
+        self.in_flight = 0
+        self._waiters.clear()
+        self._buckets.clear()
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "concurrency": self.concurrency,
+            "in_flight": self.in_flight,
+            "queued": len(self._waiters),
+            "queue": self.queue,
+            "wait_seconds": self.wait,
+            "rate": self.rate,
+            "burst": self.burst,
+            "clients": len(self._buckets),
+        }
+
+
+# Valores por defecto pensados para el perfil de JMeter (50 hilos desde un
+# host): el KDF ya tiene su propio tope (HASH_MAX_CONCURRENCY), aquí se corta
+# antes de que la cola crezca. Los buckets por IP van en 0 (ver arriba).
+limiters: dict[str, Limiter] = {
+    "auth": Limiter.from_env("auth", concurrency=8, queue=32, wait=2.0, rate=0.0, burst=20),
+    "comentarios": Limiter.from_env("comentarios", concurrency=16, queue=64, wait=1.0, rate=0.0, burst=10),
+    "orders": Limiter.from_env("orders", concurrency=16, queue=64, wait=2.0, rate=0.0, burst=10),
+}
+
+
+def reset() -> None:
+    for limiter in limiters.values():
+        limiter.reset()
+
+
+def stats() -> dict[str, Any]:
+    return {"enabled": ADMISSION_ENABLED, **{name: l.stats() for name, l in limiters.items()}}
+
+
+def _prometheus() -> list:
+    in_flight = Gauge("admission_in_flight", "Requests con turno en curso", ("limiter",))
+    queued = Gauge("admission_queue_depth", "Requests esperando turno", ("limiter",))
+    for name, l in limiters.items():
+        in_flight.set(l.in_flight, (name,))
+        queued.set(len(l._waiters), (name,))
+    return [in_flight, queued]
+
+
+registry.add_collector(_prometheus)
@@ -0,0 +1,182 @@
+# backend/app/analytics.py
+# Analítica de ventas para el panel admin (GET /api/admin/analytics).
+# - Las métricas salen de pipelines de agregación sobre `pedidos` por
+#   createdAt, igual que admin_list_orders (los pedidos legacy lo reciben en
+#   migrate_orders.py).
+# - Los días cerrados (anteriores a hoy en ANALYTICS_TZ) se materializan en
+#   `ventas_diarias`, un documento por día: un dashboard de N días lee N
+#   documentos + los pedidos de hoy, no todos los pedidos del rango.
+# - Sólo se agregan los días que faltan en el rollup; si cambia el estado de un
+#   pedido de un día cerrado se borra ese día (invalidate_day) y se recalcula
+#   en la siguiente lectura.
+# Los pedidos CANCELLED cuentan en pedidos_por_estado pero no en ingresos.
+import os
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Any, Optional
+from zoneinfo import ZoneInfo
+
+from pymongo import ReplaceOne
+
+ANALYTICS_TZ = os.getenv("ANALYTICS_TZ", "America/Lima")
+ROLLUP = "ventas_diarias"
+CANCELLED = "CANCELLED"
+
+_tz = ZoneInfo(ANALYTICS_TZ)
+
+
+def today() -> date:
+    return datetime.now(_tz).date()
+
+
+def day_start_utc(d: date) -> datetime:
+    """Medianoche local de `d` expresada en UTC (límite para createdAt)."""
+    return datetime.combine(d, time.min, tzinfo=_tz).astimezone(timezone.utc)
+
+
+def day_of(ts: datetime) -> date:
+    if ts.tzinfo is None:  # Motor devuelve naive en UTC
+        ts = ts.replace(tzinfo=timezone.utc)
+    return ts.astimezone(_tz).date()
+
+
+def _day_expr() -> dict[str, Any]:
+    return {"$dateToString": {"format": "%Y-%m-%d", "date": "$createdAt", "timezone": ANALYTICS_TZ}}
+
+
+def pipeline(desde: date, hasta: date) -> list[dict[str, Any]]:
+    """Agregados por día de [desde, hasta): estados/ingresos y productos vendidos."""
+    return [
+        {"$match": {"createdAt": {"$type": "date", "$gte": day_start_utc(desde), "$lt": day_start_utc(hasta)}}},
+        {"$facet": {
+            "estados": [
+                {"$group": {
+                    "_id": {"dia": _day_expr(), "status": {"$ifNull": ["$status", "CREATED"]}},
+                    "pedidos": {"$sum": 1},
+                    "revenue": {"$sum": "$total"},
+                }},
+            ],
+            "productos": [
+                {"$match": {"status": {"$ne": CANCELLED}}},
+                {"$unwind": "$items"},
+                {"$group": {
+                    "_id": {"dia": _day_expr(), "producto_id": "$items.producto_id"},
+                    "nombre": {"$last": "$items.nombre"},
+                    "qty": {"$sum": "$items.qty"},
+                    "revenue": {"$sum": "$items.subtotal"},
+                }},
+            ],
+        }},
+    ]
+
+
+def _empty_day(dia: str) -> dict[str, Any]:
+    return {"_id": dia, "revenue": 0.0, "pedidos": 0, "por_estado": {}, "productos": []}
+
+
+def days_from_facet(facet: dict[str, list], dias: list[str]) -> dict[str, dict[str, Any]]:
+    """Resultado del $facet -> un documento por día (también los días sin ventas)."""
+    out = {d: _empty_day(d) for d in dias}
+    for row in facet.get("estados", []):
+        day = out.setdefault(row["_id"]["dia"], _empty_day(row["_id"]["dia"]))
+        status = row["_id"]["status"]
+        day["por_estado"][status] = {"pedidos": row["pedidos"], "revenue": round(row["revenue"], 2)}
+        if status != CANCELLED:
+            day["revenue"] = round(day["revenue"] + row["revenue"], 2)
+            day["pedidos"] += row["pedidos"]
+    for row in facet.get("productos", []):
+        day = out.setdefault(row["_id"]["dia"], _empty_day(row["_id"]["dia"]))
+        day["productos"].append({
+            "producto_id": row["_id"]["producto_id"],
+            "nombre": row.get("nombre"),
+            "qty": row["qty"],
+            "revenue": round(row["revenue"], 2),
+        })
+    return out
+
+
+async def _aggregate_days(db, desde: date, hasta: date) -> dict[str, dict[str, Any]]:
+    dias = [(desde + timedelta(n)).isoformat() for n in range((hasta - desde).days)]
+    if not dias:
+        return {}
+    facet = await db.pedidos.aggregate(pipeline(desde, hasta)).to_list(length=1)
+    return days_from_facet(facet[0] if facet else {}, dias)
+
+
+async def refresh_rollup(db, desde: date, hasta: date) -> None:
+    """Materializa los días cerrados de [desde, hasta) que falten en el rollup."""
+    hasta = min(hasta, today())
+    if desde >= hasta:
+        return
+    ids = [(desde + timedelta(n)).isoformat() for n in range((hasta - desde).days)]
+    have = {d["_id"] async for d in db[ROLLUP].find({"_id": {"$in": ids}}, {"_id": 1})}
+    missing = [d for d in ids if d not in have]
+    if not missing:
+        return
+    # Una sola agregación cubre el hueco (de la primera a la última fecha faltante)
+    first, last = date.fromisoformat(missing[0]), date.fromisoformat(missing[-1])
+    days = await _aggregate_days(db, first, last + timedelta(1))
+    now = datetime.now(timezone.utc)
+    ops = [
+        ReplaceOne({"_id": d}, {**days[d], "calculadoAt": now}, upsert=True)
+        for d in missing
+    ]
+    await db[ROLLUP].bulk_write(ops, ordered=False)
+
+
+async def invalidate_day(db, created_at: Optional[datetime]) -> None:
+    """Un pedido de un día cerrado cambió: ese día se recalcula en la próxima lectura."""
+    if created_at is None:
+        return
+    d = day_of(created_at)
+    if d < today():
+        await db[ROLLUP].delete_one({"_id": d.isoformat()})
+
+
+def summarize(days: list[dict[str, Any]], top: int = 10) -> dict[str, Any]:
+    por_estado: dict[str, int] = defaultdict(int)
+    productos: dict[str, dict[str, Any]] = {}
+    revenue, pedidos = 0.0, 0
+    for day in days:
+        revenue += day["revenue"]
+        pedidos += day["pedidos"]
+        for status, v in day["por_estado"].items():
+            por_estado[status] += v["pedidos"]
+        for p in day["productos"]:
+            acc = productos.setdefault(p["producto_id"], {**p, "qty": 0, "revenue": 0.0})
+            acc["qty"] += p["qty"]
+            acc["revenue"] = round(acc["revenue"] + p["revenue"], 2)
+            acc["nombre"] = p.get("nombre") or acc.get("nombre")
+    ranked = list(productos.values())
+    return {
+        "revenue_por_dia": [{"dia": d["_id"], "revenue": d["revenue"], "pedidos": d["pedidos"]} for d in days],
+        "pedidos_por_estado": dict(por_estado),
+        "top_productos": {
+            "por_qty": sorted(ranked, key=lambda p: (-p["qty"], -p["revenue"]))[:top],
+            "por_revenue": sorted(ranked, key=lambda p: (-p["revenue"], -p["qty"]))[:top],
+        },
+        "revenue_total": round(revenue, 2),
+        "pedidos": pedidos,  # no cancelados
+        "ticket_promedio": round(revenue / pedidos, 2) if pedidos else None,
+    }
+
+
+async def sales_analytics(db, desde: date, hasta: date, top: int = 10) -> dict[str, Any]:
+    """Días cerrados desde el rollup + el día en curso (si entra en el rango) en vivo."""
+    await refresh_rollup(db, desde, hasta)
+    closed_end = min(hasta, today())
+    days: list[dict[str, Any]] = []
+    if desde < closed_end:
+        cur = db[ROLLUP].find(
+            {"_id": {"$gte": desde.isoformat(), "$lt": closed_end.isoformat()}}
+        ).sort("_id", 1)
+        days = await cur.to_list(length=None)
+    if desde <= today() < hasta:
+        live = await _aggregate_days(db, today(), today() + timedelta(1))
+        days.extend(live.values())
+    return {
+        "desde": desde.isoformat(),
+        "hasta": hasta.isoformat(),
+        "tz": ANALYTICS_TZ,
+        **summarize(days, top),
+    }
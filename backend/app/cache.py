@@ -0,0 +1,84 @@
+# backend/app/cache.py
+import os
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Hashable, Optional
+
+_MISSING = object()
+
+
+class TTLCache:
+    """
+    Cache LRU en memoria (por worker) con expiración por entrada.
+    - maxsize: número máximo de entradas; al superarlo se expulsa la menos usada.
+    - ttl: segundos de vida por defecto; `set(..., ttl=...)` permite uno propio.
+    - generation: sube en cada clear()/pop(). Quien llena la cache tras leer de
+      la base la captura antes de leer y la pasa a set(): si hubo una
+      invalidación entretanto, el valor ya es viejo y no se guarda.
+    """
+
+    def __init__(self, maxsize: int = 128, ttl: float = 60.0):
+        self.maxsize = max(1, int(maxsize))
+        self.ttl = float(ttl)
+        self._data: "OrderedDict[Hashable, tuple[float, Any]]" = OrderedDict()
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+        self.generation = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            item = self._data.get(key, _MISSING)
+            if item is _MISSING:
+                self.misses += 1
+                return default
+            expires, value = item
+            if expires <= time.monotonic():
+                del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(
+        self,
+        key: Hashable,
+        value: Any,
+        ttl: Optional[float] = None,
+        generation: Optional[int] = None,
+    ) -> bool:
+        """Guarda `value`. False si no se guardó (ttl <= 0 o generación vieja)."""
+        ttl = self.ttl if ttl is None else float(ttl)
+        if ttl <= 0:
+            return False
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return False
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+        return True
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            self.generation += 1
+            item = self._data.pop(key, _MISSING)
+        return default if item is _MISSING else item[1]
+
+    def clear(self) -> None:
+        with self._lock:
+            self.generation += 1
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+# Catálogo público: cambia pocas veces al día, se invalida en cada escritura admin.
+catalog_cache = TTLCache(
+    maxsize=int(os.getenv("CATALOG_CACHE_MAX", "64")),
+    ttl=float(os.getenv("CATALOG_CACHE_TTL", "60")),
+)
@@ -0,0 +1,71 @@
+# backend/app/conditional.py
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from hashlib import blake2b
+from typing import Optional
+
+from fastapi import Request, Response
+
+
+def make_etag(body: bytes) -> str:
+    """ETag fuerte calculado sobre los bytes exactos de la respuesta."""
+    return '"' + blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+def _utc(dt: datetime) -> datetime:
+    # Motor devuelve datetimes naive (en UTC)
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.astimezone(timezone.utc).replace(microsecond=0)
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    # If-None-Match usa comparación débil: se ignora el prefijo W/
+    if header.strip() == "*":
+        return True
+    tags = [t.strip().removeprefix("W/") for t in header.split(",")]
+    return etag in tags
+
+
+def _not_modified(request: Request, etag: str, last_modified: Optional[datetime]) -> bool:
+    inm = request.headers.get("if-none-match")
+    if inm is not None:
+        return _etag_matches(inm, etag)
+    ims = request.headers.get("if-modified-since")
+    if ims and last_modified is not None:
+        try:
+            since = parsedate_to_datetime(ims)
+        except (TypeError, ValueError):
+            return False
+        return _utc(last_modified) <= _utc(since)
+    return False
+
+
+def conditional_response(
+    request: Request,
+    body: bytes,
+    *,
+    etag: Optional[str] = None,
+    last_modified: Optional[datetime] = None,
+    private: bool = False,
+    max_age: Optional[int] = None,
+    media_type: str = "application/json",
+) -> Response:
+    """
+    Responde 304 si el cliente ya tiene esta representación (If-None-Match /
+    If-Modified-Since); si no, 200 con el cuerpo y sus validadores.
+    Sin `max_age` se envía no-cache: el navegador guarda la copia pero
+    siempre revalida.
+    """
+    etag = etag or make_etag(body)
+    freshness = "no-cache" if max_age is None else f"max-age={int(max_age)}"
+    headers = {
+        "ETag": etag,
+        "Cache-Control": ("private" if private else "public") + ", " + freshness,
+    }
+    if last_modified is not None:
+        headers["Last-Modified"] = format_datetime(_utc(last_modified), usegmt=True)
+
+    if _not_modified(request, etag, last_modified):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type=media_type, headers=headers)
@@ -0,0 +1,43 @@
+# backend/app/counters.py
+# Secuencias atómicas en la colección `counters` ({_id: nombre, seq: n}).
+# find_one_and_update con $inc es atómico en el servidor: dos requests
+# concurrentes nunca reciben el mismo número, sin importar cuántos workers haya.
+from datetime import datetime, timezone
+from typing import Optional
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from . import database
+
+ORDER_CODE_PREFIX = "SR"
+
+
+async def next_sequence(name: str) -> int:
+    for attempt in range(2):
+        try:
+            doc = await database.db.counters.find_one_and_update(
+                {"_id": name},
+                {"$inc": {"seq": 1}},
+                upsert=True,
+                return_document=ReturnDocument.AFTER,
+            )
+            return doc["seq"]
+        except DuplicateKeyError:
+            # Dos upserts simultáneos del primer número del contador: uno crea
+            # el documento y el otro choca con el _id; al reintentar, incrementa.
+            if attempt:
+                raise
+    raise AssertionError("unreachable")
+
+
+def order_counter(day: str) -> str:
+    """Nombre del contador de codes de un día (YYYYMMDD)."""
+    return f"pedidos:{day}"
+
+
+async def next_order_code(now: Optional[datetime] = None) -> str:
+    """SR-YYYYMMDD-000123: contador por día (UTC), creciente y sin colisiones."""
+    day = (now or datetime.now(timezone.utc)).strftime("%Y%m%d")
+    seq = await next_sequence(order_counter(day))
+    return f"{ORDER_CODE_PREFIX}-{day}-{seq:06d}"
@@ -1,7 +1,13 @@
 # backend/app/database.py
+import asyncio
 import os
+from typing import Any, Optional
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReturnDocument
 from bson import ObjectId
+from bson.codec_options import CodecOptions, TypeDecoder, TypeRegistry
+
+from . import mongo_metrics
 
 MONGODB_URI = os.getenv("MONGODB_URI") or os.getenv("MONGODB_DB")  # compat
 if not MONGODB_URI:
@@ -11,6 +17,33 @@ DB_NAME = os.getenv("MONGODB_DB", "sabor_real")
 client: AsyncIOMotorClient | None = None
 db = None
 
+# ===== Pool / cliente (uno por worker de uvicorn) =====
+# Sólo se pasan las opciones definidas: lo que no esté en el entorno queda con
+# el valor de la URI (o el default de pymongo). Para dimensionar el pool ver
+# GET /internal/metrics (espera de checkout, conexiones en uso).
+def _env(name: str) -> Optional[str]:
+    value = os.getenv(name, "").strip()
+    return value or None
+
+_POOL_ENV = {
+    "maxPoolSize": ("MONGO_MAX_POOL", int),
+    "minPoolSize": ("MONGO_MIN_POOL", int),
+    "maxIdleTimeMS": ("MONGO_MAX_IDLE_MS", int),
+    "waitQueueTimeoutMS": ("MONGO_WAIT_QUEUE_MS", int),
+    "compressors": ("MONGO_COMPRESSORS", str),         # "zstd,snappy,zlib"
+    "readPreference": ("MONGO_READ_PREFERENCE", str),  # primary | primaryPreferred | nearest ...
+    "w": ("MONGO_W", lambda v: int(v) if v.isdigit() else v),  # 1 | majority
+}
+MONGO_METRICS = os.getenv("MONGO_METRICS", "1") == "1"
+
+def client_options() -> dict[str, Any]:
+    opts: dict[str, Any] = {}
+    for option, (env, cast) in _POOL_ENV.items():
+        value = _env(env)
+        if value is not None:
+            opts[option] = cast(value)
+    return opts
+
 async def connect():
     global client, db
     client = AsyncIOMotorClient(
@@ -18,6 +51,8 @@ async def connect():
         uuidRepresentation="standard",
         serverSelectionTimeoutMS=20000,
         connectTimeoutMS=20000,
+        event_listeners=mongo_metrics.listeners() if MONGO_METRICS else [],
+        **client_options(),
     )
     try:
         db = client.get_default_database()  
@@ -26,6 +61,14 @@ async def connect():
     if db is None:
         db = client[DB_NAME]
 
+# Conexiones a abrir en el arranque (por defecto minPoolSize, o al menos una):
+# la primera request no paga DNS + TCP + TLS + handshake.
+MONGO_WARM_CONNECTIONS = int(os.getenv("MONGO_WARM_CONNECTIONS", os.getenv("MONGO_MIN_POOL") or "1"))
+
+async def warmup(connections: int = MONGO_WARM_CONNECTIONS) -> None:
+    """Pings concurrentes: cada uno toma su propia conexión del pool."""
+    await asyncio.gather(*(client.admin.command("ping") for _ in range(max(1, connections))))
+
 async def disconnect():
     if client:
         client.close()
@@ -39,4 +82,42 @@ def serialize_doc(doc: dict):
     return d
 
 async def serialize_many(cursor):
-    return [serialize_doc(doc) async for doc in cursor]
\ No newline at end of file
+    return [serialize_doc(doc) async for doc in cursor]
+
+
+# ===== Modo listado =====
+# El decodificador BSON entrega los ObjectId ya como str: los documentos salen
+# del cursor listos para el `shape` del router, sin dict(doc) ni pasadas extra.
+# Usar siempre con una proyección de los campos que van a la respuesta.
+class _ObjectIdAsStr(TypeDecoder):
+    bson_type = ObjectId
+
+    def transform_bson(self, value: ObjectId) -> str:
+        return str(value)
+
+LIST_CODEC_OPTIONS = CodecOptions(type_registry=TypeRegistry([_ObjectIdAsStr()]))
+
+def list_collection(name: str):
+    """`db[name]` para servir listados (ObjectId -> str en el codec)."""
+    return db.get_collection(name, codec_options=LIST_CODEC_OPTIONS)
+
+# ===== Mutaciones que devuelven el documento resultante =====
+# Evitan el find_one posterior a cada escritura (una ida a Mongo menos).
+async def insert_serialized(coll, doc: dict, serialize=serialize_doc) -> dict:
+    """insert_one completa doc["_id"]; el documento insertado ES la respuesta."""
+    await coll.insert_one(doc)
+    return serialize(doc)
+
+async def update_serialized(
+    coll,
+    filter: dict[str, Any],
+    update: dict[str, Any],
+    *,
+    projection: Optional[dict[str, Any]] = None,
+    serialize=serialize_doc,
+) -> Optional[dict]:
+    """find_one_and_update con la post-imagen; None si ningún documento coincide."""
+    doc = await coll.find_one_and_update(
+        filter, update, projection=projection, return_document=ReturnDocument.AFTER
+    )
+    return serialize(doc) if doc is not None else None
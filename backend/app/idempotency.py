@@ -0,0 +1,165 @@
+# backend/app/idempotency.py
+# Claves de idempotencia (cabecera Idempotency-Key) para POSTs que crean
+# recursos: un cliente con red inestable puede reintentar sin duplicar el
+# pedido ni volver a cotizar el carrito.
+# - La clave va con alcance por usuario y operación ("orders:<user>:<key>").
+# - Primera vez: se reclama la clave en `idempotency` (status "pending"), se
+#   ejecuta y se guarda la respuesta (status "done"). TTL por `expiresAt`.
+# - Repetición terminada: se devuelve la respuesta guardada (LRU en memoria
+#   -> 0 consultas; si no, un find_one por _id).
+# - Repetición concurrente: espera a la ejecución en curso (un Future en este
+#   worker; en otro worker, sondeo de la clave) hasta IDEMPOTENCY_WAIT -> 409.
+# - Misma clave con otro cuerpo -> 422.
+# - Si la ejecución falla se libera la clave: el reintento vuelve a ejecutar.
+import asyncio
+import hashlib
+import logging
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Optional
+
+from fastapi import HTTPException
+from fastapi.encoders import jsonable_encoder
+from pydantic import BaseModel
+from pymongo.errors import DuplicateKeyError, PyMongoError
+
+from . import database
+from .cache import TTLCache
+
+log = logging.getLogger(__name__)
+
+COLLECTION = "idempotency"
+IDEMPOTENCY_TTL = int(os.getenv("IDEMPOTENCY_TTL", "86400"))             # respuestas guardadas
+IDEMPOTENCY_PENDING_TTL = int(os.getenv("IDEMPOTENCY_PENDING_TTL", "120"))  # claves de un worker caído
+IDEMPOTENCY_WAIT = float(os.getenv("IDEMPOTENCY_WAIT", "10"))
+REPLAYED_HEADER = "Idempotent-Replayed"
+
+PENDING, DONE = "pending", "done"
+
+_done = TTLCache(
+    maxsize=int(os.getenv("IDEMPOTENCY_CACHE_MAX", "10000")),
+    ttl=IDEMPOTENCY_TTL,
+)
+_inflight: dict[str, asyncio.Future] = {}
+
+
+def scoped_key(scope: str, user_id: str, key: str) -> str:
+    return f"{scope}:{user_id}:{key}"
+
+
+def fingerprint(payload: BaseModel) -> str:
+    return hashlib.sha256(payload.model_dump_json().encode()).hexdigest()
+
+
+def _check(entry: dict[str, Any], fp: str) -> Any:
+    if entry["fingerprint"] != fp:
+        raise HTTPException(status_code=422, detail="Idempotency-Key ya usada con otra solicitud")
+    return entry["body"]
+
+
+def _busy(retry_after: int = 1) -> HTTPException:
+    return HTTPException(
+        status_code=409,
+        detail="Hay una solicitud en curso con la misma Idempotency-Key",
+        headers={"Retry-After": str(retry_after)},
+    )
+
+
+async def _wait_other_worker(coll, doc: dict[str, Any]) -> dict[str, Any]:
+    """Sondea una clave reclamada por otro worker hasta que termine."""
+    deadline = time.monotonic() + IDEMPOTENCY_WAIT
+    delay = 0.05
+    while doc["status"] == PENDING:
+        if time.monotonic() >= deadline:
+            raise _busy()
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, 0.5)
+        doc = await coll.find_one({"_id": doc["_id"]})
+        if doc is None:  # la ejecución original falló y liberó la clave
+            raise _busy()
+    return doc
+
+
+async def execute(key_id: str, fp: str, fn: Callable[[], Awaitable[Any]]) -> tuple[Any, bool]:
+    """Ejecuta `fn` una sola vez por clave. Devuelve (cuerpo JSON, repetida)."""
+    entry = _done.get(key_id)
+    if entry is not None:
+        return _check(entry, fp), True
+
+    fut = _inflight.get(key_id)
+    if fut is not None:
+        try:
+            entry = await asyncio.wait_for(asyncio.shield(fut), IDEMPOTENCY_WAIT)
+        except asyncio.TimeoutError:
+            raise _busy()
+        return _check(entry, fp), True
+
+    # Primera de este worker: las repeticiones concurrentes esperan este Future
+    fut = _inflight[key_id] = asyncio.get_running_loop().create_future()
+    try:
+        entry = await _claim(key_id, fp)
+        if entry is not None:  # otro worker ya la ejecutó
+            replayed = True
+        else:
+            replayed = False
+            try:
+                body = jsonable_encoder(await fn())
+            except BaseException:
+                await database.db[COLLECTION].delete_one({"_id": key_id, "status": PENDING})
+                raise
+            entry = {"fingerprint": fp, "body": body}
+        _done.set(key_id, entry)
+        fut.set_result(entry)
+    except BaseException as exc:
+        if isinstance(exc, Exception):
+            fut.set_exception(exc)
+            fut.exception()  # marcado como leído aunque nadie esté esperando
+        else:
+            fut.cancel()
+        raise
+    finally:
+        _inflight.pop(key_id, None)
+
+    if not replayed:
+        await _save(key_id, entry["body"])
+    return _check(entry, fp), replayed
+
+
+async def _claim(key_id: str, fp: str) -> Optional[dict[str, Any]]:
+    """Reclama la clave en Mongo. None si es nuestra; si no, la entrada terminada."""
+    coll = database.db[COLLECTION]
+    doc = await coll.find_one({"_id": key_id})
+    if doc is None:
+        now = datetime.now(timezone.utc)
+        try:
+            await coll.insert_one({
+                "_id": key_id,
+                "status": PENDING,
+                "fingerprint": fp,
+                "createdAt": now,
+                "expiresAt": now + timedelta(seconds=IDEMPOTENCY_PENDING_TTL),
+            })
+            return None
+        except DuplicateKeyError:  # otro worker la reclamó justo antes
+            doc = await coll.find_one({"_id": key_id}) or {"_id": key_id, "status": PENDING}
+    if doc.get("fingerprint", fp) != fp:
+        _check(doc, fp)
+    doc = await _wait_other_worker(coll, doc)
+    return {"fingerprint": doc["fingerprint"], "body": doc["body"]}
+
+
+async def _save(key_id: str, body: Any) -> None:
+    try:
+        await database.db[COLLECTION].update_one(
+            {"_id": key_id},
+            {"$set": {
+                "status": DONE,
+                "body": body,
+                "expiresAt": datetime.now(timezone.utc) + timedelta(seconds=IDEMPOTENCY_TTL),
+            }},
+        )
+    except PyMongoError:
+        # El recurso ya se creó: se responde igual. En este worker la repetición
+        # sale del LRU; en otro, verá la clave pendiente hasta que expire.
+        log.exception("No se pudo guardar la respuesta idempotente %s", key_id)
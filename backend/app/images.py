@@ -0,0 +1,158 @@
+# backend/app/images.py
+# Imágenes de productos y avatares.
+# - Almacén de blobs: al escribir, los data URL se decodifican y se guardan en
+#   GridFS (bucket "imagenes") direccionados por su sha256; el documento sólo
+#   guarda la referencia `/api/imagenes/{sha256}`, servida con cache inmutable.
+# - Legacy: documentos que aún tengan el data URL inline se listan con la
+#   referencia `/api/productos/{id}/imagen` (ver migrate_images.py).
+import base64
+import binascii
+import hashlib
+import os
+import re
+from typing import Optional
+
+from fastapi import HTTPException
+from gridfs.errors import NoFile
+from motor.motor_asyncio import AsyncIOMotorGridFSBucket
+
+from . import database
+
+IMAGE_BUCKET = "imagenes"
+IMAGE_MAX_BYTES = int(os.getenv("IMAGE_MAX_BYTES", str(1_000_000)))
+BLOB_PATH = "/api/imagenes/{digest}"
+PRODUCT_IMAGE_PATH = "/api/productos/{id}/imagen"
+
+_BLOB_REF_RGX = re.compile(r"/api/imagenes/([0-9a-f]{64})$")
+
+# Referencia a nuestra propia ruta (relativa o con host delante)
+_PRODUCT_REF_RGX = re.compile(r"/api/productos/[0-9a-fA-F]{24}/imagen$")
+
+# Expresión de agregación (válida en proyecciones de find): si imagenUrl es
+# un data URL lo reemplaza por la referencia; si no, lo deja tal cual.
+PRODUCT_IMAGE_REF_EXPR = {
+    "$cond": [
+        {"$eq": [{"$substrCP": [{"$ifNull": ["$imagenUrl", ""]}, 0, 5]}, "data:"]},
+        {"$concat": ["/api/productos/", {"$toString": "$_id"}, "/imagen"]},
+        "$imagenUrl",
+    ]
+}
+
+
+# Sólo formatos raster: un SVG (o HTML disfrazado) servido desde el origen de
+# la API ejecutaría scripts. Además del tipo declarado se comprueban los
+# magic bytes, y al servir se manda nosniff + CSP sandbox.
+ALLOWED_IMAGE_TYPES = ("image/png", "image/jpeg", "image/gif", "image/webp")
+IMAGE_SECURITY_HEADERS = {
+    "X-Content-Type-Options": "nosniff",
+    "Content-Security-Policy": "sandbox",
+}
+_MIME_ALIASES = {"image/jpg": "image/jpeg", "image/pjpeg": "image/jpeg"}
+
+
+def sniff_image_type(data: bytes) -> Optional[str]:
+    if data.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image/png"
+    if data.startswith(b"\xff\xd8\xff"):
+        return "image/jpeg"
+    if data[:6] in (b"GIF87a", b"GIF89a"):
+        return "image/gif"
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "image/webp"
+    return None
+
+
+def check_image(mime: str, data: bytes) -> str:
+    """Tipo normalizado si es un raster admitido y los bytes coinciden; si no, ValueError."""
+    mime = _MIME_ALIASES.get(mime.lower(), mime.lower())
+    if mime not in ALLOWED_IMAGE_TYPES:
+        raise ValueError("formato no admitido (png, jpeg, gif o webp)")
+    if sniff_image_type(data) != mime:
+        raise ValueError("el contenido no coincide con el tipo declarado")
+    return mime
+
+
+def is_data_url(value) -> bool:
+    return isinstance(value, str) and value.startswith("data:")
+
+
+def is_product_image_ref(value) -> bool:
+    return isinstance(value, str) and bool(_PRODUCT_REF_RGX.search(value))
+
+
+def product_image_ref(product_id, image_url: Optional[str]) -> Optional[str]:
+    """Versión en Python de PRODUCT_IMAGE_REF_EXPR (para docs ya leídos)."""
+    if is_data_url(image_url):
+        return PRODUCT_IMAGE_PATH.format(id=product_id)
+    return image_url
+
+
+def parse_data_url(value: str) -> tuple[str, bytes]:
+    """'data:image/png;base64,....' -> ('image/png', bytes). ValueError si no es válido."""
+    if not is_data_url(value) or "," not in value:
+        raise ValueError("data URL inválido")
+    header, payload = value[5:].split(",", 1)
+    parts = header.split(";")
+    mime = parts[0] or "application/octet-stream"
+    if "base64" not in parts[1:]:
+        raise ValueError("sólo se admiten data URL en base64")
+    try:
+        return mime, base64.b64decode(payload, validate=False)
+    except (binascii.Error, ValueError):
+        raise ValueError("base64 inválido")
+
+
+# ===== Almacén de blobs (GridFS, direccionado por contenido) =====
+def _bucket() -> AsyncIOMotorGridFSBucket:
+    return AsyncIOMotorGridFSBucket(database.db, bucket_name=IMAGE_BUCKET)
+
+
+def blob_digest(value) -> Optional[str]:
+    """sha256 si `value` es una referencia a nuestro almacén (relativa o absoluta)."""
+    if not isinstance(value, str):
+        return None
+    m = _BLOB_REF_RGX.search(value)
+    return m.group(1) if m else None
+
+
+async def store_image(data: bytes, mime: str) -> str:
+    """Guarda los bytes (una sola vez por contenido) y devuelve su sha256."""
+    mime = check_image(mime, data)
+    digest = hashlib.sha256(data).hexdigest()
+    exists = await database.db[f"{IMAGE_BUCKET}.files"].find_one({"filename": digest}, {"_id": 1})
+    if not exists:
+        await _bucket().upload_from_stream(digest, data, metadata={"contentType": mime})
+    return digest
+
+
+async def externalize_image(value: Optional[str]) -> Optional[str]:
+    """
+    Normaliza un campo de imagen antes de guardarlo:
+    - data URL -> se sube al almacén y se reemplaza por su referencia;
+    - referencia propia con host delante -> ruta relativa;
+    - cualquier otra cosa (URL externa, /img/...) se deja igual.
+    """
+    if is_data_url(value):
+        try:
+            mime, data = parse_data_url(value)
+        except ValueError as exc:
+            raise HTTPException(status_code=422, detail=f"Imagen inválida: {exc}")
+        if len(data) > IMAGE_MAX_BYTES:
+            raise HTTPException(status_code=413, detail="Imagen demasiado grande")
+        try:
+            mime = check_image(mime, data)
+        except ValueError as exc:
+            raise HTTPException(status_code=415, detail=f"Imagen inválida: {exc}")
+        return BLOB_PATH.format(digest=await store_image(data, mime))
+    digest = blob_digest(value)
+    if digest:
+        return BLOB_PATH.format(digest=digest)
+    return value
+
+
+async def open_image(digest: str):
+    """GridOut del blob (con .metadata, .length y .readchunk()) o None si no existe."""
+    try:
+        return await _bucket().open_download_stream_by_name(digest)
+    except NoFile:
+        return None
@@ -0,0 +1,77 @@
+# backend/app/indexes.py
+# Registro declarativo de índices: uno por cada forma de consulta que emiten
+# los routers (filtro + sort). Se aplica en el arranque; create_indexes es
+# idempotente, así que volver a correrlo con la misma definición no hace nada.
+import logging
+
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import OperationFailure
+
+log = logging.getLogger(__name__)
+
+INDEXES: dict[str, list[IndexModel]] = {
+    "productos": [
+        # listar_productos / admin_list_products: find({categoria?, activo?}).sort(nombre)
+        IndexModel([("categoria", ASCENDING), ("activo", ASCENDING), ("nombre", ASCENDING)]),
+        IndexModel([("categoria", ASCENDING), ("nombre", ASCENDING)]),
+        IndexModel([("activo", ASCENDING), ("nombre", ASCENDING)]),
+        IndexModel([("nombre", ASCENDING)]),  # all=1 sin categoría y upserts del seed
+    ],
+    "clientes": [
+        IndexModel([("email", ASCENDING)], unique=True),
+    ],
+    "comentarios": [
+        # comentarios.listar: find({producto_id, keyset}).sort(creadoAt -1, _id -1)
+        # comentarios.listar_batch: una rama {producto_id} + $sort + $limit K por producto
+        IndexModel([("producto_id", ASCENDING), ("creadoAt", DESCENDING), ("_id", DESCENDING)]),
+    ],
+    "pedidos": [
+        # orders.my_orders: find({userId, keyset}).sort(createdAt -1, _id -1)
+        IndexModel([("userId", ASCENDING), ("createdAt", DESCENDING), ("_id", DESCENDING)]),
+        # pedidos.mis_pedidos (legacy): find({usuario_id}).sort(creadoAt, -1)
+        IndexModel([("usuario_id", ASCENDING), ("creadoAt", DESCENDING)]),
+        # orders.admin_list_orders: find({createdAt rango, keyset}).sort(createdAt -1, _id -1)
+        IndexModel([("createdAt", DESCENDING), ("_id", DESCENDING)]),
+        # ... con filtro de status (y el snapshot de orders.admin_orders_stream)
+        IndexModel([("status", ASCENDING), ("createdAt", DESCENDING), ("_id", DESCENDING)]),
+        # orders.order_by_code; sparse: pedidos legacy aún sin migrar (migrate_orders.py)
+        IndexModel([("code", ASCENDING)], unique=True, sparse=True),
+    ],
+    "idempotency": [
+        # TTL: Mongo borra cada clave al llegar su expiresAt (ver idempotency.py)
+        IndexModel([("expiresAt", ASCENDING)], expireAfterSeconds=0),
+    ],
+    "stream_tickets": [
+        # TTL: los tickets de stream no canjeados (ver streams.issue_ticket)
+        IndexModel([("expiresAt", ASCENDING)], expireAfterSeconds=0),
+    ],
+}
+
+
+async def ensure_indexes(db) -> None:
+    """
+    Crea los índices del registro. Si un lote falla se reintenta índice por
+    índice para que el resto quede creado. Un índice normal que falla sólo se
+    registra; uno único (p. ej. emails o codes duplicados) tumba el arranque:
+    sin él la app aceptaría duplicados en silencio.
+    """
+    failed_unique: list[str] = []
+    for coll_name, models in INDEXES.items():
+        coll = db[coll_name]
+        try:
+            await coll.create_indexes(models)
+            continue
+        except OperationFailure:
+            pass
+        for model in models:
+            try:
+                await coll.create_indexes([model])
+            except OperationFailure as exc:
+                name = f"{coll_name}.{model.document['name']}"
+                if model.document.get("unique"):
+                    log.error("No se pudo crear el índice único %s: %s", name, exc)
+                    failed_unique.append(name)
+                else:
+                    log.warning("No se pudo crear el índice %s: %s", name, exc)
+    if failed_unique:
+        raise RuntimeError(f"Índices únicos sin crear: {', '.join(failed_unique)}")
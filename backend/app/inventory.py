@@ -0,0 +1,139 @@
+# backend/app/inventory.py
+# Reserva de stock "todo o nada" para un pedido completo:
+# - todas las líneas se descuentan con UN bulk_write (no un update_one por línea);
+# - si Mongo soporta transacciones (replica set / mongos) se usa una y el
+#   fallo parcial se deshace con abort; si no, se compensan las líneas que sí
+#   se descontaron.
+# Cada reserva deja su token en `_reservas` para saber exactamente qué líneas
+# entraron. La lista se recorta en el mismo $push ($slice a los últimos
+# RESERVATION_WINDOW tokens), así el camino feliz es un solo bulk_write sin
+# limpieza aparte; sólo la compensación retira su token.
+import os
+from typing import Any, Optional
+
+from bson import ObjectId
+from pymongo import UpdateOne
+from pymongo.errors import OperationFailure, PyMongoError
+
+from . import database
+
+# Reservas concurrentes de un mismo producto que se distinguen entre el
+# bulk_write y la lectura de un fallo parcial (sin transacciones)
+RESERVATION_WINDOW = int(os.getenv("INVENTORY_RESERVATION_WINDOW", "100"))
+
+# IllegalOperation: "Transaction numbers are only allowed on a replica set member or mongos"
+_TXN_UNSUPPORTED_CODES = frozenset({20})
+
+_supports_txn: Optional[bool] = None
+
+
+class _Conflicts(Exception):
+    def __init__(self, conflicts: list[dict[str, Any]]):
+        super().__init__("conflictos de stock")
+        self.conflicts = conflicts
+
+
+async def _transactions_available() -> bool:
+    global _supports_txn
+    if _supports_txn is None:
+        try:
+            hello = await database.client.admin.command("hello")
+        except PyMongoError:
+            return False  # error transitorio: no se cachea, se vuelve a preguntar
+        _supports_txn = bool(hello.get("setName") or hello.get("msg") == "isdbgrid")
+    return _supports_txn
+
+
+async def _reserve(lines: dict[ObjectId, int], session=None, compensate: bool = False) -> list[dict[str, Any]]:
+    coll = database.db.productos
+    token = str(ObjectId())
+    ids = list(lines)
+
+    res = await coll.bulk_write(
+        [
+            UpdateOne(
+                {"_id": oid, "stock": {"$gte": qty}},
+                {
+                    "$inc": {"stock": -qty},
+                    "$push": {"_reservas": {"$each": [token], "$slice": -RESERVATION_WINDOW}},
+                },
+            )
+            for oid, qty in lines.items()
+        ],
+        ordered=False,
+        session=session,
+    )
+    if res.matched_count == len(ids):
+        return []
+
+    # Fallo parcial: ¿qué líneas entraron y cuánto stock queda en las otras?
+    cursor = coll.find(
+        {"_id": {"$in": ids}},
+        {"nombre": 1, "stock": 1, "_reservas": {"$elemMatch": {"$eq": token}}},
+        session=session,
+    )
+    docs = {d["_id"]: d async for d in cursor}
+    reserved = [oid for oid, d in docs.items() if d.get("_reservas")]
+
+    if compensate and reserved:
+        await coll.bulk_write(
+            [
+                UpdateOne(
+                    {"_id": oid, "_reservas": token},
+                    {"$inc": {"stock": lines[oid]}, "$pull": {"_reservas": token}},
+                )
+                for oid in reserved
+            ],
+            ordered=False,
+        )
+
+    return [
+        {
+            "producto_id": str(oid),
+            "nombre": docs.get(oid, {}).get("nombre"),
+            "solicitado": qty,
+            "disponible": int(docs.get(oid, {}).get("stock", 0)),
+        }
+        for oid, qty in lines.items()
+        if oid not in reserved
+    ]
+
+
+async def reserve(lines: dict[ObjectId, int]) -> list[dict[str, Any]]:
+    """
+    Descuenta el stock de todas las líneas o de ninguna.
+    Devuelve la lista de conflictos por línea (vacía = reservado).
+    """
+    if not lines:
+        return []
+    if not await _transactions_available():
+        return await _reserve(lines, compensate=True)
+
+    async def _txn(session):
+        conflicts = await _reserve(lines, session=session)
+        if conflicts:
+            raise _Conflicts(conflicts)  # aborta la transacción
+
+    global _supports_txn
+    async with await database.client.start_session() as session:
+        try:
+            await session.with_transaction(_txn)
+        except _Conflicts as exc:
+            return exc.conflicts
+        except OperationFailure as exc:
+            if exc.code not in _TXN_UNSUPPORTED_CODES:
+                raise
+            # El servidor no admite transacciones: no se escribió nada
+            _supports_txn = False
+            return await _reserve(lines, compensate=True)
+    return []
+
+
+async def release(lines: dict[ObjectId, int]) -> None:
+    """Devuelve al stock una reserva ya confirmada (p. ej. si falla el insert del pedido)."""
+    if not lines:
+        return
+    await database.db.productos.bulk_write(
+        [UpdateOne({"_id": oid}, {"$inc": {"stock": qty}}) for oid, qty in lines.items()],
+        ordered=False,
+    )
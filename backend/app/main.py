@@ -1,26 +1,47 @@
 # backend/app/main.py
+import asyncio
 import os
 from contextlib import asynccontextmanager
 from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
 
 from .routers.orders import admin as admin_orders 
-from . import database
+from . import database, idempotency, metrics, profiler, security, streams
+from .indexes import ensure_indexes
+from .migrate_orders import migrate as migrate_orders
+from .responses import FAST_JSON, FastJSONResponse
 from .seed import seed
-from .routers import productos, comentarios, auth, orders
+from .routers import productos, comentarios, auth, orders, pedidos, imagenes, internal, profiling, analytics
 from .routers.productos import admin as admin_products  # ← router admin de productos
 
 # ---------- Lifespan ----------
+async def _prepare_indexes():
+    # Codes duplicados y pedidos legacy sin code se arreglan antes del índice único de pedidos.code
+    await migrate_orders(database.db)
+    await ensure_indexes(database.db)
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     await database.connect()
-    await seed(database.db)
+    await database.warmup()  # abre el pool antes de aceptar requests
+    # Independientes entre sí: los upserts del seed no dependen de los índices
+    await asyncio.gather(_prepare_indexes(), seed(database.db))
+    lag_monitor = asyncio.create_task(metrics.monitor_loop_lag())
+    streams.start_all()  # change streams en segundo plano (sin replica set: 503 + polling)
     try:
         yield
     finally:
+        lag_monitor.cancel()
+        await streams.stop_all()
         await database.disconnect()
+        security.shutdown_hashing()
 
-app = FastAPI(title="Sabor Real API (MongoDB)", lifespan=lifespan)
+app = FastAPI(
+    title="Sabor Real API (MongoDB)",
+    lifespan=lifespan,
+    # FAST_JSON=1: el resto de endpoints también codifica con orjson
+    **({"default_response_class": FastJSONResponse} if FAST_JSON else {}),
+)
 
 # ---------- CORS ----------
 # Usa CORS_ORIGINS si está definida; si no, aplica defaults útiles (prod + local).
@@ -43,15 +64,29 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],                            # incluye Authorization
+    expose_headers=[
+        "X-Next-Cursor",                            # paginación keyset
+        idempotency.REPLAYED_HEADER,                # respuesta repetida de una Idempotency-Key
+    ],
 )
 
+# ---------- Métricas (latencia por ruta, en curso, tiempo Mongo) ----------
+app.add_middleware(profiler.ProfilerMiddleware)   # apagado salvo que un admin lo active
+app.add_middleware(metrics.MetricsMiddleware)
+
 # ---------- Routers ----------
 app.include_router(productos.router)     # público productos
 app.include_router(comentarios.router)   # público/privado comentarios
 app.include_router(auth.router)          # auth
 app.include_router(orders.router)        # pedidos (usuario)
+app.include_router(pedidos.router)       # pedidos legacy con reserva de stock
 app.include_router(admin_products)       # admin productos (CRUD)
 app.include_router(admin_orders)
+app.include_router(analytics.router)     # admin: analítica de ventas
+app.include_router(imagenes.router)      # blobs de imágenes (GridFS)
+app.include_router(internal.router)      # métricas internas (pool Mongo, hashing, cache)
+app.include_router(internal.prometheus)  # GET /metrics
+app.include_router(profiling.router)     # admin: profiler por muestreo
 
 # ---------- Health ----------
 @app.get("/")
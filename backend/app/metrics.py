@@ -0,0 +1,229 @@
+# backend/app/metrics.py
+# Instrumentación HTTP en formato de exposición de Prometheus (GET /metrics):
+# - http_request_duration_seconds{method,route}: histograma por plantilla de
+#   ruta (/api/orders/{order_id}), no por path crudo;
+# - http_responses_total{method,route,status};
+# - http_requests_in_flight;
+# - http_request_mongo_seconds{method,route}: tiempo en Mongo de cada request
+#   (lo suma mongo_metrics.CommandMetrics vía contextvar);
+# - event_loop_lag_seconds: retraso del loop medido por una tarea periódica.
+# Las observaciones HTTP ocurren en el hilo del event loop: sin locks.
+import asyncio
+import os
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Callable, Iterable, Optional
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+LOOP_LAG_INTERVAL = float(os.getenv("LOOP_LAG_INTERVAL", "0.5"))
+UNMATCHED_ROUTE = "unmatched"
+
+
+def _fmt_labels(names: tuple[str, ...], values: tuple, extra: str = "") -> str:
+    parts = [
+        f'{n}="' + str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"'
+        for n, v in zip(names, values)
+    ]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _fmt_value(v: float) -> str:
+    return repr(float(v)) if isinstance(v, float) else str(v)
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = ()):
+        self.name, self.help, self.labelnames = name, help, labelnames
+        self._values: dict[tuple, float] = {}
+
+    def inc(self, labels: tuple = (), amount: float = 1) -> None:
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self) -> Iterable[str]:
+        for labels, v in self._values.items():
+            yield f"{self.name}{_fmt_labels(self.labelnames, labels)} {_fmt_value(v)}"
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float, labels: tuple = ()) -> None:
+        self._values[labels] = value
+
+    def dec(self, labels: tuple = (), amount: float = 1) -> None:
+        self._values[labels] = self._values.get(labels, 0) - amount
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = (), buckets=BUCKETS):
+        self.name, self.help, self.labelnames = name, help, labelnames
+        self.buckets = tuple(buckets)
+        # labels -> [n_bucket_0, ..., n_bucket_k, n_+Inf, suma]  (no acumulados)
+        self._series: dict[tuple, list] = {}
+
+    def observe(self, value: float, labels: tuple = ()) -> None:
+        s = self._series.get(labels)
+        if s is None:
+            s = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        s[bisect_left(self.buckets, value)] += 1
+        s[-1] += value
+
+    def samples(self) -> Iterable[str]:
+        for labels, s in self._series.items():
+            acc = 0
+            for bound, n in zip(self.buckets + ("+Inf",), s):
+                acc += n
+                le = f'le="{bound}"'
+                yield f"{self.name}_bucket{_fmt_labels(self.labelnames, labels, le)} {acc}"
+            lbl = _fmt_labels(self.labelnames, labels)
+            yield f"{self.name}_sum{lbl} {_fmt_value(s[-1])}"
+            yield f"{self.name}_count{lbl} {acc}"
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._metrics: list = []
+        # Colectores: devuelven métricas armadas en el momento del scrape
+        self._collectors: list[Callable[[], Iterable]] = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, fn: Callable[[], Iterable]) -> None:
+        self._collectors.append(fn)
+
+    def render(self) -> str:
+        metrics = list(self._metrics)
+        for fn in self._collectors:
+            metrics.extend(fn())
+        lines: list[str] = []
+        for m in metrics:
+            lines.append(f"# HELP {m.name} {m.help}")
+            lines.append(f"# TYPE {m.name} {m.kind}")
+            lines.extend(m.samples())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+REQUEST_SECONDS = registry.register(Histogram(
+    "http_request_duration_seconds", "Latencia de las requests HTTP por ruta", ("method", "route"),
+))
+RESPONSES = registry.register(Counter(
+    "http_responses_total", "Respuestas HTTP por ruta y código", ("method", "route", "status"),
+))
+IN_FLIGHT = registry.register(Gauge(
+    "http_requests_in_flight", "Requests HTTP en curso",
+))
+MONGO_SECONDS = registry.register(Histogram(
+    "http_request_mongo_seconds", "Tiempo en comandos Mongo por request", ("method", "route"),
+))
+# Server-Sent Events: conexiones de minutos u horas. Van aparte para no
+# deformar la latencia de las requests ni el gauge de requests en curso.
+SSE_OPEN = registry.register(Gauge(
+    "sse_connections_open", "Streams SSE abiertos", ("route",),
+))
+SSE_SECONDS = registry.register(Histogram(
+    "sse_connection_duration_seconds", "Duración de los streams SSE", ("route",),
+    buckets=(1.0, 10.0, 60.0, 300.0, 900.0, 1800.0, 3600.0, 14400.0),
+))
+LOOP_LAG = registry.register(Histogram(
+    "event_loop_lag_seconds", "Retraso del event loop respecto del intervalo programado",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0),
+))
+LOOP_LAG_MAX = registry.register(Gauge(
+    "event_loop_lag_max_seconds", "Mayor retraso del event loop observado",
+))
+
+# [segundos, comandos] de Mongo de la request actual
+_request_mongo: ContextVar[Optional[list]] = ContextVar("request_mongo", default=None)
+
+
+def record_mongo_time(seconds: float) -> None:
+    """Lo llama el CommandListener (en el hilo de Motor, con el contexto de la request)."""
+    acc = _request_mongo.get()
+    if acc is not None:
+        acc[0] += seconds
+        acc[1] += 1
+
+
+def _is_event_stream(message) -> bool:
+    for name, value in message.get("headers", ()):
+        if name.lower() == b"content-type":
+            return value.split(b";", 1)[0].strip().lower() == b"text/event-stream"
+    return False
+
+
+class MetricsMiddleware:
+    """Middleware ASGI puro (sin BaseHTTPMiddleware: no crea tareas por request)."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        status = 500
+        sse = False
+
+        def route() -> str:
+            # El router de FastAPI deja la ruta que matcheó en el scope
+            return getattr(scope.get("route"), "path", None) or UNMATCHED_ROUTE
+
+        async def send_wrapper(message):
+            nonlocal status, sse
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if _is_event_stream(message):
+                    # Deja de contar como request en curso: pasa a SSE_OPEN
+                    sse = True
+                    IN_FLIGHT.dec()
+                    SSE_OPEN.inc((route(),))
+            await send(message)
+
+        mongo = [0.0, 0]
+        token = _request_mongo.set(mongo)
+        IN_FLIGHT.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            _request_mongo.reset(token)
+            labels = (scope["method"], route())
+            RESPONSES.inc((scope["method"], labels[1], status))
+            if sse:
+                SSE_OPEN.dec((labels[1],))
+                SSE_SECONDS.observe(elapsed, (labels[1],))
+            else:
+                IN_FLIGHT.dec()
+                REQUEST_SECONDS.observe(elapsed, labels)
+                if mongo[1]:
+                    MONGO_SECONDS.observe(mongo[0], labels)
+
+
+async def monitor_loop_lag(interval: float = LOOP_LAG_INTERVAL) -> None:
+    """Duerme `interval` y mide cuánto tarde despierta: eso es lo que el loop estuvo bloqueado."""
+    loop = asyncio.get_running_loop()
+    worst = 0.0
+    while True:
+        expected = loop.time() + interval
+        await asyncio.sleep(interval)
+        lag = max(0.0, loop.time() - expected)
+        LOOP_LAG.observe(lag)
+        if lag > worst:
+            worst = lag
+            LOOP_LAG_MAX.set(worst)
+
+
+def render() -> str:
+    return registry.render()
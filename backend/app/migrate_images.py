@@ -0,0 +1,86 @@
+# backend/app/migrate_images.py
+# Migración: saca los data URL que aún vivan dentro de `productos.imagenUrl`,
+# `clientes.avatarUrl` y los snapshots de `pedidos.items[].imagenUrl`, y los
+# pasa al almacén de imágenes (GridFS), dejando sólo la referencia.
+#
+#   cd backend && python -m app.migrate_images
+#
+# Es idempotente: una segunda pasada no encuentra nada que migrar.
+# Un documento con una imagen inválida (tipo no admitido, demasiado grande...)
+# no corta la migración: se registra su _id, se cuenta como omitido y se
+# deja como estaba.
+import asyncio
+import logging
+
+from fastapi import HTTPException
+from pymongo import UpdateOne
+
+from . import database
+from .images import externalize_image
+
+log = logging.getLogger(__name__)
+
+_DATA_URL = {"$regex": "^data:"}
+_BATCH = 100
+
+
+def _skip(coll, doc_id, exc: HTTPException) -> None:
+    log.warning("Imagen omitida en %s %s: %s", coll.name, doc_id, exc.detail)
+
+
+async def _migrate_field(coll, field: str) -> tuple[int, int]:
+    moved = skipped = 0
+    ops: list[UpdateOne] = []
+    async for doc in coll.find({field: _DATA_URL}, {field: 1}):
+        try:
+            ref = await externalize_image(doc[field])
+        except HTTPException as exc:
+            _skip(coll, doc["_id"], exc)
+            skipped += 1
+            continue
+        # el filtro por el valor original evita pisar una edición concurrente
+        ops.append(UpdateOne({"_id": doc["_id"], field: doc[field]}, {"$set": {field: ref}}))
+        if len(ops) >= _BATCH:
+            moved += (await coll.bulk_write(ops, ordered=False)).modified_count
+            ops = []
+    if ops:
+        moved += (await coll.bulk_write(ops, ordered=False)).modified_count
+    return moved, skipped
+
+
+async def _migrate_order_items(coll) -> tuple[int, int]:
+    moved = skipped = 0
+    async for doc in coll.find({"items.imagenUrl": _DATA_URL}, {"items": 1}):
+        try:
+            items = [
+                {**it, "imagenUrl": await externalize_image(it.get("imagenUrl"))}
+                for it in doc.get("items", [])
+            ]
+        except HTTPException as exc:
+            _skip(coll, doc["_id"], exc)
+            skipped += 1
+            continue
+        res = await coll.update_one({"_id": doc["_id"]}, {"$set": {"items": items}})
+        moved += res.modified_count
+    return moved, skipped
+
+
+async def migrate_inline_images(db) -> dict[str, int]:
+    """Imágenes movidas por colección y documentos omitidos (`<colección>_omitidos`)."""
+    out: dict[str, int] = {}
+    out["productos"], out["productos_omitidos"] = await _migrate_field(db.productos, "imagenUrl")
+    out["clientes"], out["clientes_omitidos"] = await _migrate_field(db.clientes, "avatarUrl")
+    out["pedidos"], out["pedidos_omitidos"] = await _migrate_order_items(db.pedidos)
+    return out
+
+
+async def main() -> None:
+    await database.connect()
+    try:
+        print(await migrate_inline_images(database.db))
+    finally:
+        await database.disconnect()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,168 @@
+# backend/app/migrate_orders.py
+# Migraciones de `pedidos` que deben correr antes del índice único de code:
+# - Codes: antes del contador diario los codes eran SR-YYYYMMDD-HHMMSS, que se
+#   repetían con dos pedidos en el mismo segundo y pueden chocar con el formato
+#   nuevo (SR-YYYYMMDD-000123). Se sube cada contador diario por encima de los
+#   codes ya emitidos y a los duplicados (salvo el más antiguo) se les da un
+#   code nuevo; el anterior queda en `codeAnterior`. Una sola vez (marcador
+#   en `meta`, como el seed).
+# - Legacy: los pedidos de /api/pedidos sólo tenían `creadoAt`/`estado` y
+#   ningún `code`, así que quedaban fuera de todo lo que pagina o agrega por
+#   `createdAt` (admin_list_orders, el tablero en vivo, la analítica). Se les
+#   completa createdAt, status y code. Sólo toca documentos sin createdAt, y
+#   /api/pedidos ya escribe los tres campos.
+#
+#   cd backend && python -m app.migrate_orders
+#
+# También corre en el arranque, antes de ensure_indexes. Es idempotente.
+import asyncio
+import logging
+from datetime import date, datetime, timezone
+from typing import Any, Optional
+
+from pymongo import UpdateOne
+
+from . import analytics, database
+from .counters import next_order_code, order_counter
+
+log = logging.getLogger(__name__)
+
+_BATCH = 100
+
+CODES_MARKER = "pedidos_codes"
+CODES_VERSION = 1
+# SR-YYYYMMDD-NNNNNN: el sufijo es HHMMSS (formato viejo) o la secuencia del día
+_CODE_RE = r"^SR-\d{8}-\d{6,}$"
+
+# estado legacy (en minúsculas) -> OrderStatus
+LEGACY_STATUS = {
+    "creado": "CREATED",
+    "pagado": "PAID",
+    "cancelado": "CANCELLED",
+    "entregado": "DELIVERED",
+}
+
+
+def legacy_status(estado: Optional[str]) -> str:
+    value = (estado or "").strip()
+    if value.upper() in LEGACY_STATUS.values():  # admin_update_status ya lo escribe así
+        return value.upper()
+    return LEGACY_STATUS.get(value.lower(), "CREATED")
+
+
+async def _backfill_fields(doc: dict[str, Any]) -> dict[str, Any]:
+    created: datetime = doc["creadoAt"]
+    fields: dict[str, Any] = {"createdAt": created}
+    if not doc.get("status"):
+        fields["status"] = legacy_status(doc.get("estado"))
+    if not doc.get("code"):
+        fields["code"] = await next_order_code(created)
+    return fields
+
+
+async def bump_code_counters(db) -> int:
+    """Deja cada contador diario >= el mayor sufijo ya emitido ese día."""
+    pipeline = [
+        {"$match": {"code": {"$regex": _CODE_RE}}},
+        {"$group": {
+            "_id": {"$substrCP": ["$code", 3, 8]},
+            "max": {"$max": {"$toLong": {"$substrCP": ["$code", 12, 20]}}},
+        }},
+    ]
+    ops = [
+        UpdateOne({"_id": order_counter(row["_id"])}, {"$max": {"seq": row["max"]}}, upsert=True)
+        async for row in db.pedidos.aggregate(pipeline, allowDiskUse=True)
+    ]
+    if ops:
+        await db.counters.bulk_write(ops, ordered=False)
+    return len(ops)
+
+
+async def dedupe_order_codes(db) -> int:
+    """Code nuevo para cada pedido que repite el de otro más antiguo. Devuelve cuántos cambió."""
+    pipeline = [
+        {"$match": {"code": {"$type": "string"}}},
+        {"$sort": {"code": 1, "createdAt": 1, "_id": 1}},
+        {"$group": {"_id": "$code", "ids": {"$push": "$_id"}, "n": {"$sum": 1}}},
+        {"$match": {"n": {"$gt": 1}}},
+    ]
+    changed = 0
+    async for row in db.pedidos.aggregate(pipeline, allowDiskUse=True):
+        for oid in row["ids"][1:]:  # el más antiguo conserva su code
+            doc = await db.pedidos.find_one({"_id": oid}, {"createdAt": 1, "creadoAt": 1})
+            if doc is None:
+                continue
+            code = await next_order_code(doc.get("createdAt") or doc.get("creadoAt"))
+            res = await db.pedidos.update_one(
+                {"_id": oid, "code": row["_id"]},
+                {"$set": {"code": code, "codeAnterior": row["_id"]}},
+            )
+            if res.modified_count:
+                log.warning("Pedido %s: code duplicado %s -> %s", oid, row["_id"], code)
+                changed += res.modified_count
+    return changed
+
+
+async def migrate_order_codes(db) -> bool:
+    """Contadores + duplicados, una vez por versión. True si hizo algo."""
+    marker = await db.meta.find_one({"_id": CODES_MARKER})
+    if marker and marker.get("version", 0) >= CODES_VERSION:
+        return False
+    await bump_code_counters(db)
+    await dedupe_order_codes(db)
+    await db.meta.update_one(
+        {"_id": CODES_MARKER},
+        {"$set": {"version": CODES_VERSION, "migratedAt": datetime.now(timezone.utc)}},
+        upsert=True,
+    )
+    return True
+
+
+async def backfill_legacy_orders(db) -> int:
+    """Completa createdAt/status/code en los pedidos legacy. Devuelve cuántos cambió."""
+    moved = 0
+    ops: list[UpdateOne] = []
+    dias: dict[date, datetime] = {}
+    cur = db.pedidos.find(
+        {"createdAt": {"$exists": False}, "creadoAt": {"$type": "date"}},
+        {"creadoAt": 1, "estado": 1, "status": 1, "code": 1},
+    )
+    async for doc in cur:
+        # el filtro repetido evita pisar a otro worker que migra a la vez
+        ops.append(UpdateOne(
+            {"_id": doc["_id"], "createdAt": {"$exists": False}},
+            {"$set": await _backfill_fields(doc)},
+        ))
+        dias.setdefault(analytics.day_of(doc["creadoAt"]), doc["creadoAt"])
+        if len(ops) >= _BATCH:
+            moved += (await db.pedidos.bulk_write(ops, ordered=False)).modified_count
+            ops = []
+    if ops:
+        moved += (await db.pedidos.bulk_write(ops, ordered=False)).modified_count
+
+    # Los rollups de esos días se calcularon sin estos pedidos
+    for created in dias.values():
+        await analytics.invalidate_day(db, created)
+    if moved:
+        log.info("Pedidos legacy migrados: %d", moved)
+    return moved
+
+
+async def migrate(db) -> dict[str, Any]:
+    # Primero los contadores: el backfill también pide codes nuevos
+    return {
+        "codes": await migrate_order_codes(db),
+        "legacy": await backfill_legacy_orders(db),
+    }
+
+
+async def main() -> None:
+    await database.connect()
+    try:
+        print(await migrate(database.db))
+    finally:
+        await database.disconnect()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,217 @@
+# backend/app/mongo_metrics.py
+# Instrumentación del cliente Mongo (listeners de pymongo):
+# - latencia por comando (find, aggregate, insert, ...);
+# - pool: espera de checkout, conexiones en uso / abiertas, cola de espera.
+# Los listeners corren en los hilos del executor de Motor, de ahí el lock.
+# Se exponen en GET /internal/metrics (routers/internal.py), por worker, y
+# resumidas en GET /metrics (formato Prometheus, ver metrics.py).
+import threading
+from collections import defaultdict
+from typing import Any
+
+from pymongo import monitoring
+
+from .metrics import Counter, Gauge, record_mongo_time, registry
+from .profiler import record_span
+
+
+class _Timer:
+    __slots__ = ("count", "total", "max")
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds: float) -> None:
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def snapshot(self) -> dict[str, Any]:
+        return {
+            "count": self.count,
+            "total_seconds": round(self.total, 6),
+            "avg_ms": round(self.total / self.count * 1000, 3) if self.count else None,
+            "max_ms": round(self.max * 1000, 3),
+        }
+
+
+class MongoMetrics:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.commands: dict[str, _Timer] = defaultdict(_Timer)
+            self.command_failures: dict[str, int] = defaultdict(int)
+            self.checkout_wait = _Timer()
+            self.checkout_failures: dict[str, int] = defaultdict(int)
+            self.waiting: dict[str, int] = defaultdict(int)   # en cola por un checkout
+            self.in_use: dict[str, int] = defaultdict(int)    # prestadas a una operación
+            self.open: dict[str, int] = defaultdict(int)      # abiertas (en uso + ociosas)
+            self.max_in_use: dict[str, int] = defaultdict(int)
+            self.max_pool_size: dict[str, int] = {}
+            self.pool_cleared = 0
+
+    # ----- comandos -----
+    def record_command(self, name: str, seconds: float, ok: bool = True) -> None:
+        with self._lock:
+            self.commands[name].add(seconds)
+            if not ok:
+                self.command_failures[name] += 1
+
+    # ----- pool -----
+    def _addr(self, address) -> str:
+        host, port = address
+        return f"{host}:{port}"
+
+    def checkout_started(self, address) -> None:
+        with self._lock:
+            self.waiting[self._addr(address)] += 1
+
+    def checked_out(self, address, seconds: float) -> None:
+        addr = self._addr(address)
+        with self._lock:
+            self.waiting[addr] -= 1
+            self.checkout_wait.add(seconds)
+            self.in_use[addr] += 1
+            self.max_in_use[addr] = max(self.max_in_use[addr], self.in_use[addr])
+
+    def checkout_failed(self, address, reason: str, seconds: float) -> None:
+        with self._lock:
+            self.waiting[self._addr(address)] -= 1
+            self.checkout_wait.add(seconds)
+            self.checkout_failures[reason] += 1
+
+    def checked_in(self, address) -> None:
+        with self._lock:
+            self.in_use[self._addr(address)] -= 1
+
+    def connection_opened(self, address) -> None:
+        with self._lock:
+            self.open[self._addr(address)] += 1
+
+    def connection_closed(self, address) -> None:
+        with self._lock:
+            self.open[self._addr(address)] -= 1
+
+    def pool_created(self, address, options: dict[str, Any]) -> None:
+        with self._lock:
+            if "maxPoolSize" in options:
+                self.max_pool_size[self._addr(address)] = options["maxPoolSize"]
+
+    def cleared(self) -> None:
+        with self._lock:
+            self.pool_cleared += 1
+
+    def snapshot(self) -> dict[str, Any]:
+        with self._lock:
+            servers = set(self.open) | set(self.in_use) | set(self.waiting) | set(self.max_pool_size)
+            return {
+                "commands": {
+                    name: {**t.snapshot(), "failures": self.command_failures.get(name, 0)}
+                    for name, t in sorted(self.commands.items())
+                },
+                "pool": {
+                    "checkout_wait": self.checkout_wait.snapshot(),
+                    "checkout_failures": dict(self.checkout_failures),
+                    "cleared": self.pool_cleared,
+                    "servers": {
+                        addr: {
+                            "open": self.open.get(addr, 0),
+                            "in_use": self.in_use.get(addr, 0),
+                            "max_in_use": self.max_in_use.get(addr, 0),
+                            "waiting": self.waiting.get(addr, 0),
+                            "max_pool_size": self.max_pool_size.get(addr),
+                        }
+                        for addr in sorted(servers)
+                    },
+                },
+            }
+
+
+metrics = MongoMetrics()
+
+
+class CommandMetrics(monitoring.CommandListener):
+    def started(self, event: monitoring.CommandStartedEvent) -> None:
+        pass
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent) -> None:
+        seconds = event.duration_micros / 1e6
+        metrics.record_command(event.command_name, seconds)
+        record_mongo_time(seconds)
+        record_span(f"mongo.{event.command_name}", seconds)
+
+    def failed(self, event: monitoring.CommandFailedEvent) -> None:
+        seconds = event.duration_micros / 1e6
+        metrics.record_command(event.command_name, seconds, ok=False)
+        record_mongo_time(seconds)
+        record_span(f"mongo.{event.command_name} (error)", seconds)
+
+
+class PoolMetrics(monitoring.ConnectionPoolListener):
+    def pool_created(self, event: monitoring.PoolCreatedEvent) -> None:
+        metrics.pool_created(event.address, event.options)
+
+    def pool_ready(self, event: monitoring.PoolReadyEvent) -> None:
+        pass
+
+    def pool_cleared(self, event: monitoring.PoolClearedEvent) -> None:
+        metrics.cleared()
+
+    def pool_closed(self, event: monitoring.PoolClosedEvent) -> None:
+        pass
+
+    def connection_created(self, event: monitoring.ConnectionCreatedEvent) -> None:
+        metrics.connection_opened(event.address)
+
+    def connection_ready(self, event: monitoring.ConnectionReadyEvent) -> None:
+        pass
+
+    def connection_closed(self, event: monitoring.ConnectionClosedEvent) -> None:
+        metrics.connection_closed(event.address)
+
+    def connection_check_out_started(self, event: monitoring.ConnectionCheckOutStartedEvent) -> None:
+        metrics.checkout_started(event.address)
+
+    def connection_check_out_failed(self, event: monitoring.ConnectionCheckOutFailedEvent) -> None:
+        metrics.checkout_failed(event.address, event.reason, getattr(event, "duration", 0.0) or 0.0)
+
+    def connection_checked_out(self, event: monitoring.ConnectionCheckedOutEvent) -> None:
+        metrics.checked_out(event.address, getattr(event, "duration", 0.0) or 0.0)
+
+    def connection_checked_in(self, event: monitoring.ConnectionCheckedInEvent) -> None:
+        metrics.checked_in(event.address)
+
+
+def listeners() -> list:
+    return [CommandMetrics(), PoolMetrics()]
+
+
+def _prometheus() -> list:
+    snap = metrics.snapshot()
+    commands = Counter("mongo_commands_total", "Comandos Mongo por nombre", ("command",))
+    seconds = Counter("mongo_command_seconds_total", "Tiempo acumulado por comando Mongo", ("command",))
+    failures = Counter("mongo_command_failures_total", "Comandos Mongo fallidos", ("command",))
+    for name, c in snap["commands"].items():
+        commands.inc((name,), c["count"])
+        seconds.inc((name,), c["total_seconds"])
+        failures.inc((name,), c["failures"])
+
+    pool = snap["pool"]
+    conns = Gauge("mongo_pool_connections", "Conexiones del pool por estado", ("server", "state"))
+    for addr, srv in pool["servers"].items():
+        for state in ("open", "in_use", "waiting"):
+            conns.set(srv[state], (addr, state))
+    wait = Counter("mongo_pool_checkout_wait_seconds_total", "Espera acumulada por una conexión del pool")
+    wait.inc(amount=pool["checkout_wait"]["total_seconds"])
+    checkouts = Counter("mongo_pool_checkouts_total", "Checkouts de conexiones del pool")
+    checkouts.inc(amount=pool["checkout_wait"]["count"])
+    return [commands, seconds, failures, conns, wait, checkouts]
+
+
+registry.add_collector(_prometheus)
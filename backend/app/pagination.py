@@ -0,0 +1,75 @@
+# backend/app/pagination.py
+# Paginación keyset sobre (campo_fecha desc, _id desc) con cursores opacos.
+# Cada página es un rango del índice (campo, _id): cuesta lo mismo en la
+# primera página que en la número 10.000, a diferencia de skip().
+import base64
+import binascii
+import json
+import os
+from datetime import datetime
+from typing import Any, Optional
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from fastapi import HTTPException, Response
+
+DEFAULT_PAGE_SIZE = int(os.getenv("DEFAULT_PAGE_SIZE", "20"))
+MAX_PAGE_SIZE = int(os.getenv("MAX_PAGE_SIZE", "100"))
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(ts: datetime, oid: ObjectId | str) -> str:
+    raw = json.dumps([ts.isoformat(), str(oid)], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, ObjectId]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        ts, oid = json.loads(raw)
+        return datetime.fromisoformat(ts), ObjectId(oid)
+    except (binascii.Error, ValueError, TypeError, InvalidId):
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+
+
+def keyset_query(query: dict[str, Any], field: str, cursor: Optional[str]) -> dict[str, Any]:
+    """Agrega al filtro la condición "después del cursor" en orden (field, _id) desc."""
+    if not cursor:
+        return query
+    ts, oid = decode_cursor(cursor)
+    return {
+        **query,
+        "$or": [
+            {field: {"$lt": ts}},
+            {field: ts, "_id": {"$lt": oid}},
+        ],
+    }
+
+
+def keyset_sort(field: str) -> list[tuple[str, int]]:
+    return [(field, -1), ("_id", -1)]
+
+
+def page_size(limit: Optional[int]) -> int:
+    if not limit:
+        return DEFAULT_PAGE_SIZE
+    return max(1, min(int(limit), MAX_PAGE_SIZE))
+
+
+async def fetch_page(cursor, limit: int, field: str) -> tuple[list[dict], Optional[str]]:
+    """
+    Lee `limit + 1` documentos para saber si hay página siguiente sin un count().
+    Devuelve (documentos, cursor_siguiente | None).
+    """
+    docs = await cursor.limit(limit + 1).to_list(length=limit + 1)
+    if len(docs) <= limit:
+        return docs, None
+    docs = docs[:limit]
+    last = docs[-1]
+    return docs, encode_cursor(last[field], last["_id"])
+
+
+def set_next_cursor(response: Response, next_cursor: Optional[str]) -> None:
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
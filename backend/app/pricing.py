@@ -0,0 +1,76 @@
+# backend/app/pricing.py
+# Motor de precios del carrito: resuelve todas las líneas con UNA consulta
+# `$in` (en vez de un find_one por línea) y fusiona producto_id repetidos.
+from typing import Any, Iterable
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from fastapi import HTTPException
+
+from . import database
+from .images import PRODUCT_IMAGE_REF_EXPR
+
+# Campos del producto que necesita un snapshot de pedido. Una imagen inline
+# llega ya como referencia: no se copia el data URL en cada pedido.
+_PROJECTION = {"nombre": 1, "precio": 1, "stock": 1, "imagenUrl": PRODUCT_IMAGE_REF_EXPR}
+
+
+def merge_lines(items: Iterable[Any]) -> dict[str, int]:
+    """producto_id -> qty total, conservando el orden de primera aparición."""
+    lines: dict[str, int] = {}
+    for it in items:
+        lines[it.producto_id] = lines.get(it.producto_id, 0) + int(it.qty)
+    return lines
+
+
+def _oid(s: str) -> ObjectId:
+    try:
+        return ObjectId(s)
+    except (InvalidId, TypeError):
+        raise HTTPException(400, f"ObjectId inválido: {s}")
+
+
+def products_query(ids: Iterable[str], *, activo_only: bool = True) -> dict[str, Any]:
+    query: dict[str, Any] = {"_id": {"$in": [_oid(i) for i in ids]}}
+    if activo_only:
+        query["activo"] = True
+    return query
+
+
+async def fetch_products(ids: Iterable[str], *, activo_only: bool = True) -> dict[str, dict]:
+    """Trae los productos pedidos en un solo round trip, indexados por str(_id)."""
+    cursor = database.db.productos.find(products_query(ids, activo_only=activo_only), _PROJECTION)
+    return {str(p["_id"]): p async for p in cursor}
+
+
+def snapshot_line(prod: dict, qty: int) -> dict[str, Any]:
+    precio = float(prod.get("precio", 0))
+    return {
+        "producto_id": str(prod["_id"]),
+        "nombre": prod.get("nombre"),
+        "precio": precio,
+        "qty": qty,
+        "subtotal": round(precio * qty, 2),
+        "imagenUrl": prod.get("imagenUrl"),
+    }
+
+
+async def price_cart(items: Iterable[Any]) -> tuple[float, list[dict[str, Any]], list[str]]:
+    """
+    Devuelve (total, snapshot, faltantes). `faltantes` son los producto_id
+    que no existen o no están activos; el router decide qué error lanzar.
+    """
+    lines = merge_lines(items)
+    prods = await fetch_products(lines)
+
+    total = 0.0
+    snapshot: list[dict[str, Any]] = []
+    missing: list[str] = []
+    for pid, qty in lines.items():
+        prod = prods.get(pid)
+        if prod is None:
+            missing.append(pid)
+            continue
+        total += float(prod.get("precio", 0)) * qty
+        snapshot.append(snapshot_line(prod, qty))
+    return round(total, 2), snapshot, missing
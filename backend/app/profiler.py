@@ -0,0 +1,202 @@
+# backend/app/profiler.py
+# Profiler de requests por muestreo, pensado para dejarlo disponible en
+# producción y activarlo sólo cuando hace falta (POST /api/admin/profiler).
+# - Una fracción `sample_rate` de las requests se traza como árbol de spans:
+#   request -> handler/funciones marcadas -> comandos Mongo, hashing,
+#   serialización.
+# - Por ruta se guardan las `keep` trazas más lentas (heap acotado).
+# - Exporta JSON o "collapsed stacks" (flamegraph.pl, speedscope).
+# El span activo viaja en un contextvar; Motor lo copia a sus hilos, así el
+# CommandListener cuelga cada comando del span que lo emitió.
+# El estado es por worker de uvicorn.
+import functools
+import heapq
+import itertools
+import os
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Any, Optional
+
+from .metrics import UNMATCHED_ROUTE
+
+config = {
+    "enabled": os.getenv("PROFILE_ENABLED", "0") == "1",
+    "sample_rate": float(os.getenv("PROFILE_SAMPLE_RATE", "0.01")),
+    "keep": int(os.getenv("PROFILE_KEEP", "20")),   # trazas más lentas por ruta
+}
+
+
+class Span:
+    __slots__ = ("name", "start", "end", "children")
+
+    def __init__(self, name: str, start: Optional[float] = None):
+        self.name = name
+        self.start = time.perf_counter() if start is None else start
+        self.end: Optional[float] = None
+        self.children: list["Span"] = []
+
+    @property
+    def duration(self) -> float:
+        return ((self.end if self.end is not None else time.perf_counter()) - self.start)
+
+    def to_dict(self, t0: float) -> dict[str, Any]:
+        return {
+            "name": self.name,
+            "start_ms": round((self.start - t0) * 1000, 3),
+            "duration_ms": round(self.duration * 1000, 3),
+            "children": [c.to_dict(t0) for c in self.children],
+        }
+
+
+_current: ContextVar[Optional[Span]] = ContextVar("profiler_span", default=None)
+
+
+@contextmanager
+def span(name: str):
+    """Span hijo del activo; sin request muestreada no hace nada."""
+    parent = _current.get()
+    if parent is None:
+        yield None
+        return
+    s = Span(name)
+    parent.children.append(s)
+    token = _current.set(s)
+    try:
+        yield s
+    finally:
+        s.end = time.perf_counter()
+        _current.reset(token)
+
+
+def profiled(name: Optional[str] = None):
+    """Decorador para corrutinas (endpoints incluidos: conserva la firma)."""
+    def deco(fn):
+        label = name or fn.__name__
+
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            if _current.get() is None:
+                return await fn(*args, **kwargs)
+            with span(label):
+                return await fn(*args, **kwargs)
+        return wrapper
+    return deco
+
+
+def record_span(name: str, seconds: float) -> None:
+    """Agrega un span ya terminado (p. ej. un comando Mongo desde su listener)."""
+    parent = _current.get()
+    if parent is None:
+        return
+    end = time.perf_counter()
+    s = Span(name, start=end - seconds)
+    s.end = end
+    parent.children.append(s)  # append es atómico: puede venir de un hilo de Motor
+
+
+# ===== Almacén de trazas =====
+class Trace:
+    __slots__ = ("method", "route", "status", "root", "started_at")
+
+    def __init__(self, method: str, route: str, status: int, root: Span, started_at: datetime):
+        self.method, self.route, self.status = method, route, status
+        self.root, self.started_at = root, started_at
+
+    @property
+    def key(self) -> str:
+        return f"{self.method} {self.route}"
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "method": self.method,
+            "route": self.route,
+            "status": self.status,
+            "started_at": self.started_at.isoformat(),
+            "duration_ms": round(self.root.duration * 1000, 3),
+            "spans": self.root.to_dict(self.root.start),
+        }
+
+    def collapsed(self) -> list[str]:
+        """Líneas "marco;marco;... microsegundos_propios" (tiempo propio de cada span)."""
+        out: list[str] = []
+
+        def walk(s: Span, stack: str) -> None:
+            frame = f"{stack};{s.name}" if stack else s.name
+            own = s.duration - sum(c.duration for c in s.children)
+            if own > 0:
+                out.append(f"{frame} {int(own * 1e6)}")
+            for c in s.children:
+                walk(c, frame)
+
+        walk(self.root, self.key.replace(";", ","))
+        return out
+
+
+class TraceStore:
+    """Las `keep` trazas más lentas por ruta (min-heap: sale la más rápida)."""
+
+    def __init__(self) -> None:
+        self._by_route: dict[str, list[tuple[float, int, Trace]]] = {}
+        self._seq = itertools.count()
+
+    def add(self, trace: Trace) -> None:
+        heap = self._by_route.setdefault(trace.key, [])
+        item = (trace.root.duration, next(self._seq), trace)
+        if len(heap) < config["keep"]:
+            heapq.heappush(heap, item)
+        elif item[0] > heap[0][0]:
+            heapq.heapreplace(heap, item)
+
+    def traces(self, route: Optional[str] = None) -> list[Trace]:
+        out = [
+            t for key, heap in self._by_route.items()
+            if route is None or key == route or key.split(" ", 1)[1] == route
+            for _, _, t in heap
+        ]
+        return sorted(out, key=lambda t: t.root.duration, reverse=True)
+
+    def clear(self) -> None:
+        self._by_route.clear()
+
+    def __len__(self) -> int:
+        return sum(len(h) for h in self._by_route.values())
+
+
+store = TraceStore()
+
+
+class ProfilerMiddleware:
+    """Middleware ASGI puro; si el profiler está apagado sólo cuesta un if."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] != "http"
+            or not config["enabled"]
+            or random.random() >= config["sample_rate"]
+        ):
+            return await self.app(scope, receive, send)
+
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        started_at = datetime.now(timezone.utc)
+        root = Span("request")
+        token = _current.set(root)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            root.end = time.perf_counter()
+            _current.reset(token)
+            route = getattr(scope.get("route"), "path", None) or UNMATCHED_ROUTE
+            store.add(Trace(scope["method"], route, status, root, started_at))
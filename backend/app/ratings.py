@@ -0,0 +1,87 @@
+# backend/app/ratings.py
+# Agregado de valoraciones por producto, guardado en `productos.rating_stats`:
+#   {count, sum, hist: {"1": n, ..., "5": n}}
+# Se mantiene con $inc al crear cada comentario (comentarios.crear), así los
+# listados muestran el promedio sin consultar `comentarios`. Si alguna vez se
+# desajusta (borrados manuales, fallos entre las dos escrituras), se
+# reconstruye desde la colección:
+#
+#   cd backend && python -m app.ratings
+import asyncio
+from typing import Any
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo import UpdateMany, UpdateOne
+
+from . import database
+
+REBUILD_PIPELINE: list[dict[str, Any]] = [
+    {"$group": {"_id": {"p": "$producto_id", "r": "$rating"}, "n": {"$sum": 1}}},
+    {"$group": {
+        "_id": "$_id.p",
+        "count": {"$sum": "$n"},
+        "sum": {"$sum": {"$multiply": ["$_id.r", "$n"]}},
+        "hist": {"$push": {"k": {"$toString": "$_id.r"}, "v": "$n"}},
+    }},
+    {"$project": {"count": 1, "sum": 1, "hist": {"$arrayToObject": "$hist"}}},
+]
+
+
+def rating_inc(rating: int) -> dict[str, Any]:
+    """Update para sumar un comentario de `rating` estrellas al agregado."""
+    return {"$inc": {
+        "rating_stats.count": 1,
+        "rating_stats.sum": int(rating),
+        f"rating_stats.hist.{int(rating)}": 1,
+    }}
+
+
+def rating_stats_out(stats: dict[str, Any]) -> dict[str, Any]:
+    """Misma salida que schemas.RatingStats (con `avg`) sin pasar por pydantic."""
+    count, total = int(stats.get("count", 0)), int(stats.get("sum", 0))
+    return {
+        "count": count,
+        "sum": total,
+        "hist": {str(k): int(v) for k, v in (stats.get("hist") or {}).items()},
+        "avg": round(total / count, 2) if count else None,
+    }
+
+
+async def rebuild_rating_stats(db) -> int:
+    """
+    Recalcula `rating_stats` de todos los productos con una agregación sobre
+    `comentarios` y lo escribe con un único bulk_write. Devuelve cuántos
+    productos tienen comentarios.
+    """
+    ops: list[Any] = []
+    with_stats: list[ObjectId] = []
+    async for row in db.comentarios.aggregate(REBUILD_PIPELINE):
+        try:
+            oid = ObjectId(row["_id"])
+        except (InvalidId, TypeError):
+            continue
+        with_stats.append(oid)
+        ops.append(UpdateOne(
+            {"_id": oid},
+            {"$set": {"rating_stats": {"count": row["count"], "sum": row["sum"], "hist": row["hist"]}}},
+        ))
+    # productos que ya no tienen comentarios
+    ops.append(UpdateMany(
+        {"_id": {"$nin": with_stats}, "rating_stats": {"$exists": True}},
+        {"$unset": {"rating_stats": ""}},
+    ))
+    await db.productos.bulk_write(ops, ordered=False)
+    return len(with_stats)
+
+
+async def main() -> None:
+    await database.connect()
+    try:
+        print({"productos_con_rating": await rebuild_rating_stats(database.db)})
+    finally:
+        await database.disconnect()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,83 @@
+# backend/app/responses.py
+# Capa de respuesta JSON rápida (opt-in).
+# - FAST_JSON=1 (y orjson instalado): los cuerpos se codifican con orjson en
+#   lugar de json de la stdlib / jsonable_encoder.
+# - TRUST_MONGO_OUTPUT=1: los listados que salen de nuestras propias
+#   proyecciones se codifican sin re-validarlos contra su response_model; cada
+#   router aporta un `shape` (dict -> dict) que produce la misma salida que el
+#   modelo (alias, computed_fields, tipos). Ver load/bench/bench_responses.py.
+import json
+import os
+from datetime import datetime, timedelta
+from typing import Any, Callable, Iterable, Optional
+
+from bson import ObjectId
+from fastapi import Response
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+
+from .profiler import span
+
+try:
+    import orjson
+except ImportError:  # dependencia opcional
+    orjson = None
+
+FAST_JSON = os.getenv("FAST_JSON", "0") == "1" and orjson is not None
+TRUST_MONGO_OUTPUT = os.getenv("TRUST_MONGO_OUTPUT", "0") == "1"
+
+
+def _default(obj: Any) -> Any:
+    # Igual que MongoModel.json_encoders
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    raise TypeError(f"No serializable: {type(obj).__name__}")
+
+
+def _std_default(obj: Any) -> Any:
+    # Mismo formato de fecha que pydantic: UTC con "Z", naive tal cual
+    if isinstance(obj, datetime):
+        if obj.utcoffset() == timedelta(0):
+            return obj.replace(tzinfo=None).isoformat() + "Z"
+        return obj.isoformat()
+    return _default(obj)
+
+
+def dumps(obj: Any) -> bytes:
+    if FAST_JSON:
+        return orjson.dumps(obj, default=_default, option=orjson.OPT_UTC_Z)
+    return json.dumps(obj, default=_std_default, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse que codifica con `dumps` (orjson si FAST_JSON)."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def encode_list(
+    adapter: TypeAdapter,
+    docs: Iterable[dict],
+    shape: Optional[Callable[[dict], dict]] = None,
+) -> bytes:
+    """
+    Codifica una lista de documentos con la forma de su response_model.
+    `shape` pasa cada documento de Mongo a la salida del modelo; por defecto
+    el resultado se valida con pydantic, con TRUST_MONGO_OUTPUT se codifica
+    directamente.
+    """
+    with span("serialize"):
+        items = [shape(d) for d in docs] if shape is not None else list(docs)
+        if TRUST_MONGO_OUTPUT and shape is not None:
+            return dumps(items)
+        return adapter.dump_json(adapter.validate_python(items), by_alias=True)
+
+
+def list_response(
+    adapter: TypeAdapter,
+    docs: Iterable[dict],
+    shape: Optional[Callable[[dict], dict]] = None,
+    headers: Optional[dict[str, str]] = None,
+) -> Response:
+    return Response(content=encode_list(adapter, docs, shape), media_type="application/json", headers=headers)
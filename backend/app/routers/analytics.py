@@ -0,0 +1,34 @@
+# app/routers/analytics.py
+# Dashboard de ventas del admin (ver app/analytics.py).
+from datetime import date, timedelta
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+
+from .. import analytics, database
+from .auth import get_current_user
+
+MAX_DAYS = 366
+
+def _require_admin(user = Depends(get_current_user)):
+    if user.get("rol") != "admin":
+        raise HTTPException(status_code=403, detail="Solo admin")
+    return user
+
+router = APIRouter(prefix="/api/admin/analytics", tags=["admin:analytics"])
+
+# GET /api/admin/analytics?desde=2025-01-01&hasta=2025-02-01&top=10
+@router.get("")
+async def admin_analytics(
+    user = Depends(_require_admin),
+    desde: Optional[date] = Query(default=None, description="Primer día (incluido); por defecto hace 30 días"),
+    hasta: Optional[date] = Query(default=None, description="Último día (excluido); por defecto mañana"),
+    top: int = Query(default=10, ge=1, le=100),
+):
+    hasta = hasta or analytics.today() + timedelta(1)
+    desde = desde or hasta - timedelta(30)
+    if desde >= hasta:
+        raise HTTPException(status_code=400, detail="Rango inválido: desde debe ser anterior a hasta")
+    if (hasta - desde).days > MAX_DAYS:
+        raise HTTPException(status_code=400, detail=f"Rango máximo: {MAX_DAYS} días")
+    return await analytics.sales_analytics(database.db, desde, hasta, top)
@@ -2,7 +2,7 @@
 from fastapi import APIRouter, HTTPException, Header, Depends
 from pydantic import BaseModel, EmailStr, constr, Field  
 from datetime import datetime, timedelta, timezone
-import os, jwt
+import os, time, jwt
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from bson import ObjectId
 from bson.errors import InvalidId
@@ -11,12 +11,29 @@ from jwt import ExpiredSignatureError, InvalidTokenError
 
     
 from .. import database             
-from app.security import verify_password, hash_password  
+from ..admission import limiters
+from ..cache import TTLCache
+from ..images import externalize_image
+from ..profiler import profiled
+from app.security import verify_password_async, hash_password_async
 
 SECRET_KEY = os.getenv("SECRET_KEY", "dev-secret-change-me")
 ALGO = "HS256"
 ACCESS_EXPIRES_H = int(os.getenv("ACCESS_EXPIRES_H", "8")) 
 
+# token -> claims ya verificados; cada entrada vence en el `exp` del token
+_token_cache = TTLCache(
+    maxsize=int(os.getenv("AUTH_TOKEN_CACHE_MAX", "10000")),
+    ttl=ACCESS_EXPIRES_H * 3600,
+)
+# user_id -> documento de clientes sin el hash ni el avatar (_USER_PROJECTION);
+# TTL corto (cambios de rol tardan como mucho esto)
+_USER_PROJECTION = {"password_hash": 0, "avatarUrl": 0}
+_user_cache = TTLCache(
+    maxsize=int(os.getenv("AUTH_USER_CACHE_MAX", "10000")),
+    ttl=float(os.getenv("AUTH_USER_CACHE_TTL", "30")),
+)
+
 router = APIRouter(prefix="/api/auth", tags=["auth"])
 
 bearer_scheme = HTTPBearer(auto_error=False)
@@ -55,6 +72,26 @@ def create_access_token(payload: dict, expires_hours: int = ACCESS_EXPIRES_H) ->
     }
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGO)
 
+def decode_token(token: str) -> dict:
+    """jwt.decode con cache: un token ya verificado no se vuelve a verificar hasta su exp."""
+    data = _token_cache.get(token)
+    if data is not None:
+        return data
+    try:
+        data = jwt.decode(token, SECRET_KEY, algorithms=[ALGO])
+    except ExpiredSignatureError:
+        raise HTTPException(status_code=401, detail="Token expirado")
+    except InvalidTokenError:
+        raise HTTPException(status_code=401, detail="Token inválido")
+
+    exp = data.get("exp")
+    _token_cache.set(token, data, ttl=(exp - time.time()) if exp else None)
+    return data
+
+def invalidate_user(user_id: str) -> None:
+    """Llamar tras modificar el documento del cliente."""
+    _user_cache.pop(str(user_id))
+
 # ===== Dependencies =====
 async def get_current_user_id(
     credentials: HTTPAuthorizationCredentials | None = Depends(bearer_scheme)
@@ -63,14 +100,7 @@ async def get_current_user_id(
     if credentials is None or credentials.scheme.lower() != "bearer":
         raise HTTPException(status_code=401, detail="Falta token Bearer")
 
-    token = credentials.credentials
-    try:
-        data = jwt.decode(token, SECRET_KEY, algorithms=[ALGO])
-    except ExpiredSignatureError:
-        raise HTTPException(status_code=401, detail="Token expirado")
-    except InvalidTokenError:
-        raise HTTPException(status_code=401, detail="Token inválido")
-
+    data = decode_token(credentials.credentials)
     user_id = data.get("sub")
     if not user_id:
         raise HTTPException(status_code=401, detail="Token inválido")
@@ -84,14 +114,19 @@ async def get_current_user(user_id: str = Depends(get_current_user_id)):
         # El token tiene un sub inválido -> 401
         raise HTTPException(status_code=401, detail="Token inválido")
 
-    u = await database.db.clientes.find_one({"_id": oid})
-    if not u:
-        raise HTTPException(status_code=401, detail="Usuario no encontrado")
-    u["_id"] = str(u["_id"])
-    return u
+    u = _user_cache.get(user_id)
+    if u is None:
+        generation = _user_cache.generation  # un invalidate_user entretanto descarta esta lectura
+        u = await database.db.clientes.find_one({"_id": oid}, _USER_PROJECTION)
+        if not u:
+            raise HTTPException(status_code=401, detail="Usuario no encontrado")
+        u["_id"] = str(u["_id"])
+        _user_cache.set(user_id, u, generation=generation)
+    # copia: los handlers no deben modificar la entrada cacheada
+    return dict(u)
 
 # ===== Endpoints =====
-@router.post("/register", status_code=201)
+@router.post("/register", status_code=201, dependencies=[Depends(limiters["auth"])])
 async def register(payload: UserRegister):
     exists = await database.db.clientes.find_one({"email": payload.email})
     if exists:
@@ -99,7 +134,7 @@ async def register(payload: UserRegister):
 
     doc = {
         "email": payload.email,
-        "password_hash": hash_password(payload.password),
+        "password_hash": await hash_password_async(payload.password),
         "nombre": payload.nombre,
         "telefono": payload.telefono,
         "direccion": payload.direccion,
@@ -109,16 +144,22 @@ async def register(payload: UserRegister):
     res = await database.db.clientes.insert_one(doc)
     return {"_id": str(res.inserted_id), "email": doc["email"], "nombre": doc["nombre"], "rol": "customer"}
 
-@router.post("/login")
+_LOGIN_PROJECTION = {"email": 1, "rol": 1, "password_hash": 1}
+
+@router.post("/login", dependencies=[Depends(limiters["auth"])])
+@profiled("handler")
 async def login(payload: UserLogin):
-    user = await database.db.clientes.find_one({"email": payload.email})
-    if not user or not verify_password(payload.password, user.get("password_hash", "")):
+    # El hash siempre sale de Mongo, nunca de _user_cache
+    user = await database.db.clientes.find_one({"email": payload.email}, _LOGIN_PROJECTION)
+    if not user or not await verify_password_async(payload.password, user.get("password_hash", "")):
         raise HTTPException(status_code=401, detail="Credenciales inválidas")
     token = create_access_token({"sub": str(user["_id"]), "email": user["email"], "rol": user.get("rol", "customer")})
     return {"access_token": token, "token_type": "bearer"}
 
-@router.get("/me")
-async def me(user = Depends(get_current_user)):
+_ME_FIELDS = ("email", "nombre", "rol", "telefono", "direccion", "avatarUrl", "genero", "fecha_nacimiento")
+_ME_PROJECTION = {f: 1 for f in _ME_FIELDS}
+
+def _me_payload(user: dict) -> dict:
     return {
         "_id": user["_id"],
         "email": user["email"],
@@ -131,40 +172,44 @@ async def me(user = Depends(get_current_user)):
         "fecha_nacimiento": user.get("fecha_nacimiento"),
     }
 
+async def _me_doc(user_id: str) -> dict:
+    # avatarUrl no vive en _user_cache: /me lo lee de Mongo
+    u = await database.db.clientes.find_one({"_id": ObjectId(user_id)}, _ME_PROJECTION)
+    if not u:
+        raise HTTPException(status_code=401, detail="Usuario no encontrado")
+    return database.serialize_doc(u)
+
+@router.get("/me")
+async def me(user = Depends(get_current_user)):
+    return _me_payload(await _me_doc(user["_id"]))
+
 # app/routers/auth.py  (reemplaza tu update_me por este)
 @router.put("/me")
 async def update_me(payload: ProfileUpdate, user = Depends(get_current_user)):
     uid = ObjectId(user["_id"])
     updates = {k: v for k, v in payload.dict().items() if v is not None}
 
-    # 1) Validación previa del avatar (si viene como dataURL)
+    # 1) Validación previa del avatar (si viene como dataURL) y paso al almacén
+    #    de imágenes: el documento del cliente sólo guarda la referencia.
     av = updates.get("avatarUrl")
     if isinstance(av, str) and av.startswith("data:image"):
         if len(av) > 1_000_000:  # ~1MB en caracteres
             raise HTTPException(status_code=413, detail="Avatar demasiado grande")
-
-    # 2) Ahora sí, aplicar cambios
-    if updates:
-        res = await database.db.clientes.update_one({"_id": uid}, {"$set": updates})
-        if not res.acknowledged:
-            raise HTTPException(status_code=500, detail="No se pudo actualizar el perfil")
-
-    # 3) Leer de vuelta y devolver en el mismo formato que GET /me
-    u = await database.db.clientes.find_one({"_id": uid})
-    if not u:
+    if av:
+        updates["avatarUrl"] = await externalize_image(av)
+
+    # 2) Ahora sí, aplicar cambios; find_one_and_update devuelve el documento
+    #    ya actualizado, sin releerlo.
+    if not updates:
+        return _me_payload(await _me_doc(user["_id"]))
+    u = await database.update_serialized(
+        database.db.clientes, {"_id": uid}, {"$set": updates}, projection=_ME_PROJECTION
+    )
+    if u is None:
         raise HTTPException(status_code=500, detail="Usuario no encontrado tras update")
+    invalidate_user(user["_id"])
 
-    return {
-        "_id": str(u["_id"]),
-        "email": u["email"],
-        "nombre": u.get("nombre"),
-        "rol": u.get("rol", "customer"),
-        "telefono": u.get("telefono"),
-        "direccion": u.get("direccion"),
-        "avatarUrl": u.get("avatarUrl"),
-        "genero": u.get("genero"),
-        "fecha_nacimiento": u.get("fecha_nacimiento"),
-    }
+    return _me_payload(u)
 
 
 
@@ -172,13 +217,16 @@ async def update_me(payload: ProfileUpdate, user = Depends(get_current_user)):
 async def change_password(payload: PasswordChange, user = Depends(get_current_user)):
     uid = ObjectId(user["_id"])
 
-    if not verify_password(payload.current_password, user.get("password_hash", "")):
+    # El hash se relee siempre: _user_cache no lo guarda
+    stored = await database.db.clientes.find_one({"_id": uid}, {"password_hash": 1})
+    if not stored or not await verify_password_async(payload.current_password, stored.get("password_hash", "")):
         raise HTTPException(status_code=400, detail="Contraseña actual incorrecta")
 
-    new_hash = hash_password(payload.new_password)
+    new_hash = await hash_password_async(payload.new_password)
     res = await database.db.clientes.update_one(
         {"_id": uid}, {"$set": {"password_hash": new_hash}}
     )
     if not res.acknowledged:
         raise HTTPException(status_code=500, detail="No se pudo actualizar la contraseña")
+    invalidate_user(user["_id"])
     return {"ok": True}
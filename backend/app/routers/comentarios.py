@@ -1,10 +1,17 @@
 # app/routers/comentarios.py
-from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi import APIRouter, HTTPException, Depends, Query, Request
 from bson import ObjectId
 from datetime import datetime, timezone
+from typing import Optional
+from pydantic import TypeAdapter
 
 from .. import database
-from ..schemas import ComentarioIn, ComentarioOut
+from ..admission import limiters
+from ..conditional import conditional_response
+from ..pagination import keyset_query, keyset_sort, fetch_page, set_next_cursor
+from ..ratings import rating_inc
+from ..responses import encode_list
+from ..schemas import ComentarioIn, ComentarioOut, RatingStats
 from .auth import get_current_user_id
 
 router = APIRouter(prefix="/api/comentarios", tags=["comentarios"])
@@ -15,33 +22,103 @@ def _oid(s: str) -> ObjectId:
   except Exception:
       raise HTTPException(status_code=400, detail="producto_id inválido")
 
-# GET /api/comentarios?producto_id=...&limit=50
+_comentarios_adapter = TypeAdapter(list[ComentarioOut])
+
+# GET /api/comentarios/ratings?producto_id=a&producto_id=b
+@router.get("/ratings", response_model=dict[str, RatingStats])
+async def ratings(producto_id: list[str] = Query(..., max_length=200)):
+    """Agregados de varios productos en una sola consulta (productos sin comentarios -> vacío)."""
+    ids = [_oid(p) for p in producto_id]
+    cursor = database.db.productos.find({"_id": {"$in": ids}}, {"rating_stats": 1})
+    out = {p: {} for p in producto_id}
+    async for d in cursor:
+        out[str(d["_id"])] = d.get("rating_stats") or {}
+    return out
+
+def _serialize(d: dict) -> dict:
+    d["_id"] = str(d["_id"])
+    if isinstance(d.get("usuario_id"), ObjectId):
+        d["usuario_id"] = str(d["usuario_id"])
+    # rating como int seguro
+    if "rating" in d:
+        try:
+            d["rating"] = int(d["rating"])
+        except Exception:
+            d["rating"] = 0
+    return d
+
+_LIST_PROJECTION = {"producto_id": 1, "usuario_id": 1, "texto": 1, "rating": 1, "creadoAt": 1}
+
+def _comentario_shape(d: dict) -> dict:
+    """ComentarioOut a partir de un documento ya pasado por _serialize."""
+    return {
+        "_id": d["_id"],
+        "producto_id": d["producto_id"],
+        "usuario_id": d["usuario_id"],
+        "texto": d["texto"],
+        "rating": d["rating"],
+        "creadoAt": d["creadoAt"],
+    }
+
+# GET /api/comentarios/batch?producto_id=a&producto_id=b&k=3
+@router.get("/batch", response_model=dict[str, list[ComentarioOut]])
+async def listar_batch(
+    producto_id: list[str] = Query(..., max_length=100),
+    k: int = Query(3, ge=1, le=20, description="Comentarios más recientes por producto"),
+):
+    """
+    Top-K comentarios de muchos productos en UNA agregación (en vez de una
+    petición por tarjeta del catálogo). Ver _batch_pipeline.
+    """
+    ids = list(dict.fromkeys(producto_id))
+    out: dict[str, list[dict]] = {p: [] for p in ids}
+    async for d in database.list_collection("comentarios").aggregate(_batch_pipeline(ids, k)):
+        out[d["producto_id"]].append(_serialize(d))
+    return out
+
+def _top_k(producto_id: str, k: int) -> list[dict]:
+    # Rango del índice (producto_id, creadoAt, _id) cortado en K: lee K documentos
+    return [
+        {"$match": {"producto_id": producto_id}},
+        {"$sort": {"creadoAt": -1, "_id": -1}},
+        {"$limit": k},
+        {"$project": _LIST_PROJECTION},
+    ]
+
+def _batch_pipeline(ids: list[str], k: int) -> list[dict]:
+    """
+    Una rama por producto unidas con $unionWith: un solo round trip y cada
+    rama lee sólo sus K documentos del índice. Un $match $in + $group leería
+    todos los comentarios de esos productos para quedarse con K.
+    Salen agrupados por producto y, dentro, del más reciente al más antiguo.
+    """
+    first, *rest = ids
+    return _top_k(first, k) + [
+        {"$unionWith": {"coll": "comentarios", "pipeline": _top_k(pid, k)}} for pid in rest
+    ]
+
+# GET /api/comentarios?producto_id=...&limit=50&cursor=...
 @router.get("", response_model=list[ComentarioOut])
 async def listar(
+    request: Request,
     producto_id: str = Query(..., description="ID del producto"),
     limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = Query(default=None, description="X-Next-Cursor de la página anterior"),
 ):
-    # ❗ CAMBIO: evitar utilidad externa; serializar a mano
-    cursor = (
-        database.db.comentarios
-        .find({"producto_id": producto_id})
-        .sort("creadoAt", -1)
-        .limit(limit)
-    )
-    docs = await cursor.to_list(length=limit)
-    for d in docs:
-        d["_id"] = str(d["_id"])
-        if isinstance(d.get("usuario_id"), ObjectId):
-            d["usuario_id"] = str(d["usuario_id"])
-        # rating como int seguro
-        if "rating" in d:
-            try:
-                d["rating"] = int(d["rating"])
-            except Exception:
-                d["rating"] = 0
-    return docs
-
-@router.post("", response_model=ComentarioOut, status_code=201)
+    # Paginación keyset sobre (creadoAt, _id): cada página es un rango del índice
+    query = keyset_query({"producto_id": producto_id}, "creadoAt", cursor)
+    cur = database.list_collection("comentarios").find(query, _LIST_PROJECTION).sort(keyset_sort("creadoAt"))
+    docs, next_cursor = await fetch_page(cur, limit, "creadoAt")
+    docs = [_serialize(d) for d in docs]
+
+    # Sólo ETag: Last-Modified tiene resolución de segundos y un comentario
+    # publicado en el mismo segundo que el último no lo movería
+    body = encode_list(_comentarios_adapter, docs, _comentario_shape)
+    response = conditional_response(request, body)
+    set_next_cursor(response, next_cursor)
+    return response
+
+@router.post("", response_model=ComentarioOut, status_code=201, dependencies=[Depends(limiters["comentarios"])])
 async def crear(payload: ComentarioIn, user_id: str = Depends(get_current_user_id)):
     # Validar producto (aceptando "activo" o "disponible")
     prod = await database.db.productos.find_one({
@@ -51,7 +128,7 @@ async def crear(payload: ComentarioIn, user_id: str = Depends(get_current_user_i
             {"disponible": True},
             {"activo": {"$exists": False}, "disponible": {"$exists": False}},
         ],
-    })
+    }, {"_id": 1})
     if not prod:
         raise HTTPException(status_code=404, detail="Producto no disponible")
 
@@ -65,9 +142,9 @@ async def crear(payload: ComentarioIn, user_id: str = Depends(get_current_user_i
     if not doc["texto"]:
         raise HTTPException(status_code=422, detail="El comentario no puede estar vacío")
 
-    res = await database.db.comentarios.insert_one(doc)
-    creado = await database.db.comentarios.find_one({"_id": res.inserted_id})
-    creado["_id"] = str(creado["_id"])
-    if isinstance(creado.get("usuario_id"), ObjectId):
-        creado["usuario_id"] = str(creado["usuario_id"])
+    creado = await database.insert_serialized(database.db.comentarios, doc, serialize=_serialize)
+    # agregado de valoraciones del producto (lo muestra el catálogo). No se
+    # vacía catalog_cache: las valoraciones del listado pueden tardar hasta
+    # CATALOG_CACHE_TTL; GET /ratings lee siempre de Mongo
+    await database.db.productos.update_one({"_id": prod["_id"]}, rating_inc(doc["rating"]))
     return creado
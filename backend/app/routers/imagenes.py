@@ -0,0 +1,45 @@
+# app/routers/imagenes.py
+from fastapi import APIRouter, HTTPException, Path, Request, Response
+from fastapi.responses import StreamingResponse
+
+from ..images import ALLOWED_IMAGE_TYPES, IMAGE_SECURITY_HEADERS, open_image
+
+router = APIRouter(prefix="/api/imagenes", tags=["imagenes"])
+
+# El contenido nunca cambia para un mismo sha256: cache de un año, inmutable
+_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+@router.get("/{digest}")
+async def obtener_imagen(request: Request, digest: str = Path(pattern="^[0-9a-f]{64}$")):
+    etag = f'"{digest}"'
+    if request.headers.get("if-none-match") in (etag, f"W/{etag}"):
+        return Response(
+            status_code=304,
+            headers={"ETag": etag, "Cache-Control": _CACHE_CONTROL, **IMAGE_SECURITY_HEADERS},
+        )
+
+    grid_out = await open_image(digest)
+    if grid_out is None:
+        raise HTTPException(status_code=404, detail="Imagen no encontrada")
+    # Blobs anteriores a la lista blanca (p. ej. SVG) no se sirven
+    content_type = (grid_out.metadata or {}).get("contentType")
+    if content_type not in ALLOWED_IMAGE_TYPES:
+        raise HTTPException(status_code=415, detail="Formato de imagen no admitido")
+
+    async def chunks():
+        while True:
+            chunk = await grid_out.readchunk()
+            if not chunk:
+                break
+            yield chunk
+
+    return StreamingResponse(
+        chunks(),
+        media_type=content_type,
+        headers={
+            **IMAGE_SECURITY_HEADERS,
+            "ETag": etag,
+            "Cache-Control": _CACHE_CONTROL,
+            "Content-Length": str(grid_out.length),
+        },
+    )
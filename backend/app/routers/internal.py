@@ -0,0 +1,57 @@
+# app/routers/internal.py
+# Endpoints operativos (no forman parte de la API pública ni del esquema).
+# Exigen METRICS_TOKEN en la cabecera X-Metrics-Token. Sin METRICS_TOKEN
+# definido quedan apagados (404): nada de métricas públicas por descuido.
+import os
+import secrets
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Response
+
+from .. import admission, database, metrics, security, streams
+from ..cache import catalog_cache
+from ..mongo_metrics import metrics as mongo_metrics
+
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
+def require_metrics_token(x_metrics_token: Optional[str] = Header(default=None)):
+    if not METRICS_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not secrets.compare_digest(x_metrics_token or "", METRICS_TOKEN):
+        raise HTTPException(status_code=403, detail="Solo uso interno")
+
+router = APIRouter(
+    prefix="/internal",
+    tags=["internal"],
+    include_in_schema=False,
+    dependencies=[Depends(require_metrics_token)],
+)
+
+# GET /metrics: formato de exposición de Prometheus (un scrape por worker)
+prometheus = APIRouter(
+    tags=["internal"],
+    include_in_schema=False,
+    dependencies=[Depends(require_metrics_token)],
+)
+
+@prometheus.get("/metrics")
+async def prometheus_metrics():
+    return Response(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+def _cache_stats(cache) -> dict:
+    return {"size": len(cache), "hits": cache.hits, "misses": cache.misses}
+
+# Métricas de ESTE worker: cada proceso de uvicorn tiene su propio pool
+@router.get("/metrics")
+async def internal_metrics():
+    return {
+        "pid": os.getpid(),
+        "mongo": {
+            "client_options": database.client_options(),
+            **mongo_metrics.snapshot(),
+        },
+        "hashing": dict(security.hash_stats),
+        "catalog_cache": _cache_stats(catalog_cache),
+        "streams": streams.stats(),
+        "admission": admission.stats(),
+    }
@@ -1,16 +1,25 @@
 # app/routers/orders.py
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Header, Path, Query, Request, Response
 from datetime import datetime, timezone
 from bson import ObjectId
-from typing import Any
+from typing import Any, Optional
+import os
 import re
-from pydantic import BaseModel
+from pydantic import BaseModel, TypeAdapter
 from ..schemas import OrderCreate, OrderOut, CartItem, OrderStatus 
 
 
-from .. import database
+from .. import analytics, database, idempotency, pricing
+from ..admission import limiters
+from ..counters import next_order_code
+from ..profiler import profiled
+from ..pagination import keyset_query, keyset_sort, page_size, fetch_page, set_next_cursor, MAX_PAGE_SIZE
+from ..responses import list_response
+from ..streams import (
+    STREAM_TICKET_TTL, ChangeStreamHub, Event, issue_ticket, redeem_ticket, register, sse_response,
+)
 from ..schemas import OrderCreate, OrderOut, CartItem
-from .auth import get_current_user_id
+from .auth import bearer_scheme, decode_token, get_current_user_id
 
 router = APIRouter(prefix="/api/orders", tags=["orders"])
 
@@ -20,41 +29,44 @@ def _oid(s: str) -> ObjectId:
     except Exception:
         raise HTTPException(400, f"ObjectId inválido: {s}")
 
-def _order_code() -> str:
-    return datetime.now(timezone.utc).strftime("SR-%Y%m%d-%H%M%S")
+# Sólo lo que muestra OrderOut: no traemos items/delivery en los listados
+_LIST_PROJECTION = {"code": 1, "total": 1, "status": 1, "createdAt": 1, "creadoAt": 1}
+
+_orders_adapter = TypeAdapter(list[OrderOut])
+
+def _order_shape(o: dict[str, Any]) -> dict[str, Any]:
+    """OrderOut a partir de _LIST_PROJECTION."""
+    return {
+        "_id": str(o["_id"]),  # ya es str con database.list_collection
+        "code": o.get("code"),
+        "total": float(o.get("total", 0)),
+        "status": o.get("status", "CREATED"),
+        # Para mantener compat con el front que usa 'creadoAt'
+        "creadoAt": o.get("createdAt") or o.get("creadoAt"),
+    }
 
 # app/routers/orders.py
 
+@profiled()
 async def _calc_total_snapshot_and_reserve(items: list[CartItem]) -> tuple[float, list[dict[str, Any]]]:
     """
     Versión sin inventario: no valida ni descuenta stock.
     Solo verifica que el producto exista y esté activo, y calcula totales.
+    Todas las líneas se resuelven en una sola consulta (ver pricing.price_cart).
     """
-    total = 0.0
-    snapshot: list[dict[str, Any]] = []
-
-    for it in items:
-        prod = await database.db.productos.find_one({"_id": _oid(it.producto_id), "activo": True})
-        if not prod:
-            raise HTTPException(400, f"Producto no disponible: {it.producto_id}")
-
-        precio = float(prod.get("precio", 0))
-        subtotal = precio * it.qty
-        total += subtotal
-
-        snapshot.append({
-            "producto_id": str(prod["_id"]),
-            "nombre": prod.get("nombre"),
-            "precio": precio,
-            "qty": it.qty,
-            "subtotal": round(subtotal, 2),
-            "imagenUrl": prod.get("imagenUrl"),
-        })
-
-    return round(total, 2), snapshot
-
-@router.post("", response_model=OrderOut, status_code=201)
-async def create_order(payload: OrderCreate, user_id: str = Depends(get_current_user_id)):
+    total, snapshot, missing = await pricing.price_cart(items)
+    if missing:
+        raise HTTPException(400, f"Producto no disponible: {missing[0]}")
+    return total, snapshot
+
+@router.post("", response_model=OrderOut, status_code=201, dependencies=[Depends(limiters["orders"])])
+@profiled("handler")
+async def create_order(
+    payload: OrderCreate,
+    response: Response,
+    user_id: str = Depends(get_current_user_id),
+    idempotency_key: Optional[str] = Header(default=None, alias="Idempotency-Key", min_length=1, max_length=255),
+):
     if not payload.items:
         raise HTTPException(400, "Carrito vacío")
 
@@ -66,10 +78,24 @@ async def create_order(payload: OrderCreate, user_id: str = Depends(get_current_
     if not payload.delivery_direccion or len(payload.delivery_direccion.strip()) < 5:
         raise HTTPException(status_code=422, detail="Dirección muy corta")
 
+    if idempotency_key is None:
+        return await _insert_order(payload, user_id)
+    # Reintento del mismo pedido: se devuelve la respuesta original sin cotizar ni insertar
+    body, replayed = await idempotency.execute(
+        idempotency.scoped_key("orders", user_id, idempotency_key),
+        idempotency.fingerprint(payload),
+        lambda: _insert_order(payload, user_id),
+    )
+    if replayed:
+        response.headers[idempotency.REPLAYED_HEADER] = "true"
+    return body
+
+async def _insert_order(payload: OrderCreate, user_id: str) -> dict[str, Any]:
     total, items_snapshot = await _calc_total_snapshot_and_reserve(payload.items)
 
+    now = datetime.now(timezone.utc)
     doc = {
-        "code": _order_code(),
+        "code": await next_order_code(now),
         "userId": _oid(user_id),
         "items": items_snapshot,
         "total": total,
@@ -80,7 +106,7 @@ async def create_order(payload: OrderCreate, user_id: str = Depends(get_current_
             "direccion": payload.delivery_direccion,
             "notas": payload.notas,
         },
-        "createdAt": datetime.now(timezone.utc),
+        "createdAt": now,
     }
 
     res = await database.db.pedidos.insert_one(doc)
@@ -93,18 +119,31 @@ async def create_order(payload: OrderCreate, user_id: str = Depends(get_current_
     }
 
 @router.get("", response_model=list[OrderOut])
-async def my_orders(user_id: str = Depends(get_current_user_id)):
-    cur = database.db.pedidos.find({"userId": _oid(user_id)}).sort("createdAt", -1)
-    out: list[dict[str, Any]] = []
-    async for o in cur:
-        out.append({
-            "_id": str(o["_id"]),
-            "code": o["code"],
-            "total": float(o["total"]),
-            "status": o["status"],
-            "creadoAt": o["createdAt"],
-        })
-    return out
+async def my_orders(
+    user_id: str = Depends(get_current_user_id),
+    limit: Optional[int] = Query(default=None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(default=None, description="X-Next-Cursor de la página anterior"),
+):
+    query = keyset_query({"userId": _oid(user_id)}, "createdAt", cursor)
+    cur = database.list_collection("pedidos").find(query, _LIST_PROJECTION).sort(keyset_sort("createdAt"))
+    docs, next_cursor = await fetch_page(cur, page_size(limit), "createdAt")
+
+    response = list_response(_orders_adapter, docs, _order_shape)
+    set_next_cursor(response, next_cursor)
+    return response
+
+# Declarada antes de /{order_id}; la sirve el índice único de pedidos.code
+@router.get("/by-code/{code}")
+async def order_by_code(
+    code: str = Path(..., max_length=40, pattern=r"^SR-\d{8}-\d{6,}$"),
+    user_id: str = Depends(get_current_user_id),
+):
+    o = await database.db.pedidos.find_one({"code": code, "userId": _oid(user_id)})
+    if not o:
+        raise HTTPException(404, "Pedido no encontrado")
+    o["_id"] = str(o["_id"])
+    o["userId"] = str(o["userId"])
+    return o
 
 @router.get("/{order_id}")
 async def order_detail(order_id: str, user_id: str = Depends(get_current_user_id)):
@@ -125,21 +164,121 @@ def _require_admin(user = Depends(get_current_user)):
 
 admin = _APIRouter(prefix="/api/admin/orders", tags=["admin:orders"])
 
+# ----- Tablero en vivo (SSE desde un change stream de `pedidos`) -----
+OPEN_STATUSES = ("CREATED", "PAID")
+BOARD_SNAPSHOT_MAX = int(os.getenv("BOARD_SNAPSHOT_MAX", "500"))
+_BOARD_FIELDS = {"code", "total", "status", "createdAt"}
+_OPEN_ORDERS_QUERY = {"createdAt": {"$type": "date"}, "status": {"$in": list(OPEN_STATUSES)}}
+
+def _pedido_change(change: dict[str, Any]) -> Optional[dict[str, Any]]:
+    """
+    Evento del change stream -> {"op": "upsert", "pedido": OrderOut} | {"op": "delete", "_id"}.
+    Sólo pedidos con createdAt (los legacy sin migrar no están en el tablero, ver
+    migrate_orders.py) y sólo updates que tocan lo que muestra OrderOut.
+    """
+    pid = str(change["documentKey"]["_id"])
+    if change["operationType"] == "delete":
+        return {"op": "delete", "_id": pid}
+    doc = change.get("fullDocument")
+    if doc is None or not isinstance(doc.get("createdAt"), datetime):
+        return None
+    if change["operationType"] == "update":
+        desc = change.get("updateDescription") or {}
+        roots = {f.split(".", 1)[0] for f in (desc.get("updatedFields") or {})}
+        if not roots & _BOARD_FIELDS:
+            return None
+    return {"op": "upsert", "pedido": _order_shape(doc)}
+
+pedidos_hub = register(ChangeStreamHub(
+    "pedidos",
+    _pedido_change,
+    pipeline=[
+        {"$match": {"operationType": {"$in": ["insert", "update", "replace", "delete"]}}},
+        # items/delivery no viajan por el stream: el tablero sólo usa OrderOut
+        {"$project": {"fullDocument.items": 0, "fullDocument.delivery": 0}},
+    ],
+    full_document="updateLookup",
+    event_type="pedido",
+))
+
+async def _open_orders_snapshot() -> Event:
+    cur = database.list_collection("pedidos").find(
+        _OPEN_ORDERS_QUERY, _LIST_PROJECTION,
+    ).sort(keyset_sort("createdAt")).limit(BOARD_SNAPSHOT_MAX)
+    docs = await cur.to_list(length=BOARD_SNAPSHOT_MAX)
+    return Event(None, "snapshot", [_order_shape(d) for d in docs])
+
+_BOARD_TICKET_SCOPE = "admin:orders:stream"
+
+async def _require_admin_stream(
+    ticket: Optional[str] = Query(default=None, description="De POST /api/admin/orders/stream-ticket"),
+    credentials = Depends(bearer_scheme),
+):
+    # Bearer para clientes que sí mandan cabeceras; en la URL sólo el ticket
+    if credentials is not None:
+        user_id = decode_token(credentials.credentials).get("sub") or ""
+    elif ticket:
+        user_id = await redeem_ticket(ticket, _BOARD_TICKET_SCOPE)
+        if user_id is None:
+            raise HTTPException(status_code=401, detail="Ticket inválido o vencido")
+    else:
+        raise HTTPException(status_code=401, detail="Falta ticket o token Bearer")
+    return _require_admin(await get_current_user(user_id))
+
+@admin.post("/stream-ticket")
+async def admin_orders_stream_ticket(user = Depends(_require_admin)):
+    """Ticket de un solo uso (vence en `expires_in` s) para abrir GET /stream?ticket=."""
+    ticket = await issue_ticket(user["_id"], _BOARD_TICKET_SCOPE)
+    return {"ticket": ticket, "expires_in": STREAM_TICKET_TTL}
+
+@admin.get("/stream")
+async def admin_orders_stream(
+    request: Request,
+    user = Depends(_require_admin_stream),
+    last_event_id: Optional[str] = Query(default=None, alias="lastEventId"),
+):
+    """
+    Tablero de pedidos en vivo (Server-Sent Events).
+    Primero un evento "snapshot" con los pedidos abiertos (CREATED/PAID); luego
+    un evento "pedido" por alta, cambio de estado o borrado. Al reconectar con
+    Last-Event-ID se reenvía lo perdido; si ya no se puede, otro snapshot.
+    Como el ticket es de un solo uso, el front reconecta con uno nuevo y pasa
+    el último id en `lastEventId` (EventSource no deja fijar la cabecera).
+    """
+    return sse_response(
+        request,
+        pedidos_hub,
+        request.headers.get("last-event-id") or last_event_id,
+        snapshot=_open_orders_snapshot,
+    )
+
 @admin.get("", response_model=list[OrderOut])
-async def admin_list_orders(user = Depends(_require_admin)):
-    # Colección unificada: "pedidos"
-    cur = database.db.pedidos.find({}).sort("createdAt", -1)
-    out: list[dict[str, Any]] = []
-    async for o in cur:
-        out.append({
-            "_id": str(o["_id"]),
-            "code": o.get("code"),
-            "total": float(o.get("total", 0)),
-            "status": o.get("status", "CREATED"),
-            # Para mantener compat con el front que usa 'creadoAt'
-            "creadoAt": o.get("createdAt") or o.get("creadoAt"),
-        })
-    return out
+async def admin_list_orders(
+    user = Depends(_require_admin),
+    limit: Optional[int] = Query(default=None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(default=None, description="X-Next-Cursor de la página anterior"),
+    status: Optional[OrderStatus] = None,
+    desde: Optional[datetime] = Query(default=None, description="createdAt >= desde"),
+    hasta: Optional[datetime] = Query(default=None, description="createdAt < hasta"),
+):
+    # Colección unificada: "pedidos". La paginación va por createdAt; los pedidos
+    # de /api/pedidos lo escriben y los antiguos lo reciben en migrate_orders.py.
+    rango: dict[str, Any] = {"$type": "date"}
+    if desde:
+        rango["$gte"] = desde
+    if hasta:
+        rango["$lt"] = hasta
+    base: dict[str, Any] = {"createdAt": rango}
+    if status:
+        base["status"] = status
+
+    query = keyset_query(base, "createdAt", cursor)
+    cur = database.list_collection("pedidos").find(query, _LIST_PROJECTION).sort(keyset_sort("createdAt"))
+    docs, next_cursor = await fetch_page(cur, page_size(limit), "createdAt")
+
+    response = list_response(_orders_adapter, docs, _order_shape)
+    set_next_cursor(response, next_cursor)
+    return response
 
 @admin.get("/{order_id}")
 async def admin_order_detail(order_id: str, user = Depends(_require_admin)):
@@ -164,19 +303,15 @@ class _StatusPatch(BaseModel):
 
 @admin.patch("/{order_id}")
 async def admin_update_status(order_id: str, body: _StatusPatch, user = Depends(_require_admin)):
-    res = await database.db.pedidos.update_one(
+    doc = await database.update_serialized(
+        database.db.pedidos,
         {"_id": _oid(order_id)},
-        {"$set": {"status": body.status, "estado": body.status}}
+        {"$set": {"status": body.status, "estado": body.status}},
+        projection=_LIST_PROJECTION,
     )
-    if res.matched_count == 0:
+    if doc is None:
         raise HTTPException(404, "Pedido no encontrado")
+    # el rollup de ese día (si ya cerró) quedó desactualizado
+    await analytics.invalidate_day(database.db, doc.get("createdAt"))
 
-    doc = await database.db.pedidos.find_one({"_id": _oid(order_id)})
-    doc["_id"] = str(doc["_id"])
-    return {
-        "_id": doc["_id"],
-        "code": doc.get("code"),
-        "total": float(doc.get("total", 0)),
-        "status": doc.get("status"),
-        "creadoAt": doc.get("createdAt") or doc.get("creadoAt"),
-    }
+    return _order_shape(doc)
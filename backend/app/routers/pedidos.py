@@ -1,72 +1,91 @@
 from fastapi import APIRouter, HTTPException, Depends, status
 from datetime import datetime, timezone
-from .. import database
+from .. import database, inventory, pricing
+from ..admission import limiters
+from ..cache import catalog_cache
+from ..counters import next_order_code
 from ..schemas import PedidoIn, PedidoOut
 from .auth import get_current_user, get_current_user_id 
 
 router = APIRouter(prefix="/api/pedidos", tags=["pedidos"])
 
-@router.post("", response_model=dict, status_code=201)
+@router.post("", response_model=dict, status_code=201, dependencies=[Depends(limiters["orders"])])
 async def crear_pedido(payload: PedidoIn, user = Depends(get_current_user)):
     if not payload.items:
         raise HTTPException(400, "El pedido debe tener items")
 
-    # Validar y calcular total, descontar stock
+    # Validar y calcular total (productos en una sola consulta)
+    lines = pricing.merge_lines(payload.items)
+    prods = await pricing.fetch_products(lines)
+
     total = 0.0
     items_doc = []
-    for it in payload.items:
-        prod = await database.db.productos.find_one({"_id": database.to_object_id(it.producto_id), "activo": True})
+    reserva = {}
+    conflictos = []
+    for pid, qty in lines.items():
+        prod = prods.get(pid)
         if not prod:
-            raise HTTPException(404, f"Producto {it.producto_id} no encontrado")
-        if prod.get("stock", 0) < it.qty:
-            raise HTTPException(409, f"Sin stock para {prod['nombre']}")
-
-        # descontar stock (update atómico)
-        res = await database.db.productos.update_one(
-            {"_id": prod["_id"], "stock": {"$gte": it.qty}},
-            {"$inc": {"stock": -it.qty}}
-        )
-        if res.matched_count == 0:
-            raise HTTPException(409, f"Stock cambió para {prod['nombre']}")
+            raise HTTPException(404, f"Producto {pid} no encontrado")
+        if prod.get("stock", 0) < qty:
+            conflictos.append({
+                "producto_id": pid,
+                "nombre": prod.get("nombre"),
+                "solicitado": qty,
+                "disponible": int(prod.get("stock", 0)),
+            })
+        reserva[prod["_id"]] = qty
 
-        linea_total = float(prod["precio"]) * it.qty
+        linea_total = float(prod["precio"]) * qty
         total += linea_total
         items_doc.append({
             "producto_id": str(prod["_id"]),
             "nombre": prod["nombre"],
             "precio": float(prod["precio"]),
-            "qty": it.qty,
+            "qty": qty,
             "subtotal": linea_total
         })
 
-    doc = {
-        "usuario_id": user["_id"],
-        "items": items_doc,
-        "total": round(total, 2),
-        "estado": "creado",
-        "delivery": {
-            "nombre": payload.delivery_nombre,
-            "telefono": payload.delivery_telefono,
-            "direccion": payload.delivery_direccion,
-            "notas": payload.notas,
-        },
-        "creadoAt": datetime.now(timezone.utc),
-    }
-    ins = await database.db.pedidos.insert_one(doc)
+    # Descontar stock de todas las líneas a la vez (todo o nada)
+    if not conflictos:
+        conflictos = await inventory.reserve(reserva)
+    if conflictos:
+        raise HTTPException(409, {"msg": "Sin stock suficiente", "conflictos": conflictos})
+
+    # createdAt/status/code: el pedido entra en el listado admin, el tablero y
+    # la analítica igual que los de /api/orders. Desde aquí el stock ya está
+    # reservado: si falla el contador o el insert, se devuelve.
+    now = datetime.now(timezone.utc)
+    try:
+        doc = {
+            "code": await next_order_code(now),
+            "usuario_id": user["_id"],
+            "items": items_doc,
+            "total": round(total, 2),
+            "estado": "creado",
+            "status": "CREATED",
+            "delivery": {
+                "nombre": payload.delivery_nombre,
+                "telefono": payload.delivery_telefono,
+                "direccion": payload.delivery_direccion,
+                "notas": payload.notas,
+            },
+            "creadoAt": now,
+            "createdAt": now,
+        }
+        ins = await database.db.pedidos.insert_one(doc)
+    except Exception:
+        await inventory.release(reserva)
+        raise
+    finally:
+        # el stock forma parte del catálogo cacheado (reservado o devuelto)
+        catalog_cache.clear()
     return {"_id": str(ins.inserted_id), "total": doc["total"], "estado": doc["estado"]}
 
 @router.get("/mios", response_model=list[PedidoOut])
 async def mis_pedidos(user_id: str = Depends(get_current_user_id)):
-    cur = database.db.pedidos.find({"usuario_id": user_id}).sort("creadoAt", -1)
-    res = []
-    async for p in cur:
-        p["_id"] = str(p["_id"])
-        res.append({
-            "_id": p["_id"],
-            "usuario_id": p["usuario_id"],
-            "items": p["items"],
-            "total": p["total"],
-            "estado": p["estado"],
-            "creadoAt": p["creadoAt"],
-        })
-    return res
+    # Los documentos ya salen con la forma de PedidoOut (ObjectId -> str en el codec)
+    cur = database.list_collection("pedidos").find(
+        {"usuario_id": user_id},
+        {"usuario_id": 1, "items": 1, "total": 1, "estado": 1, "creadoAt": 1},
+    ).sort("creadoAt", -1)
+    return await cur.to_list(length=None)
@@ -1,10 +1,22 @@
 # app/routers/productos.py
-from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi import APIRouter, HTTPException, Depends, Query, Request, Response
+from fastapi.responses import RedirectResponse
 from typing import List, Optional, Any, Dict
+from datetime import datetime, timezone
 from bson import ObjectId
 from bson.errors import InvalidId
+from pydantic import TypeAdapter
 
 from .. import database
+from ..cache import catalog_cache
+from ..ratings import rebuild_rating_stats, rating_stats_out
+from ..responses import encode_list
+from ..streams import ChangeStreamHub, register, sse_response
+from ..conditional import conditional_response, make_etag
+from ..images import (
+    IMAGE_SECURITY_HEADERS, PRODUCT_IMAGE_REF_EXPR, check_image, externalize_image, is_data_url,
+    is_product_image_ref, parse_data_url, product_image_ref,
+)
 from ..schemas import ProductoIn, ProductoOut, ProductoPatch
 from .auth import get_current_user  # para chequear rol admin
 
@@ -19,10 +31,12 @@ def require_admin(user = Depends(get_current_user)):
 
 @admin.get("", response_model=List[ProductoOut])
 async def admin_list_products(
+    request: Request,
     user = Depends(require_admin),
     categoria: Optional[str] = None,
     activo: Optional[bool] = None,
     all: Optional[int] = Query(default=1, description="Por defecto 1: lista todo"),
+    imagenes: str = Query(default="ref", pattern="^(ref|inline)$", description="inline: data URL completos"),
 ):
     query: Dict[str, Any] = {}
     if categoria:
@@ -32,41 +46,40 @@ async def admin_list_products(
         if activo is None:
             activo = True
         query["activo"] = activo
-    cursor = database.db.productos.find(query).sort("nombre", 1)
-    return await _serialize_many(cursor)
+    return await _catalog_response(request, query, private=True, inline_images=imagenes == "inline")
 
 @admin.post("", response_model=ProductoOut, status_code=201)
 async def admin_create_product(payload: ProductoPatch, user = Depends(require_admin)):
     data = _normalize_payload(payload.model_dump(exclude_unset=True))
     if not data.get("nombre") or data.get("precio") is None:
         raise HTTPException(status_code=422, detail="nombre y precio son obligatorios")
+    data = await _store_images(data)
 
     data.setdefault("stock", 0)
     data.setdefault("activo", True)
 
-    ins = await database.db.productos.insert_one(data)
-    doc = await database.db.productos.find_one({"_id": ins.inserted_id})
-    return database.serialize_doc(doc)
+    doc = await database.insert_serialized(database.db.productos, data)
+    catalog_cache.clear()
+    return doc
 
 
 @admin.put("/{product_id}", response_model=ProductoOut)
 async def admin_update_product(product_id: str, payload: ProductoIn, user = Depends(require_admin)):
-    data = _normalize_payload(payload.model_dump(exclude_unset=True))
-    res = await database.db.productos.update_one(
-        {"_id": _oid(product_id)},
-        {"$set": data},
-        upsert=False,
+    data = await _store_images(_normalize_payload(payload.model_dump(exclude_unset=True)))
+    doc = await database.update_serialized(
+        database.db.productos, {"_id": _oid(product_id)}, {"$set": data}
     )
-    if res.matched_count == 0:
+    if doc is None:
         raise HTTPException(status_code=404, detail="Not Found")
-    doc = await database.db.productos.find_one({"_id": _oid(product_id)})
-    return database.serialize_doc(doc)
+    catalog_cache.clear()
+    return doc
 
 @admin.delete("/{product_id}", status_code=204)
 async def admin_delete_product(product_id: str, user = Depends(require_admin)):
     res = await database.db.productos.delete_one({"_id": _oid(product_id)})
     if res.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Not Found")
+    catalog_cache.clear()
     return None
 @admin.patch("/{product_id}", response_model=ProductoOut)
 async def admin_patch_product(
@@ -75,20 +88,24 @@ async def admin_patch_product(
     user = Depends(require_admin)
 ):
     # Normaliza: "disponible" -> "activo"
-    data = _normalize_payload(payload or {})
+    data = await _store_images(_normalize_payload(payload or {}))
     if not data:
         raise HTTPException(status_code=422, detail="Nada que actualizar")
 
-    res = await database.db.productos.update_one(
-        {"_id": _oid(product_id)},
-        {"$set": data},
-        upsert=False,
+    doc = await database.update_serialized(
+        database.db.productos, {"_id": _oid(product_id)}, {"$set": data}
     )
-    if res.matched_count == 0:
+    if doc is None:
         raise HTTPException(status_code=404, detail="Not Found")
+    catalog_cache.clear()
+    return doc
 
-    doc = await database.db.productos.find_one({"_id": _oid(product_id)})
-    return database.serialize_doc(doc)
+@admin.post("/ratings/rebuild")
+async def admin_rebuild_ratings(user = Depends(require_admin)):
+    """Recalcula rating_stats de todos los productos desde `comentarios`."""
+    n = await rebuild_rating_stats(database.db)
+    catalog_cache.clear()
+    return {"ok": True, "productos_con_rating": n}
 
 router = APIRouter(prefix="/api/productos", tags=["productos"])
 
@@ -99,8 +116,106 @@ def _oid(s: str) -> ObjectId:
     except InvalidId:
         raise HTTPException(status_code=400, detail="ObjectId inválido")
 
-async def _serialize_many(cursor):
-    return await database.serialize_many(cursor)
+_productos_adapter = TypeAdapter(List[ProductoOut])
+
+# Sólo los campos de ProductoOut; las imágenes inline se sustituyen en el
+# propio Mongo por una referencia, así los data URL nunca viajan en listados.
+_LIST_FIELDS = ("nombre", "descripcion", "precio", "stock", "activo", "categoria", "rating_stats")
+_LIST_PROJECTION = {**{f: 1 for f in _LIST_FIELDS}, "imagenUrl": PRODUCT_IMAGE_REF_EXPR}
+_LIST_PROJECTION_INLINE = {**{f: 1 for f in _LIST_FIELDS}, "imagenUrl": 1}
+
+def _producto_shape(d: Dict[str, Any]) -> Dict[str, Any]:
+    """ProductoOut (mismo orden de campos y computed_fields) a partir de _LIST_PROJECTION."""
+    activo = bool(d.get("activo", True))
+    stats = d.get("rating_stats")
+    return {
+        "nombre": d["nombre"],
+        "descripcion": d.get("descripcion"),
+        "precio": float(d["precio"]),
+        "stock": int(d.get("stock", 0)),
+        "activo": activo,
+        "imagenUrl": d.get("imagenUrl"),
+        "categoria": d.get("categoria"),
+        "_id": d["_id"],
+        "rating_stats": rating_stats_out(stats) if stats is not None else None,
+        "disponible": activo,
+    }
+
+def _producto_change(change: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Evento del change stream -> payload del feed SSE del catálogo.
+    - delete: {"op": "delete", "_id"}
+    - insert/replace: {"op", "producto": ProductoOut}
+    - update: {"op": "update", "_id", "set": {campos públicos que cambiaron}}
+    Los updates que sólo tocan campos internos (_reservas, ...) no se publican.
+    """
+    op = change["operationType"]
+    pid = str(change["documentKey"]["_id"])
+    if op == "delete":
+        return {"op": "delete", "_id": pid}
+    doc = change.get("fullDocument")
+    if doc is None:  # borrado antes del lookup: llegará su propio delete
+        return None
+    doc = {**doc, "_id": pid, "imagenUrl": product_image_ref(pid, doc.get("imagenUrl"))}
+    out = _producto_shape(doc)
+    if op != "update":
+        return {"op": op, "producto": out}
+    desc = change.get("updateDescription") or {}
+    roots = {f.split(".", 1)[0] for f in (desc.get("updatedFields") or {})}
+    roots |= {f.split(".", 1)[0] for f in (desc.get("removedFields") or [])}
+    changed = {f: out[f] for f in (*_LIST_FIELDS, "imagenUrl") if f in roots}
+    if not changed:
+        return None
+    if "activo" in changed:
+        changed["disponible"] = out["disponible"]
+    return {"op": "update", "_id": pid, "set": changed}
+
+def _invalidate_catalog(payload: Dict[str, Any]) -> None:
+    # Un comentario nuevo sólo mueve rating_stats: ese dato puede esperar al
+    # TTL del catálogo; vaciarlo en cada comentario anularía la caché
+    if payload.get("op") == "update" and set(payload["set"]) <= {"rating_stats"}:
+        return
+    catalog_cache.clear()
+
+# Un watcher por worker; lo arranca el lifespan (streams.start_all). Cada
+# evento publicado (salvo los de sólo valoraciones) invalida también la caché
+# del catálogo de este worker, así los cambios hechos en otro worker no
+# esperan al TTL.
+productos_hub = register(ChangeStreamHub(
+    "productos",
+    _producto_change,
+    pipeline=[{"$match": {"operationType": {"$in": ["insert", "update", "replace", "delete"]}}}],
+    full_document="updateLookup",
+    event_type="producto",
+    on_publish=_invalidate_catalog,
+))
+
+async def _catalog_response(
+    request: Request,
+    query: Dict[str, Any],
+    private: bool = False,
+    inline_images: bool = False,
+) -> Response:
+    """
+    Devuelve el catálogo ya serializado (bytes JSON) desde `catalog_cache`.
+    La clave es el filtro normalizado; sólo en un miss se consulta Mongo.
+    Cada entrada guarda también su ETag y la hora en que se construyó
+    (Last-Modified), así un 304 no cuesta ni Mongo ni serialización.
+    """
+    key = (query.get("categoria"), query.get("activo"), inline_images)
+    entry = catalog_cache.get(key)
+    if entry is None:
+        # Una escritura que invalida mientras se lee Mongo deja la lectura vieja:
+        # se responde con ella, pero no se guarda
+        generation = catalog_cache.generation
+        projection = _LIST_PROJECTION_INLINE if inline_images else _LIST_PROJECTION
+        cursor = database.list_collection("productos").find(query, projection).sort("nombre", 1)
+        docs = await cursor.to_list(length=None)
+        body = encode_list(_productos_adapter, docs, _producto_shape)
+        entry = (body, make_etag(body), datetime.now(timezone.utc))
+        catalog_cache.set(key, entry, generation=generation)
+    body, etag, built_at = entry
+    return conditional_response(request, body, etag=etag, last_modified=built_at, private=private)
 
 def _normalize_payload(payload: Dict[str, Any]) -> Dict[str, Any]:
     """
@@ -115,15 +230,27 @@ def _normalize_payload(payload: Dict[str, Any]) -> Dict[str, Any]:
     for key in ("nombre", "descripcion", "categoria", "imagenUrl"):
         if key in out and isinstance(out[key], str):
             out[key] = out[key].strip()
+    # Si el front reenvía la referencia que le dimos en el listado, la imagen
+    # no cambió: no hay que pisar el data URL guardado con su propia URL.
+    if is_product_image_ref(out.get("imagenUrl")):
+        del out["imagenUrl"]
     return out
 
+async def _store_images(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Los data URL se guardan en el almacén de imágenes; el doc sólo lleva la referencia."""
+    if data.get("imagenUrl"):
+        data["imagenUrl"] = await externalize_image(data["imagenUrl"])
+    return data
+
 # -------- público --------
 @router.get("", response_model=List[ProductoOut])
 async def listar_productos(
+    request: Request,
     categoria: Optional[str] = None,
     activo: Optional[bool] = None,
     all: Optional[int] = Query(default=None, description="1 para listar todos, ignorando activo"),
     disponible: Optional[bool] = None,  # compat: si lo envían desde el front
+    imagenes: str = Query(default="ref", pattern="^(ref|inline)$", description="inline: data URL completos"),
 ):
     query: Dict[str, Any] = {}
 
@@ -143,5 +270,38 @@ async def listar_productos(
             activo = True
         query["activo"] = activo
 
-    cursor = database.db.productos.find(query).sort("nombre", 1)
-    return await _serialize_many(cursor)
+    return await _catalog_response(request, query, inline_images=imagenes == "inline")
+
+@router.get("/stream")
+async def stream_productos(request: Request):
+    """
+    Cambios del catálogo en vivo (Server-Sent Events, evento "producto").
+    Al reconectar, EventSource manda Last-Event-ID y se reenvía lo perdido;
+    si no se puede, llega "reset" y el cliente vuelve a pedir el listado.
+    503 si Mongo no admite change streams (el front sigue con polling).
+    """
+    return sse_response(request, productos_hub, request.headers.get("last-event-id"))
+
+# Cacheable: el navegador la reutiliza un día y luego revalida con el ETag
+IMAGE_MAX_AGE = 86400
+
+@router.get("/{product_id}/imagen")
+async def imagen_producto(product_id: str, request: Request):
+    prod = await database.db.productos.find_one({"_id": _oid(product_id)}, {"imagenUrl": 1})
+    url = (prod or {}).get("imagenUrl")
+    if not url:
+        raise HTTPException(status_code=404, detail="Producto sin imagen")
+    if not is_data_url(url):
+        return RedirectResponse(url, status_code=307)
+    try:
+        mime, data = parse_data_url(url)
+    except ValueError:
+        raise HTTPException(status_code=404, detail="Imagen inválida")
+    # Data URLs viejos pueden traer SVG/HTML: sólo se sirven rasters verificados
+    try:
+        mime = check_image(mime, data)
+    except ValueError:
+        raise HTTPException(status_code=415, detail="Formato de imagen no admitido")
+    response = conditional_response(request, data, max_age=IMAGE_MAX_AGE, media_type=mime)
+    response.headers.update(IMAGE_SECURITY_HEADERS)
+    return response
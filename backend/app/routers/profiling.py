@@ -0,0 +1,52 @@
+# app/routers/profiling.py
+# Control del profiler por muestreo (ver app/profiler.py). Sólo admin.
+# El estado es por worker: con varios workers, cada uno muestrea y guarda lo suyo.
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from pydantic import BaseModel, Field
+
+from .. import profiler
+from .auth import get_current_user
+
+def _require_admin(user = Depends(get_current_user)):
+    if user.get("rol") != "admin":
+        raise HTTPException(status_code=403, detail="Solo admin")
+    return user
+
+router = APIRouter(prefix="/api/admin/profiler", tags=["admin:profiler"], dependencies=[Depends(_require_admin)])
+
+class _ProfilerPatch(BaseModel):
+    enabled: Optional[bool] = None
+    sample_rate: Optional[float] = Field(default=None, ge=0, le=1)
+    keep: Optional[int] = Field(default=None, ge=1, le=1000)
+
+def _status() -> dict:
+    return {**profiler.config, "traces": len(profiler.store)}
+
+@router.get("")
+async def profiler_status():
+    return _status()
+
+@router.post("")
+async def profiler_update(body: _ProfilerPatch):
+    profiler.config.update(body.model_dump(exclude_none=True))
+    return _status()
+
+# GET /api/admin/profiler/traces?route=/api/orders&format=collapsed
+@router.get("/traces")
+async def profiler_traces(
+    route: Optional[str] = Query(default=None, description='Plantilla ("/api/orders") o "POST /api/orders"'),
+    format: str = Query(default="json", pattern="^(json|collapsed)$"),
+    limit: int = Query(default=50, ge=1, le=1000),
+):
+    traces = profiler.store.traces(route)[:limit]
+    if format == "collapsed":
+        lines = [line for t in traces for line in t.collapsed()]
+        return Response("\n".join(lines) + "\n", media_type="text/plain; charset=utf-8")
+    return [t.to_dict() for t in traces]
+
+@router.delete("/traces", status_code=204)
+async def profiler_clear():
+    profiler.store.clear()
+    return None
@@ -63,8 +63,21 @@ class ProductoIn(MongoModel):
         return values
 
 
+class RatingStats(MongoModel):
+    """Agregado precalculado de comentarios de un producto (ver ratings.py)."""
+    count: int = 0
+    sum: int = 0
+    hist: dict[str, int] = Field(default_factory=dict)  # "1".."5" -> cantidad
+
+    @computed_field  # type: ignore[prop-decorator]
+    @property
+    def avg(self) -> Optional[float]:
+        return round(self.sum / self.count, 2) if self.count else None
+
+
 class ProductoOut(ProductoIn):
     id: str = Field(alias="_id")
+    rating_stats: Optional[RatingStats] = None
 
     # Campo calculado de sólo salida para el front
     @computed_field  # type: ignore[prop-decorator]
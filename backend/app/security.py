@@ -1,4 +1,12 @@
+import asyncio
+import os
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+
 from passlib.context import CryptContext
+
+from .metrics import Counter, Gauge, registry
+from .profiler import span
 pwd_context = CryptContext(schemes=["pbkdf2_sha256", "bcrypt"], deprecated="auto")
 
 def hash_password(plain: str) -> str:
@@ -8,4 +16,99 @@ def verify_password(plain: str, hashed: str) -> bool:
     return pwd_context.verify(plain, hashed)
 
 def get_password_hash(plain: str) -> str:
-    return hash_password(plain)
\ No newline at end of file
+    return hash_password(plain)
+
+
+# ===== Hashing fuera del event loop =====
+# El KDF es lento a propósito; en un handler async bloquea todo el worker.
+# HASH_POOL=thread (hashlib libera el GIL) | process
+HASH_POOL = os.getenv("HASH_POOL", "thread").lower()
+HASH_WORKERS = int(os.getenv("HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+HASH_MAX_CONCURRENCY = int(os.getenv("HASH_MAX_CONCURRENCY", str(HASH_WORKERS * 2)))
+
+_executor: Executor | None = None
+_semaphores: dict[asyncio.AbstractEventLoop, asyncio.Semaphore] = {}
+
+hash_stats = {
+    "calls": 0,           # hashes/verificaciones terminadas
+    "errors": 0,
+    "in_flight": 0,       # ejecutándose en el pool
+    "waiting": 0,         # esperando turno por HASH_MAX_CONCURRENCY
+    "wait_seconds": 0.0,  # acumulado de espera en cola
+    "run_seconds": 0.0,   # acumulado de ejecución
+    "max_run_seconds": 0.0,
+}
+
+def _get_executor() -> Executor:
+    global _executor
+    if _executor is None:
+        if HASH_POOL == "process":
+            _executor = ProcessPoolExecutor(max_workers=HASH_WORKERS)
+        else:
+            _executor = ThreadPoolExecutor(max_workers=HASH_WORKERS, thread_name_prefix="hash")
+    return _executor
+
+def _get_semaphore() -> asyncio.Semaphore:
+    # un semáforo por event loop (los tests crean uno por caso)
+    loop = asyncio.get_running_loop()
+    sem = _semaphores.get(loop)
+    if sem is None:
+        for old in [l for l in _semaphores if l.is_closed()]:
+            del _semaphores[old]
+        sem = _semaphores[loop] = asyncio.Semaphore(HASH_MAX_CONCURRENCY)
+    return sem
+
+async def _run_in_pool(fn, *args):
+    queued = time.perf_counter()
+    sem = _get_semaphore()
+    hash_stats["waiting"] += 1
+    try:
+        # spans: sólo se registran si la request está siendo perfilada
+        with span(f"{fn.__name__}.wait"):
+            await sem.acquire()
+    finally:
+        hash_stats["waiting"] -= 1
+    try:
+        started = time.perf_counter()
+        hash_stats["in_flight"] += 1
+        hash_stats["wait_seconds"] += started - queued
+        try:
+            with span(f"{fn.__name__}.run"):
+                return await asyncio.get_running_loop().run_in_executor(_get_executor(), fn, *args)
+        except Exception:
+            hash_stats["errors"] += 1
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            hash_stats["in_flight"] -= 1
+            hash_stats["calls"] += 1
+            hash_stats["run_seconds"] += elapsed
+            hash_stats["max_run_seconds"] = max(hash_stats["max_run_seconds"], elapsed)
+    finally:
+        sem.release()
+
+async def hash_password_async(plain: str) -> str:
+    return await _run_in_pool(hash_password, plain)
+
+async def verify_password_async(plain: str, hashed: str) -> bool:
+    return await _run_in_pool(verify_password, plain, hashed)
+
+def _prometheus() -> list:
+    calls = Counter("password_hash_calls_total", "Hashes/verificaciones de contraseña")
+    calls.inc(amount=hash_stats["calls"])
+    run = Counter("password_hash_run_seconds_total", "Tiempo de ejecución acumulado en el pool de hashing")
+    run.inc(amount=hash_stats["run_seconds"])
+    wait = Counter("password_hash_wait_seconds_total", "Espera acumulada por un turno de hashing")
+    wait.inc(amount=hash_stats["wait_seconds"])
+    queue = Gauge("password_hash_queue", "Hashes esperando o ejecutándose", ("state",))
+    queue.set(hash_stats["waiting"], ("waiting",))
+    queue.set(hash_stats["in_flight"], ("in_flight",))
+    return [calls, run, wait, queue]
+
+registry.add_collector(_prometheus)
+
+def shutdown_hashing() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
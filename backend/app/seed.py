@@ -1,5 +1,26 @@
 # backend/app/seed.py
-from .security import hash_password  
+# Datos iniciales (productos demo + cliente demo).
+# Corre en el lifespan de cada worker, así que debe ser barato cuando no hay
+# nada que hacer: la versión sembrada queda en `meta` ({_id: "seed"}) y si ya
+# es la actual no se toca la base. Al cambiar PRODUCTOS/IMAGES, subir
+# SEED_VERSION.
+# Los upserts de productos filtran por `nombre`, que no tiene índice único:
+# dos workers sembrando a la vez podrían insertar el mismo producto dos veces.
+# Por eso antes de escribir se reclama el marcador con una operación atómica
+# (sólo un worker gana); el reclamo vence a los SEED_LEASE segundos por si el
+# worker que lo tenía murió a mitad.
+from datetime import datetime, timedelta, timezone
+
+from pymongo import UpdateOne
+from pymongo.errors import DuplicateKeyError
+
+from .security import hash_password_async
+
+SEED_VERSION = 1
+SEED_MARKER = "seed"
+SEED_LEASE = 120  # segundos
+
+DEMO_EMAIL = "demo@saborreal.com"
 
 IMAGES = {
     "Pan Francés": "/img/panfrance.jpg",
@@ -7,57 +28,103 @@ IMAGES = {
     "Torta de Chocolate": "/img/tortachoco.jpg",
 }
 
-async def seed(db):
-    prods = [
-        {
-            "nombre": "Pan Francés",
-            "descripcion": "Clásico y crujiente",
-            "precio": 0.50,
-            "stock": 200,
-            "activo": True,
-            "categoria": "pan",
-            "imagenUrl": IMAGES["Pan Francés"],
-        },
-        {
-            "nombre": "Croissant",
-            "descripcion": "Mantecoso y delicado",
-            "precio": 2.20,
-            "stock": 80,
-            "activo": True,
-            "categoria": "postre",
-            "imagenUrl": IMAGES["Croissant"],
-        },
-        {
-            "nombre": "Torta de Chocolate",
-            "descripcion": "8 porciones",
-            "precio": 25.00,
-            "stock": 12,
-            "activo": True,
-            "categoria": "postre",
-            "imagenUrl": IMAGES["Torta de Chocolate"],
-        },
-    ]
-
-    for p in prods:
-        await db.productos.update_one(
+PRODUCTOS = [
+    {
+        "nombre": "Pan Francés",
+        "descripcion": "Clásico y crujiente",
+        "precio": 0.50,
+        "stock": 200,
+        "activo": True,
+        "categoria": "pan",
+        "imagenUrl": IMAGES["Pan Francés"],
+    },
+    {
+        "nombre": "Croissant",
+        "descripcion": "Mantecoso y delicado",
+        "precio": 2.20,
+        "stock": 80,
+        "activo": True,
+        "categoria": "postre",
+        "imagenUrl": IMAGES["Croissant"],
+    },
+    {
+        "nombre": "Torta de Chocolate",
+        "descripcion": "8 porciones",
+        "precio": 25.00,
+        "stock": 12,
+        "activo": True,
+        "categoria": "postre",
+        "imagenUrl": IMAGES["Torta de Chocolate"],
+    },
+]
+
+# Se reescriben en cada versión; el resto (precio, stock...) sólo al insertar
+_ALWAYS_SET = ("imagenUrl", "descripcion")
+
+
+def product_ops() -> list[UpdateOne]:
+    ops = []
+    for p in PRODUCTOS:
+        on_insert = {k: v for k, v in p.items() if k not in _ALWAYS_SET}
+        ops.append(UpdateOne(
             {"nombre": p["nombre"]},
-            {"$setOnInsert": p},
+            {"$setOnInsert": on_insert, "$set": {k: p[k] for k in _ALWAYS_SET}},
+            upsert=True,
+        ))
+    return ops
+
+
+async def _claim(db) -> bool:
+    """Reclama el marcador si la versión no es la actual y nadie lo tiene (o venció)."""
+    now = datetime.now(timezone.utc)
+    try:
+        await db.meta.find_one_and_update(
+            {
+                "_id": SEED_MARKER,
+                "version": {"$not": {"$gte": SEED_VERSION}},
+                "claimedAt": {"$not": {"$gt": now - timedelta(seconds=SEED_LEASE)}},
+            },
+            {"$set": {"claimedAt": now}},
             upsert=True,
         )
-        await db.productos.update_one(
-            {"nombre": p["nombre"]},
-            {"$set": {
-                "imagenUrl": p["imagenUrl"],
-                "descripcion": p["descripcion"],
-            }}
+    except DuplicateKeyError:
+        # El marcador existe pero no cumple el filtro: ya sembrado o lo tiene otro
+        return False
+    return True
+
+
+async def seed(db) -> bool:
+    """Siembra si la versión guardada no es la actual. True si hizo algo."""
+    marker = await db.meta.find_one({"_id": SEED_MARKER})
+    if marker and marker.get("version", 0) >= SEED_VERSION:
+        return False
+    if not await _claim(db):
+        return False
+    try:
+        await _seed(db)
+    except BaseException:
+        await db.meta.update_one({"_id": SEED_MARKER}, {"$unset": {"claimedAt": ""}})
+        raise
+    return True
+
+
+async def _seed(db) -> None:
+    await db.productos.bulk_write(product_ops(), ordered=False)
+
+    # El KDF es lento a propósito: sólo se paga si el cliente demo no existe
+    if await db.clientes.find_one({"email": DEMO_EMAIL}, {"_id": 1}) is None:
+        await db.clientes.update_one(
+            {"email": DEMO_EMAIL},
+            {"$setOnInsert": {
+                "nombre": "Cliente Demo",
+                "email": DEMO_EMAIL,
+                "password_hash": await hash_password_async("demo123"),
+            }},
+            upsert=True,
         )
-    await db.clientes.update_one(
-        {"email": "demo@saborreal.com"},
-        {"$setOnInsert": {
-            "nombre": "Cliente Demo",
-            "email": "demo@saborreal.com",
-            "password_hash": hash_password("demo123"),
-        }},
-        upsert=True
+
+    await db.meta.update_one(
+        {"_id": SEED_MARKER},
+        {"$set": {"version": SEED_VERSION, "seededAt": datetime.now(timezone.utc)}, "$unset": {"claimedAt": ""}},
+        upsert=True,
     )
-    await db.comentarios.create_index([("producto_id", 1)])
@@ -0,0 +1,306 @@
+# backend/app/streams.py
+# Change streams de Mongo repartidos a muchos suscriptores (Server-Sent Events).
+# - Un solo watcher por colección y por worker (ChangeStreamHub), sin
+#   importar cuántos clientes haya conectados.
+# - Cada evento lleva como id el resume token del change stream: vale en
+#   cualquier worker. Al reconectar, el cliente manda Last-Event-ID y se le
+#   reenvía lo que haya en el buffer circular después de ese token; si el
+#   token ya no está (o es de otro worker y no lo vimos) recibe "reset" y
+#   vuelve a pedir la lista completa (o el endpoint le manda un snapshot).
+# - Backpressure: cada suscriptor tiene una cola acotada. Si un cliente lento
+#   la llena, se vacía y se le manda "reset" (un refetch) en vez de acumular
+#   memoria sin límite.
+# Los change streams requieren replica set (o sharded). En un mongod suelto el
+# hub queda no disponible y los endpoints responden 503: el front sigue con
+# polling.
+# EventSource no manda cabeceras: los streams con auth se abren con un ticket
+# de un solo uso y vida corta (issue_ticket/redeem_ticket), nunca con el JWT
+# en la URL, que acabaría en logs de proxies y en el historial.
+import asyncio
+import hashlib
+import logging
+import os
+import secrets
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Optional
+
+from fastapi import HTTPException, Request
+from fastapi.responses import StreamingResponse
+from pymongo.errors import OperationFailure, PyMongoError
+
+from . import database
+from .responses import dumps
+
+log = logging.getLogger(__name__)
+
+STREAM_BUFFER = int(os.getenv("STREAM_BUFFER", "1000"))    # eventos guardados para reanudar
+STREAM_QUEUE = int(os.getenv("STREAM_QUEUE", "100"))       # eventos pendientes por suscriptor
+STREAM_RETRY_SECONDS = float(os.getenv("STREAM_RETRY_SECONDS", "2"))
+
+RESET = "reset"
+UNAVAILABLE = "unavailable"   # el stream se cierra: el cliente vuelve a polling
+
+# 40573: $changeStream sólo se admite en replica sets / sharded
+_NOT_SUPPORTED_CODES = {40573}
+SSE_KEEPALIVE_SECONDS = float(os.getenv("SSE_KEEPALIVE_SECONDS", "15"))
+STREAM_TICKET_TTL = int(os.getenv("STREAM_TICKET_TTL", "30"))  # segundos para canjearlo
+TICKETS = "stream_tickets"
+
+
+class Event:
+    __slots__ = ("id", "type", "data")
+
+    def __init__(self, id: Optional[str], type: str, data: Any):
+        self.id, self.type, self.data = id, type, data
+
+
+class Subscriber:
+    def __init__(self, maxsize: int = STREAM_QUEUE):
+        self.queue: asyncio.Queue[Event] = asyncio.Queue(maxsize=maxsize)
+        self.dropped = 0  # veces que se desbordó
+
+    def offer(self, event: Event) -> None:
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Cliente lento: lo pendiente ya no sirve, que recargue todo
+            self.dropped += 1
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(Event(None, RESET, {"motivo": "lento"}))
+
+    async def get(self) -> Event:
+        return await self.queue.get()
+
+
+class ChangeStreamHub:
+    def __init__(
+        self,
+        collection: str,
+        transform: Callable[[dict], Optional[dict]],
+        *,
+        pipeline: Optional[list[dict]] = None,
+        full_document: Optional[str] = None,
+        event_type: str = "change",
+        on_publish: Optional[Callable[[dict], None]] = None,
+        buffer: int = STREAM_BUFFER,
+        queue_size: int = STREAM_QUEUE,
+    ):
+        self.collection = collection
+        self.transform = transform          # change -> payload (None: no se publica)
+        self.pipeline = pipeline or []
+        self.full_document = full_document
+        self.event_type = event_type
+        self.on_publish = on_publish      # p. ej. invalidar cachés de este worker
+        self.queue_size = queue_size
+        self.available = True
+        self._ring: deque[Event] = deque(maxlen=buffer)
+        self._subs: set[Subscriber] = set()
+        self._resume_token: Optional[dict] = None
+        self._task: Optional[asyncio.Task] = None
+        self._ready = asyncio.Event()
+
+    # ----- ciclo de vida -----
+    def start(self) -> None:
+        """Lanza el watcher en segundo plano (no demora el arranque si Mongo tarda)."""
+        self.available = True
+        self._ready = asyncio.Event()
+        self._task = asyncio.create_task(self._run(), name=f"watch:{self.collection}")
+
+    async def wait_ready(self) -> None:
+        """Espera a que el stream esté abierto (o a saber que no hay soporte)."""
+        await self._ready.wait()
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for sub in list(self._subs):
+            sub.offer(Event(None, RESET, {"motivo": "cierre"}))
+        self._subs.clear()
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                kwargs: dict[str, Any] = {"resume_after": self._resume_token}
+                if self.full_document:
+                    kwargs["full_document"] = self.full_document
+                async with database.db[self.collection].watch(self.pipeline, **kwargs) as stream:
+                    while True:
+                        # try_next abre el cursor en la primera vuelta y luego
+                        # espera cambios (getMore con awaitData) sin bloquear el loop
+                        change = await stream.try_next()
+                        self._ready.set()
+                        if change is not None:
+                            self._resume_token = change["_id"]
+                            self._dispatch(change)
+            except asyncio.CancelledError:
+                raise
+            except OperationFailure as exc:
+                if exc.code in _NOT_SUPPORTED_CODES:
+                    log.warning("Change streams no disponibles para %s: %s", self.collection, exc)
+                    self.available = False
+                    self._publish(Event(None, UNAVAILABLE, {}))
+                    self._ready.set()
+                    return
+                # token demasiado viejo u otro error del servidor: se reabre desde ahora
+                log.warning("Change stream %s reiniciado: %s", self.collection, exc)
+                self._resume_token = None
+                self._publish(Event(None, RESET, {"motivo": "reinicio"}))
+            except PyMongoError as exc:
+                log.warning("Change stream %s interrumpido, reintentando: %s", self.collection, exc)
+            except Exception:
+                log.exception("Change stream %s: error procesando un evento", self.collection)
+            self._ready.set()
+            await asyncio.sleep(STREAM_RETRY_SECONDS)
+
+    def _dispatch(self, change: dict) -> None:
+        try:
+            payload = self.transform(change)
+        except Exception:
+            # un documento con forma inesperada no debe cortar el stream
+            log.exception("Change stream %s: no se pudo transformar el evento", self.collection)
+            return
+        if payload is not None:
+            if self.on_publish:
+                self.on_publish(payload)
+            self._publish(Event(change["_id"]["_data"], self.event_type, payload))
+
+    def _publish(self, event: Event) -> None:
+        if event.id is not None:
+            self._ring.append(event)
+        for sub in list(self._subs):
+            sub.offer(event)
+
+    # ----- suscriptores -----
+    def can_resume(self, last_event_id: Optional[str]) -> bool:
+        return last_event_id is not None and any(e.id == last_event_id for e in self._ring)
+
+    def subscribe(self, last_event_id: Optional[str] = None) -> Subscriber:
+        sub = Subscriber(self.queue_size)
+        if last_event_id:
+            ids = [e.id for e in self._ring]
+            if last_event_id in ids:
+                for event in list(self._ring)[ids.index(last_event_id) + 1:]:
+                    sub.offer(event)
+            else:
+                sub.offer(Event(None, RESET, {"motivo": "token desconocido"}))
+        self._subs.add(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscriber) -> None:
+        self._subs.discard(sub)
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "available": self.available,
+            "subscribers": len(self._subs),
+            "buffered": len(self._ring),
+            "dropped": sum(s.dropped for s in self._subs),
+        }
+
+
+# ===== Registro (arranque/cierre en el lifespan) =====
+hubs: list[ChangeStreamHub] = []
+
+
+def register(hub: ChangeStreamHub) -> ChangeStreamHub:
+    hubs.append(hub)
+    return hub
+
+
+def start_all() -> None:
+    for hub in hubs:
+        hub.start()
+
+
+async def stop_all() -> None:
+    for hub in hubs:
+        await hub.stop()
+
+
+def stats() -> dict[str, Any]:
+    return {hub.collection: hub.stats() for hub in hubs}
+
+
+# ===== Tickets de conexión =====
+# En Mongo (no en memoria): el POST que lo emite y el GET del stream pueden
+# caer en workers distintos. Se guarda el sha256, no el ticket.
+def _ticket_id(ticket: str) -> str:
+    return hashlib.sha256(ticket.encode()).hexdigest()
+
+
+async def issue_ticket(user_id: str, scope: str) -> str:
+    ticket = secrets.token_urlsafe(32)
+    await database.db[TICKETS].insert_one({
+        "_id": _ticket_id(ticket),
+        "userId": user_id,
+        "scope": scope,
+        "expiresAt": datetime.now(timezone.utc) + timedelta(seconds=STREAM_TICKET_TTL),
+    })
+    return ticket
+
+
+async def redeem_ticket(ticket: str, scope: str) -> Optional[str]:
+    """Consume el ticket (un solo uso). user_id, o None si no existe o ya venció."""
+    doc = await database.db[TICKETS].find_one_and_delete({
+        "_id": _ticket_id(ticket),
+        "scope": scope,
+        "expiresAt": {"$gt": datetime.now(timezone.utc)},
+    })
+    return doc["userId"] if doc else None
+
+
+# ===== Server-Sent Events =====
+def format_sse(event: Event) -> str:
+    head = f"id: {event.id}\n" if event.id else ""
+    return f"{head}event: {event.type}\ndata: {dumps(event.data).decode()}\n\n"
+
+
+def sse_response(
+    request: Request,
+    hub: ChangeStreamHub,
+    last_event_id: Optional[str],
+    snapshot: Optional[Callable[[], Awaitable[Event]]] = None,
+) -> StreamingResponse:
+    """
+    StreamingResponse text/event-stream de un hub (503 si no hay change streams).
+    Con `snapshot`, si no se puede reanudar desde Last-Event-ID (o el cliente
+    se quedó atrás) se le manda el estado completo en lugar de "reset".
+    """
+    if not hub.available:
+        raise HTTPException(status_code=503, detail="Stream no disponible")
+    resync = snapshot is not None and not hub.can_resume(last_event_id)
+    # Suscribirse antes de leer el snapshot: lo que cambie mientras tanto
+    # llega después y el cliente lo aplica encima
+    sub = hub.subscribe(None if resync else last_event_id)
+
+    async def events():
+        try:
+            yield f"retry: {int(STREAM_RETRY_SECONDS * 1000)}\n\n"
+            if resync:
+                yield format_sse(await snapshot())
+            while not await request.is_disconnected():
+                try:
+                    event = await asyncio.wait_for(sub.get(), timeout=SSE_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"  # mantiene viva la conexión a través de proxies
+                    continue
+                if event.type == RESET and snapshot is not None:
+                    event = await snapshot()
+                yield format_sse(event)
+                if event.type == UNAVAILABLE:
+                    break
+        finally:
+            hub.unsubscribe(sub)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
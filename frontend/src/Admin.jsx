@@ -1,8 +1,9 @@
 // src/Admin.jsx
-import { useEffect, useMemo, useState } from "react";
+import { useEffect, useMemo, useRef, useState } from "react";
 import { useNavigate } from "react-router-dom";
 import { useAuth } from "./AuthContext.jsx";
 import { apix } from "./api/api";
+import { assetUrl } from "./api/client";
 
 /* ================== Utiles ================== */
 async function compressImage(file, maxSize = 640, quality = 0.8) {
@@ -496,7 +497,7 @@ function OrderDetailModal({ open, onClose, order }) {
                       <div style={{ display: "flex", alignItems: "center", gap: 8 }}>
                         {it.imagenUrl && (
                           <img
-                            src={it.imagenUrl}
+                            src={assetUrl(it.imagenUrl)}
                             alt=""
                             width="36"
                             height="24"
@@ -533,6 +534,15 @@ function OrderDetailModal({ open, onClose, order }) {
 }
 
 /* ---------- SECCIÓN: PEDIDOS AGRUPADOS POR USUARIO ---------- */
+// Aplica pedidos (del stream) sobre la lista: reemplaza por _id y antepone los nuevos
+function upsertOrders(lst, pedidos) {
+  const byId = new Map(pedidos.map((p) => [p._id, p]));
+  const merged = lst.map((o) => (byId.has(o._id) ? { ...o, ...byId.get(o._id) } : o));
+  const known = new Set(lst.map((o) => o._id));
+  const nuevos = pedidos.filter((p) => !known.has(p._id));
+  return nuevos.length ? [...nuevos, ...merged] : merged;
+}
+
 function OrdersSectionGrouped({ token, onMsg }) {
   const [orders, setOrders] = useState([]);
   const [busy, setBusy] = useState(false);
@@ -541,6 +551,10 @@ function OrdersSectionGrouped({ token, onMsg }) {
   const [detailOpen, setDetailOpen] = useState(false);
   const [detailOrder, setDetailOrder] = useState(null);
   const [searchCode, setSearchCode] = useState("");
+  const [nextCursor, setNextCursor] = useState(null);
+  const [live, setLive] = useState(false);
+  // Cambios del stream llegados durante load(): _id -> pedido (null si se borró)
+  const liveChanges = useRef(new Map());
 
   const PEN = useMemo(
     () => new Intl.NumberFormat("es-PE", { style: "currency", currency: "PEN" }),
@@ -568,12 +582,36 @@ function OrdersSectionGrouped({ token, onMsg }) {
 
   async function load() {
     setBusy(true);
+    liveChanges.current = new Map();
     try {
-      const data = await apix.adminListOrders(token);
-      setOrders(Array.isArray(data) ? data : []);
+      const page = await apix.adminListOrdersPage(token);
+      // La página reemplaza la lista; de lo que trajo el stream mientras tanto
+      // sólo se reaplica lo de pedidos de esta página (es más nuevo)
+      const changes = liveChanges.current;
+      setOrders(
+        page.items
+          .filter((o) => changes.get(o._id) !== null)
+          .map((o) => (changes.has(o._id) ? { ...o, ...changes.get(o._id) } : o))
+      );
+      setNextCursor(page.next);
     } catch (e) {
       onMsg(`❌ No se pudieron cargar pedidos: ${e.message || "error"}`);
       setOrders([]);
+      setNextCursor(null);
+    } finally {
+      setBusy(false);
+    }
+  }
+
+  async function loadMore() {
+    if (!nextCursor) return;
+    setBusy(true);
+    try {
+      const page = await apix.adminListOrdersPage(token, { cursor: nextCursor });
+      setOrders((prev) => [...prev, ...page.items]);
+      setNextCursor(page.next);
+    } catch (e) {
+      onMsg(`❌ No se pudieron cargar más pedidos: ${e.message || "error"}`);
     } finally {
       setBusy(false);
     }
@@ -583,6 +621,32 @@ function OrdersSectionGrouped({ token, onMsg }) {
     // eslint-disable-next-line
   }, []);
 
+  // Tablero en vivo: el servidor empuja altas y cambios de estado, así no
+  // hay que volver a listar todos los pedidos para ver los nuevos.
+  useEffect(() => {
+    const close = apix.adminOrdersStream(token, {
+      onSnapshot: (pedidos) => {
+        setLive(true);
+        for (const p of pedidos) liveChanges.current.set(p._id, p);
+        setOrders((lst) => upsertOrders(lst, pedidos));
+      },
+      onPedido: (ch) => {
+        if (ch.op === "delete") {
+          liveChanges.current.set(ch._id, null);
+          setOrders((lst) => lst.filter((o) => o._id !== ch._id));
+        } else {
+          liveChanges.current.set(ch.pedido._id, ch.pedido);
+          setOrders((lst) => upsertOrders(lst, [ch.pedido]));
+        }
+      },
+      onUnavailable: () => setLive(false), // queda el botón Recargar
+    });
+    return () => {
+      close();
+      setLive(false);
+    };
+  }, [token]);
+
   // Resumen: total de pedidos y monto SOLO de los que NO están cancelados
   const summary = useMemo(() => {
     let totalActive = 0;
@@ -706,10 +770,16 @@ function OrdersSectionGrouped({ token, onMsg }) {
             />
             <span className="hint">
               {summary.count} pedido(s) • Total: {PEN.format(summary.totalActive)}
+              {live && " • en vivo"}
             </span>
             <button className="btn btn-outline-secondary" onClick={load} disabled={busy}>
               Recargar
             </button>
+            {nextCursor && (
+              <button className="btn btn-outline-secondary" onClick={loadMore} disabled={busy}>
+                Cargar más
+              </button>
+            )}
           </div>
         </div>
 
@@ -834,6 +904,118 @@ function OrdersSectionGrouped({ token, onMsg }) {
 }
 
 /* ---------- ADMIN ROOT ---------- */
+/* ================== Ventas (analítica) ================== */
+const STATUS_LABELS = {
+  CREATED: "Creado",
+  PAID: "Pagado",
+  DELIVERED: "Entregado",
+  CANCELLED: "Cancelado",
+};
+
+function SalesSection({ token, onMsg }) {
+  const [data, setData] = useState(null);
+  const [busy, setBusy] = useState(false);
+  const [desde, setDesde] = useState("");
+  const [hasta, setHasta] = useState("");
+
+  const PEN = useMemo(
+    () => new Intl.NumberFormat("es-PE", { style: "currency", currency: "PEN" }),
+    []
+  );
+
+  async function load() {
+    setBusy(true);
+    try {
+      setData(await apix.adminAnalytics(token, { desde, hasta }));
+    } catch (e) {
+      onMsg(`❌ No se pudo cargar la analítica: ${e.message || "error"}`);
+    } finally {
+      setBusy(false);
+    }
+  }
+  useEffect(() => {
+    load();
+    // eslint-disable-next-line
+  }, []);
+
+  const maxDia = useMemo(
+    () => Math.max(1, ...(data?.revenue_por_dia || []).map((d) => d.revenue)),
+    [data]
+  );
+
+  return (
+    <div className="card" style={{ padding: 12 }}>
+      <div style={{ display: "flex", gap: 8, alignItems: "center", flexWrap: "wrap" }}>
+        <strong>Ventas</strong>
+        <label className="hint">
+          Desde <input type="date" value={desde} onChange={(e) => setDesde(e.target.value)} />
+        </label>
+        <label className="hint">
+          Hasta (excluido) <input type="date" value={hasta} onChange={(e) => setHasta(e.target.value)} />
+        </label>
+        <button className="btn btn-outline-secondary" onClick={load} disabled={busy}>
+          {busy ? "Cargando…" : "Actualizar"}
+        </button>
+      </div>
+
+      {data && (
+        <>
+          <p style={{ marginTop: 12 }}>
+            <strong>{PEN.format(data.revenue_total)}</strong> en {data.pedidos} pedido(s) •
+            Ticket promedio: {data.ticket_promedio != null ? PEN.format(data.ticket_promedio) : "—"}
+          </p>
+          <p className="hint">
+            {Object.entries(data.pedidos_por_estado)
+              .map(([k, v]) => `${STATUS_LABELS[k] || k}: ${v}`)
+              .join(" • ") || "Sin pedidos en el rango"}
+          </p>
+
+          <h4 style={{ marginTop: 12 }}>Ingresos por día</h4>
+          <div style={{ display: "grid", gap: 2 }}>
+            {data.revenue_por_dia.map((d) => (
+              <div key={d.dia} style={{ display: "flex", gap: 8, alignItems: "center" }}>
+                <span className="hint" style={{ width: 90 }}>{d.dia}</span>
+                <div
+                  style={{
+                    height: 10,
+                    width: `${(d.revenue / maxDia) * 60}%`,
+                    minWidth: d.revenue ? 2 : 0,
+                    background: "var(--primary, #b5651d)",
+                    borderRadius: 4,
+                  }}
+                />
+                <span className="hint">{PEN.format(d.revenue)} ({d.pedidos})</span>
+              </div>
+            ))}
+          </div>
+
+          <h4 style={{ marginTop: 12 }}>Productos más vendidos</h4>
+          <div className="receipt__tableWrap">
+            <table className="receipt__table" style={{ width: "100%" }}>
+              <thead>
+                <tr>
+                  <th>Producto</th>
+                  <th>Cantidad</th>
+                  <th>Ingresos</th>
+                </tr>
+              </thead>
+              <tbody>
+                {data.top_productos.por_qty.map((p) => (
+                  <tr key={p.producto_id}>
+                    <td>{p.nombre || p.producto_id}</td>
+                    <td>{p.qty}</td>
+                    <td>{PEN.format(p.revenue)}</td>
+                  </tr>
+                ))}
+              </tbody>
+            </table>
+          </div>
+        </>
+      )}
+    </div>
+  );
+}
+
 export default function Admin() {
   const { token, isAuthenticated, user } = useAuth();
   const nav = useNavigate();
@@ -883,10 +1065,19 @@ export default function Admin() {
         >
           Pedidos
         </button>
+        <button
+          className={`btn ${
+            tab === "ventas" ? "btn-primary" : "btn-outline-secondary"
+          }`}
+          onClick={() => setTab("ventas")}
+        >
+          Ventas
+        </button>
       </div>
 
       {tab === "productos" && <ProductsSection token={token} onMsg={onMsg} />}
       {tab === "pedidos" && <OrdersSectionGrouped token={token} onMsg={onMsg} />}
+      {tab === "ventas" && <SalesSection token={token} onMsg={onMsg} />}
     </main>
   );
 }
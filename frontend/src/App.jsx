@@ -12,6 +12,7 @@ import Checkout from './Checkout.jsx';
 import Orders from './Orders.jsx';
 import ProfileModal from './ProfileModal.jsx';
 import AccessibilityMenu from "./AccessibilityMenu.jsx";
+import { assetUrl } from "./api/client";
 
 // 🔐 Admin
 import AdminRoute from "./AdminRoute.jsx";
@@ -20,7 +21,7 @@ import Admin from "./Admin.jsx";
 function Header({ onOpenProfile }) {
   const { isAuthenticated, isAdmin, firstName, user, logout } = useAuth();
   const { items, total } = useCart();
-  const avatarUrl = user?.avatarUrl || null;
+  const avatarUrl = assetUrl(user?.avatarUrl) || null;
   const initial = (firstName || 'U')[0]?.toUpperCase();
 
   return (
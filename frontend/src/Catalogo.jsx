@@ -6,6 +6,7 @@ import { useAuth } from './AuthContext.jsx';
 import ProductoCard from './ProductoCard';
 
 const VALID_CATS = new Set(['', 'pan', 'postre']); // en el seed solo hay estas
+const POLL_MS = 30000; // refresco del catálogo (petición condicional: 304 si no cambió)
 
 export default function Catalogo() {
   const { isAuthenticated } = useAuth();
@@ -18,11 +19,21 @@ export default function Catalogo() {
   );
 
   const [items, setItems] = useState([]);
+  const [comentarios, setComentarios] = useState({}); // { [productoId]: top-K }
   const [loading, setLoading] = useState(true);
   const [search, setSearch] = useState(''); // 🔍 texto de búsqueda
 
   useEffect(() => {
     let alive = true;
+    let timer = null;
+    const refetch = () =>
+      apix
+        .getProductos(categoria)
+        .then((d) => {
+          if (alive && Array.isArray(d)) setItems(d);
+        })
+        .catch(() => {});
+
     setLoading(true);
     apix
       .getProductos(categoria)
@@ -36,11 +47,57 @@ export default function Catalogo() {
       .finally(() => {
         if (alive) setLoading(false);
       });
+
+    // Polling silencioso (sólo con la pestaña visible) si no hay stream
+    const startPolling = () => {
+      if (timer || !alive) return;
+      timer = setInterval(() => {
+        if (document.visibilityState === 'visible') refetch();
+      }, POLL_MS);
+    };
+
+    // Cambios en vivo: los updates de campos visibles se aplican en el lugar;
+    // altas, bajas y cambios de categoría/activo recargan el listado filtrado.
+    const close = apix.streamProductos({
+      onChange: (ch) => {
+        if (ch.op !== 'update' || 'activo' in ch.set || 'categoria' in ch.set) {
+          refetch();
+          return;
+        }
+        setItems((prev) =>
+          prev.map((p) => (p._id === ch._id ? apix.mergeProducto(p, ch.set) : p))
+        );
+      },
+      onReset: refetch,
+      onUnavailable: startPolling,
+    });
+
     return () => {
       alive = false;
+      close();
+      clearInterval(timer);
     };
   }, [categoria]);
 
+  // Comentarios de todas las tarjetas en una sola petición (no una por producto)
+  const ids = useMemo(
+    () => items.map((p) => p._id || p.id).filter(Boolean).join(','),
+    [items]
+  );
+  useEffect(() => {
+    let alive = true;
+    if (!ids) return undefined;
+    apix
+      .getComentariosBatch(ids.split(','), 3)
+      .then((d) => {
+        if (alive) setComentarios(d);
+      })
+      .catch(() => {});
+    return () => {
+      alive = false;
+    };
+  }, [ids]);
+
   function onChangeCategoria(e) {
     const v = e.target.value;
     if (v) setParams({ cat: v });
@@ -139,7 +196,11 @@ export default function Catalogo() {
           }}
         >
           {filteredItems.map((p) => (
-            <ProductoCard key={p._id || p.id || p.nombre} p={p} />
+            <ProductoCard
+              key={p._id || p.id || p.nombre}
+              p={p}
+              comentariosIniciales={comentarios[p._id || p.id]}
+            />
           ))}
         </div>
       )}
@@ -1,8 +1,8 @@
 // src/Checkout.jsx
-import { useMemo, useState } from "react";
+import { useMemo, useRef, useState } from "react";
 import { useAuth } from "./AuthContext.jsx";
 import { useCart } from "./CartContext.jsx";
-import { apix } from "./api/api";
+import { apix, newIdempotencyKey } from "./api/api";
 import { useNavigate, useLocation } from "react-router-dom";
 
 const TEL_RGX = /^[\d+\-\s]{6,20}$/;
@@ -28,6 +28,7 @@ export default function Checkout() {
   const [done, setDone] = useState(null);
   const [msg, setMsg] = useState("");
   const [errors, setErrors] = useState({});
+  const attemptRef = useRef(null); // { body, key } del último intento sin confirmar
 
   const PEN = useMemo(
     () => new Intl.NumberFormat("es-PE", { style: "currency", currency: "PEN" }),
@@ -94,9 +95,19 @@ export default function Checkout() {
       notas: form.notas?.trim() || "",
     };
 
+    // Mismo pedido que un intento fallido -> misma clave (el servidor no lo
+    // duplica si el primero sí llegó); si cambió el carrito o los datos, clave nueva.
+    const body = JSON.stringify(payload);
+    if (attemptRef.current?.body !== body) {
+      attemptRef.current = { body, key: newIdempotencyKey() };
+    }
+
     try {
       setSubmitting(true);
-      const o = await apix.createOrder(token, payload);
+      const o = await apix.createOrder(token, payload, {
+        idempotencyKey: attemptRef.current.key,
+      });
+      attemptRef.current = null;
       setDone(o);
       clear();
       setForm({
@@ -22,6 +22,8 @@ export default function Orders() {
   const loc = useLocation();
 
   const [orders, setOrders] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [expanded, setExpanded] = useState({});           // {orderId: bool}
   const [details, setDetails] = useState({});             // {orderId: detailObj}
   const [loading, setLoading] = useState(false);
@@ -62,8 +64,11 @@ export default function Orders() {
     (async () => {
       try {
         setLoading(true);
-        const data = await apix.myOrders(token);
-        if (alive) setOrders(Array.isArray(data) ? data : []);
+        const page = await apix.myOrdersPage(token);
+        if (alive) {
+          setOrders(page.items);
+          setNextCursor(page.next);
+        }
       } catch {
         if (alive) setMsg("No se pudieron cargar tus pedidos.");
       } finally {
@@ -76,6 +81,20 @@ export default function Orders() {
     };
   }, [isAuthenticated, token]);
 
+  async function loadMore() {
+    if (!nextCursor) return;
+    setLoadingMore(true);
+    try {
+      const page = await apix.myOrdersPage(token, nextCursor);
+      setOrders((prev) => [...prev, ...page.items]);
+      setNextCursor(page.next);
+    } catch {
+      setMsg("No se pudieron cargar más pedidos.");
+    } finally {
+      setLoadingMore(false);
+    }
+  }
+
   async function toggle(order) {
     const id = order._id ?? order.id ?? order.code;
     const isOpen = !!expanded[id];
@@ -305,6 +324,18 @@ export default function Orders() {
               );
             })}
           </div>
+
+          {nextCursor && (
+            <div style={{ textAlign: "center", marginTop: 16 }}>
+              <button
+                className="btn btn-outline-secondary"
+                onClick={loadMore}
+                disabled={loadingMore}
+              >
+                {loadingMore ? "Cargando…" : "Ver más pedidos"}
+              </button>
+            </div>
+          )}
         </main>
       </div>
 
@@ -5,7 +5,7 @@ import { apix } from './api/api';
 import { useAuth } from './AuthContext.jsx';
 import { useCart } from './CartContext.jsx';
 
-export default function ProductoCard({ p }) {
+export default function ProductoCard({ p, comentariosIniciales }) {
   const { token, email } = useAuth();
   const { addItem } = useCart();
   const nav = useNavigate();
@@ -14,6 +14,8 @@ export default function ProductoCard({ p }) {
   const [texto, setTexto] = useState('');
   const [rating, setRating] = useState(5);
   const [comentarios, setComentarios] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [paginado, setPaginado] = useState(false); // false: top-K del catálogo
   const [busyAdd, setBusyAdd] = useState(false);
   const [busyCmt, setBusyCmt] = useState(false);
   const [msg, setMsg] = useState('');
@@ -33,16 +35,28 @@ export default function ProductoCard({ p }) {
     return Number.isFinite(x) ? Math.min(5, Math.max(1, Math.trunc(x))) : 5;
   }
 
-  async function cargarComentarios() {
+  // Primera página (o la siguiente con `cursor`) del listado paginado
+  async function cargarComentarios(cursor = null) {
     try {
-      const data = await apix.getComentarios(prodId);
-      setComentarios(Array.isArray(data) ? data : []);
+      const page = await apix.getComentariosPage(prodId, cursor);
+      setComentarios((prev) => (cursor ? [...prev, ...page.items] : page.items));
+      setNextCursor(page.next);
+      setPaginado(true);
     } catch {
       // silencioso
     }
   }
 
-  useEffect(() => { if (prodId) cargarComentarios(); /* eslint-disable-next-line */ }, [prodId]);
+  // El catálogo trae el top-K de todas las tarjetas en una sola petición
+  useEffect(() => {
+    if (Array.isArray(comentariosIniciales) && !paginado) {
+      setComentarios(comentariosIniciales);
+    }
+    // eslint-disable-next-line
+  }, [comentariosIniciales]);
+
+  const totalComentarios = p.rating_stats?.count ?? comentarios.length;
+  const hayMas = paginado ? Boolean(nextCursor) : totalComentarios > comentarios.length;
 
   async function enviarComentario(e) {
     e.preventDefault();
@@ -91,6 +105,7 @@ export default function ProductoCard({ p }) {
 
   const nombre = p.nombre ?? 'Producto';
   const precio = Number(p.precio ?? 0);
+  const stats = p.rating_stats; // agregado precalculado en el backend
 
   return (
     <article className="card">
@@ -135,6 +150,11 @@ export default function ProductoCard({ p }) {
           }}
         >
           <div className="price">{PEN.format(precio)}</div>
+          {stats?.count > 0 && (
+            <span className="hint" title={`${stats.count} valoraciones`}>
+              ★ {Number(stats.avg ?? stats.sum / stats.count).toFixed(1)} ({stats.count})
+            </span>
+          )}
           <button
             className="btn btn-primary"
             onClick={handleAdd}
@@ -147,7 +167,7 @@ export default function ProductoCard({ p }) {
 
         <section aria-label="Comentarios" style={{ marginTop: 14 }}>
           <h4 style={{ margin: '8px 0' }}>
-            Comentarios {comentarios.length > 0 ? `(${comentarios.length})` : ''}
+            Comentarios {totalComentarios > 0 ? `(${totalComentarios})` : ''}
           </h4>
 
           {comentarios.length === 0 ? (
@@ -168,6 +188,17 @@ export default function ProductoCard({ p }) {
               })}
             </ul>
           )}
+
+          {hayMas && (
+            <button
+              type="button"
+              className="btn btn-outline-secondary"
+              style={{ marginTop: 8 }}
+              onClick={() => cargarComentarios(paginado ? nextCursor : null)}
+            >
+              Ver más comentarios
+            </button>
+          )}
         </section>
 
         {token ? (
@@ -2,6 +2,7 @@
 import { useEffect, useRef, useState } from "react";
 import { useAuth } from "./AuthContext.jsx";
 import { apix } from "./api/api";
+import { assetUrl } from "./api/client";
 
 // Util: vista previa de imagen local (solo para UI)
 function fileToDataURL(file) {
@@ -45,7 +46,7 @@ export default function ProfileModal({ open, onClose }) {
         genero: user?.genero ?? "na",
         fecha_nacimiento: user?.fecha_nacimiento ?? "",
       });
-      setAvatar(user?.avatarUrl || "");
+      setAvatar(assetUrl(user?.avatarUrl) || "");
       setMsg("");
     }
   }, [open, user]);
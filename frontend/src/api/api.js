@@ -1,5 +1,5 @@
 // src/api/api.js
-import { api, authHeader } from "./client";
+import { api, apiPage, assetUrl, authHeader } from "./client";
 
 /** ---- Helpers ---- **/
 const mapProduct = (doc = {}) => {
@@ -11,19 +11,111 @@ const mapProduct = (doc = {}) => {
     descripcion: doc.descripcion ?? null,
     precio,
     categoria: doc.category ?? doc.categoria ?? null,
-    imagenUrl: doc.image ?? doc.imagenUrl ?? null,
     slug: doc.slug ?? null,
     activo,
     disponible: Boolean(activo),
     ...doc,
+    imagenUrl: assetUrl(doc.image ?? doc.imagenUrl ?? null),
   };
 };
 
+// Server-Sent Events: `handlers` = { nombreEvento: (data) => ... }.
+// EventSource reconecta solo y manda Last-Event-ID para no perder cambios.
+// onUnavailable: el servidor no tiene stream (503 / "unavailable").
+// Con `onDrop(lastEventId)` no se deja reconectar al navegador: se cierra y
+// quien abrió decide (ver openTicketStream).
+function openStream(path, handlers, onUnavailable, { onOpen, onDrop } = {}) {
+  if (typeof EventSource === "undefined") {
+    onUnavailable?.();
+    return () => {};
+  }
+  const es = new EventSource(assetUrl(path));
+  let lastId = null;
+  for (const [name, fn] of Object.entries(handlers)) {
+    es.addEventListener(name, (e) => {
+      if (e.lastEventId) lastId = e.lastEventId;
+      fn(JSON.parse(e.data));
+    });
+  }
+  es.addEventListener("unavailable", () => {
+    es.close();
+    onUnavailable?.();
+  });
+  if (onOpen) es.onopen = onOpen;
+  es.onerror = () => {
+    if (onDrop) {
+      es.close();
+      onDrop(lastId);
+    } else if (es.readyState === EventSource.CLOSED) {
+      // Error definitivo (503, 401...): el navegador ya no reintenta
+      onUnavailable?.();
+    }
+  };
+  return () => es.close();
+}
+
+const STREAM_MAX_RETRIES = 5;
+const STREAM_RETRY_MS = 2000;
+
+// Streams con auth: el JWT no va en la URL. Cada conexión pide por POST un
+// ticket de un solo uso; como el navegador repetiría el ticket ya canjeado al
+// reconectar, aquí se reconecta a mano con un ticket nuevo y el último id.
+function openTicketStream(token, ticketPath, streamPath, handlers, onUnavailable) {
+  let closed = false;
+  let close = () => {};
+  let timer = null;
+  let failures = 0;
+
+  const connect = async (lastEventId) => {
+    let ticket;
+    try {
+      ({ ticket } = await api(ticketPath, { method: "POST", headers: { ...authHeader(token) } }));
+    } catch {
+      if (!closed) onUnavailable?.();
+      return;
+    }
+    if (closed) return;
+    const q = new URLSearchParams({ ticket });
+    if (lastEventId) q.set("lastEventId", lastEventId);
+    close = openStream(`${streamPath}?${q}`, handlers, onUnavailable, {
+      onOpen: () => {
+        failures = 0;
+      },
+      onDrop: (lastId) => {
+        if (closed) return;
+        if (++failures > STREAM_MAX_RETRIES) {
+          onUnavailable?.();
+          return;
+        }
+        timer = setTimeout(() => connect(lastId ?? lastEventId), STREAM_RETRY_MS * failures);
+      },
+    });
+  };
+
+  if (typeof EventSource === "undefined") {
+    onUnavailable?.();
+    return () => {};
+  }
+  connect(null);
+  return () => {
+    closed = true;
+    clearTimeout(timer);
+    close();
+  };
+}
+
+export const newIdempotencyKey = () =>
+  globalThis.crypto?.randomUUID?.() ?? `${Date.now()}-${Math.random().toString(36).slice(2)}`;
+
 const jsonHeaders = (token) => ({
   "Content-Type": "application/json",
   ...(token ? authHeader(token) : {}),
 });
 
+// El backend responde con ETag + "Cache-Control: no-cache": con cache "no-cache"
+// el navegador revalida con If-None-Match y reutiliza su copia si llega un 304.
+const revalidate = { cache: "no-cache" };
+
 const handle = async (fn) => {
   try {
     return await fn();
@@ -87,11 +179,29 @@ export const apix = {
   getProductos(categoria = "") {
     return handle(async () => {
       const q = categoria ? `?categoria=${encodeURIComponent(categoria)}` : "";
-      const data = await api(`/api/productos${q}`);
+      const data = await api(`/api/productos${q}`, revalidate);
       return Array.isArray(data) ? data.map(mapProduct) : [];
     });
   },
 
+  // Cambios del catálogo en vivo (SSE). Devuelve una función para cerrar.
+  // onChange({op, _id, set} | {op, producto}); onReset(): recargar el listado;
+  // onUnavailable(): el servidor no tiene stream, seguir con polling.
+  streamProductos({ onChange, onReset, onUnavailable }) {
+    return openStream("/api/productos/stream", {
+      producto: (change) => {
+        if (change.producto) change.producto = mapProduct(change.producto);
+        onChange?.(change);
+      },
+      reset: () => onReset?.(),
+    }, onUnavailable);
+  },
+
+  // Aplica un `set` parcial del stream a un producto ya mapeado
+  mergeProducto(producto, set) {
+    return mapProduct({ ...producto, ...set });
+  },
+
   // Endpoints públicos (si los sigues usando):
   upsertProducto(token, payload) {
     const id = payload._id || payload.id;
@@ -133,7 +243,7 @@ export const apix = {
       ];
       for (const url of qs) {
         try {
-          const data = await api(url);
+          const data = await api(url, revalidate);
           return Array.isArray(data) ? data : [];
         } catch {
           // probar siguiente variante
@@ -143,6 +253,24 @@ export const apix = {
     });
   },
 
+  // Top-K comentarios de muchos productos en una sola petición: { [id]: [...] }
+  getComentariosBatch(productIds, k = 3) {
+    return handle(async () => {
+      if (!productIds?.length) return {};
+      const params = new URLSearchParams({ k: String(k) });
+      productIds.forEach((id) => params.append("producto_id", id));
+      const data = await api(`/api/comentarios/batch?${params}`);
+      return data && typeof data === "object" ? data : {};
+    });
+  },
+
+  // Paginado (keyset): { items, next }
+  getComentariosPage(productId, cursor = null, limit = 10) {
+    const params = new URLSearchParams({ producto_id: productId, limit: String(limit) });
+    if (cursor) params.set("cursor", cursor);
+    return handle(() => apiPage(`/api/comentarios?${params}`, revalidate));
+  },
+
   createComentario(token, payload) {
     return handle(() =>
       api("/api/comentarios", {
@@ -158,26 +286,45 @@ export const apix = {
     return handle(() => api("/api/orders", { headers: { ...authHeader(token) } }));
   },
 
+  myOrdersPage(token, cursor = null) {
+    const q = cursor ? `?cursor=${encodeURIComponent(cursor)}` : "";
+    return handle(() => apiPage(`/api/orders${q}`, { headers: { ...authHeader(token) } }));
+  },
+
   orderDetail(token, orderId) {
     return handle(() =>
       api(`/api/orders/${encodeURIComponent(orderId)}`, { headers: { ...authHeader(token) } })
     );
   },
 
-  createOrder(token, payload) {
-    return handle(() =>
-      api("/api/orders", {
-        method: "POST",
-        headers: jsonHeaders(token),
-        body: JSON.stringify(payload),
-      })
-    );
+  // Con la misma Idempotency-Key el servidor crea el pedido una sola vez: se
+  // puede reintentar sin miedo si la red falla, si otro intento sigue en
+  // curso (409) o si el servidor está ocupado (429/503).
+  createOrder(token, payload, { idempotencyKey = newIdempotencyKey(), retries = 2 } = {}) {
+    return handle(async () => {
+      for (let attempt = 0; ; attempt++) {
+        try {
+          return await api("/api/orders", {
+            method: "POST",
+            headers: { ...jsonHeaders(token), "Idempotency-Key": idempotencyKey },
+            body: JSON.stringify(payload),
+          });
+        } catch (e) {
+          const retryable = !e.status || [409, 429, 502, 503, 504].includes(e.status);
+          if (!retryable || attempt >= retries) throw e;
+          await new Promise((ok) => setTimeout(ok, 1000 * (attempt + 1)));
+        }
+      }
+    });
   },
 
   /* ========== ADMIN: Productos ========== */
   adminListProducts(token) {
     return handle(async () => {
-      const data = await api("/api/admin/products", { headers: { ...authHeader(token) } });
+      const data = await api("/api/admin/products", {
+        ...revalidate,
+        headers: { ...authHeader(token) },
+      });
       return Array.isArray(data) ? data.map(mapProduct) : [];
     });
   },
@@ -238,6 +385,36 @@ export const apix = {
     );
   },
 
+  adminListOrdersPage(token, { cursor = null, status = "" } = {}) {
+    const params = new URLSearchParams();
+    if (cursor) params.set("cursor", cursor);
+    if (status) params.set("status", status);
+    const q = params.toString() ? `?${params}` : "";
+    return handle(() =>
+      apiPage(`/api/admin/orders${q}`, { headers: { ...authHeader(token) } })
+    );
+  },
+
+  // Tablero de pedidos en vivo (SSE), abierto con un ticket de un solo uso.
+  // onSnapshot(pedidos abiertos) al conectar o resincronizar;
+  // onPedido({op: "upsert", pedido} | {op: "delete", _id}).
+  adminOrdersStream(token, { onSnapshot, onPedido, onUnavailable }) {
+    return openTicketStream(token, "/api/admin/orders/stream-ticket", "/api/admin/orders/stream", {
+      snapshot: (list) => onSnapshot?.(list),
+      pedido: (change) => onPedido?.(change),
+    }, onUnavailable);
+  },
+
+  // Analítica de ventas (agregada en el servidor): { revenue_por_dia, pedidos_por_estado, ... }
+  adminAnalytics(token, { desde = "", hasta = "", top = 10 } = {}) {
+    const params = new URLSearchParams({ top: String(top) });
+    if (desde) params.set("desde", desde);
+    if (hasta) params.set("hasta", hasta);
+    return handle(() =>
+      api(`/api/admin/analytics?${params}`, { headers: { ...authHeader(token) } })
+    );
+  },
+
   adminOrderDetail(token, id) {
     return handle(() =>
       api(`/api/admin/orders/${encodeURIComponent(id)}`, {
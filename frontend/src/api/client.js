@@ -1,13 +1,18 @@
 // src/api/client.js
 const BASE = import.meta.env.VITE_API_URL || "http://127.0.0.1:8000";
 
+// Las imágenes servidas por la API llegan como ruta relativa ("/api/...").
+export function assetUrl(url) {
+  return typeof url === "string" && url.startsWith("/api/") ? `${BASE}${url}` : url;
+}
+
 export function authHeader(token) {
   return token ? { Authorization: `Bearer ${token}` } : {};
 }
 
 // Cliente genérico SIN headers extra en GET.
 // Solo añade Content-Type si hay body (POST/PUT/PATCH/DELETE con JSON).
-export async function api(path, opts = {}) {
+async function request(path, opts = {}) {
   const headers = new Headers(opts.headers || {});
 
   // Si hay cuerpo y no es FormData -> JSON
@@ -21,8 +26,25 @@ export async function api(path, opts = {}) {
 
   if (!res.ok) {
     const txt = await res.text().catch(() => "");
-    throw new Error(txt || `${res.status} Error`);
+    const err = new Error(txt || `${res.status} Error`);
+    err.status = res.status;
+    throw err;
   }
+  return res;
+}
 
+export async function api(path, opts = {}) {
+  const res = await request(path, opts);
   return res.status === 204 ? null : res.json();
 }
+
+// Listados paginados (keyset): devuelve la página y el cursor de la siguiente
+// (cabecera X-Next-Cursor; null si no hay más).
+export async function apiPage(path, opts = {}) {
+  const res = await request(path, opts);
+  const data = await res.json();
+  return {
+    items: Array.isArray(data) ? data : [],
+    next: res.headers.get("X-Next-Cursor"),
+  };
+}
@@ -0,0 +1,98 @@
+# load/bench/bench_bson.py
+# Decodificación de listados (sin Mongo): mide tiempo y pico de memoria de
+# pasar un lote BSON de N pedidos a la lista que se codifica en la respuesta.
+#   - antes:      documento completo, dict(doc) + str(_id), y reshape
+#   - proyección: sólo los campos de OrderOut, mismo camino
+#   - modo listado: proyección + database.LIST_CODEC_OPTIONS (ObjectId -> str
+#                   en el codec) y el shape del router, sin copias
+#   - RawBSON:    igual pero con RawBSONDocument (decodificación perezosa)
+#
+#   python load/bench/bench_bson.py [--n 10000] [--repeat 5]
+import argparse
+import os
+import random
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "backend"))
+os.environ.setdefault("MONGODB_URI", "mongodb://127.0.0.1:27017")
+
+import bson  # noqa: E402
+from bson import ObjectId  # noqa: E402
+from bson.codec_options import CodecOptions  # noqa: E402
+from bson.raw_bson import RawBSONDocument  # noqa: E402
+
+from app.database import LIST_CODEC_OPTIONS, serialize_doc  # noqa: E402
+from app.routers.orders import _LIST_PROJECTION, _order_shape  # noqa: E402
+
+RAW_OPTIONS = CodecOptions(document_class=RawBSONDocument, type_registry=LIST_CODEC_OPTIONS.type_registry)
+
+
+def fake_pedido(rnd: random.Random, i: int) -> dict:
+    items = [{
+        "producto_id": str(ObjectId()),
+        "nombre": f"Producto {j}",
+        "precio": 2.5,
+        "qty": rnd.randint(1, 4),
+        "subtotal": 5.0,
+        "imagenUrl": f"/api/imagenes/{os.urandom(32).hex()}",
+    } for j in range(rnd.randint(1, 6))]
+    return {
+        "_id": ObjectId(),
+        "code": f"SR-20250101-{i:06d}",
+        "userId": ObjectId(),
+        "items": items,
+        "total": round(rnd.uniform(5, 300), 2),
+        "status": rnd.choice(["CREATED", "PAID", "CANCELLED", "DELIVERED"]),
+        "delivery": {"nombre": "Ana", "telefono": "999999999", "direccion": "Av. Siempre Viva 742", "notas": None},
+        "createdAt": datetime(2025, 1, 1) + timedelta(seconds=i),
+    }
+
+
+def project(doc: dict) -> dict:
+    return {k: v for k, v in doc.items() if k == "_id" or k in _LIST_PROJECTION}
+
+
+def measure(fn, repeat: int) -> tuple[float, int]:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return best, peak
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--n", type=int, default=10000)
+    ap.add_argument("--repeat", type=int, default=5)
+    args = ap.parse_args()
+
+    rnd = random.Random(args.n)
+    docs = [fake_pedido(rnd, i) for i in range(args.n)]
+    full = b"".join(bson.encode(d) for d in docs)
+    projected = b"".join(bson.encode(project(d)) for d in docs)
+
+    modes = {
+        "antes (doc completo)": lambda: [_order_shape(serialize_doc(d)) for d in bson.decode_all(full)],
+        "proyección": lambda: [_order_shape(serialize_doc(d)) for d in bson.decode_all(projected)],
+        "modo listado": lambda: [_order_shape(d) for d in bson.decode_all(projected, LIST_CODEC_OPTIONS)],
+        "RawBSON + codec": lambda: [_order_shape(d) for d in bson.decode_all(projected, RAW_OPTIONS)],
+    }
+    print(f"n={args.n}  lote completo {len(full) / 1e6:.1f} MB, proyectado {len(projected) / 1e6:.1f} MB")
+    base = None
+    for label, fn in modes.items():
+        t, peak = measure(fn, args.repeat)
+        base = base or t
+        print(f"  {label:<22} {t * 1000:8.2f} ms  x{base / t:5.2f}  pico {peak / 1e6:6.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+# load/bench/bench_metrics.py
+# Costo por request de metrics.MetricsMiddleware: se llama N veces a una app
+# ASGI mínima, con y sin el middleware, y se reporta la diferencia por request.
+#
+#   python load/bench/bench_metrics.py [--n 200000]
+import argparse
+import asyncio
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "backend"))
+os.environ.setdefault("MONGODB_URI", "mongodb://127.0.0.1:27017")
+
+from app.metrics import MetricsMiddleware  # noqa: E402
+
+
+class _Route:
+    path = "/api/orders/{order_id}"
+
+
+async def app(scope, receive, send):
+    scope["route"] = _Route  # lo que deja el router de FastAPI
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"{}"})
+
+
+async def receive():
+    return {"type": "http.request", "body": b""}
+
+
+async def send(message):
+    pass
+
+
+async def run(handler, n: int) -> float:
+    t0 = time.perf_counter()
+    for _ in range(n):
+        await handler({"type": "http", "method": "GET", "path": "/api/orders/1"}, receive, send)
+    return time.perf_counter() - t0
+
+
+async def main(n: int) -> None:
+    wrapped = MetricsMiddleware(app)
+    await run(wrapped, 1000)  # calentamiento
+    base = min([await run(app, n) for _ in range(3)])
+    inst = min([await run(wrapped, n) for _ in range(3)])
+    print(f"n={n}  sin middleware {base / n * 1e6:.2f} µs/req  con middleware {inst / n * 1e6:.2f} µs/req")
+    print(f"costo del middleware: {(inst - base) / n * 1e6:.2f} µs/req")
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--n", type=int, default=200_000)
+    asyncio.run(main(ap.parse_args().n))
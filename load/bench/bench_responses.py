@@ -0,0 +1,105 @@
+# load/bench/bench_responses.py
+# Micro-benchmark de la capa de respuesta de los listados (sin Mongo ni red):
+# compara validar con el response_model + codificar (camino por defecto) con
+# la salida de confianza (TRUST_MONGO_OUTPUT) codificada con json de la
+# stdlib y con orjson (FAST_JSON).
+#
+#   python load/bench/bench_responses.py [--sizes 1000,10000] [--repeat 5]
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "backend"))
+os.environ.setdefault("MONGODB_URI", "mongodb://127.0.0.1:27017")
+
+from bson import ObjectId  # noqa: E402
+
+from app import responses  # noqa: E402
+from app.routers.orders import _order_shape, _orders_adapter  # noqa: E402
+from app.routers.productos import _producto_shape, _productos_adapter  # noqa: E402
+
+CATEGORIAS = ["pan", "pasteles", "galletas", "bebidas"]
+
+
+def fake_productos(n: int) -> list[dict]:
+    rnd = random.Random(n)
+    out = []
+    for i in range(n):
+        count = rnd.randint(0, 40)
+        hist = {str(r): rnd.randint(0, 10) for r in range(1, 6)} if count else {}
+        out.append({
+            "_id": str(ObjectId()),
+            "nombre": f"Producto {i}",
+            "descripcion": "Hecho a mano cada mañana con masa madre",
+            "precio": round(rnd.uniform(0.5, 40), 2),
+            "stock": rnd.randint(0, 200),
+            "activo": rnd.random() > 0.1,
+            "imagenUrl": f"/api/imagenes/{os.urandom(32).hex()}",
+            "categoria": rnd.choice(CATEGORIAS),
+            **({"rating_stats": {"count": count, "sum": count * 4, "hist": hist}} if count else {}),
+        })
+    return out
+
+
+def fake_pedidos(n: int) -> list[dict]:
+    rnd = random.Random(n)
+    base = datetime(2025, 1, 1)
+    return [{
+        "_id": ObjectId(),
+        "code": f"SR-20250101-{i:06d}",
+        "total": round(rnd.uniform(5, 300), 2),
+        "status": rnd.choice(["CREATED", "PAID", "CANCELLED", "DELIVERED"]),
+        "createdAt": base + timedelta(seconds=i, milliseconds=rnd.randint(0, 999)),
+    } for i in range(n)]
+
+
+def timeit(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def run(name: str, adapter, shape, docs: list[dict], repeat: int) -> None:
+    def mode(trust: bool, fast: bool):
+        def go():
+            responses.TRUST_MONGO_OUTPUT, responses.FAST_JSON = trust, fast
+            return responses.encode_list(adapter, docs, shape)
+        return go
+
+    modes = [("validado (pydantic)", False, False), ("confianza + json", True, False)]
+    if responses.orjson is not None:
+        modes.append(("confianza + orjson", True, True))
+    else:
+        print("  (orjson no instalado: se omite FAST_JSON)")
+
+    base = None
+    for label, trust, fast in modes:
+        t = timeit(mode(trust, fast), repeat)
+        base = base or t
+        print(f"  {name:<10} n={len(docs):>6}  {label:<22} {t * 1000:9.2f} ms  x{base / t:5.2f}")
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", default="1000,10000")
+    ap.add_argument("--repeat", type=int, default=5)
+    args = ap.parse_args()
+
+    saved = responses.TRUST_MONGO_OUTPUT, responses.FAST_JSON
+    try:
+        for n in (int(s) for s in args.sizes.split(",")):
+            run("productos", _productos_adapter, _producto_shape, fake_productos(n), args.repeat)
+            run("pedidos", _orders_adapter, _order_shape, fake_pedidos(n), args.repeat)
+    finally:
+        responses.TRUST_MONGO_OUTPUT, responses.FAST_JSON = saved
+
+
+if __name__ == "__main__":
+    main()
@@ -12,7 +12,7 @@ os.environ.setdefault("MONGODB_URI", "mongodb://127.0.0.1:27017")
 os.environ.setdefault("MONGODB_DB", "sabor_test")
 
 from app.main import app
-from app import database as dbmod
+from app import admission, database as dbmod
 
 @pytest.fixture
 def anyio_backend():
@@ -39,6 +39,7 @@ async def client():
     dbmod.db = new_client[mongo_db]
 
     app.state.db = dbmod.db
+    admission.reset()  # los buckets por cliente no se arrastran entre tests
 
     async with LifespanManager(app):
         transport = ASGITransport(app=app)
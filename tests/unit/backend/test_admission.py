@@ -0,0 +1,99 @@
+import asyncio
+
+import pytest
+from fastapi import Depends, FastAPI
+from httpx import ASGITransport, AsyncClient
+
+from app import admission, metrics
+
+
+def _app(limiter: admission.Limiter) -> FastAPI:
+    app = FastAPI()
+
+    @app.post("/lento", dependencies=[Depends(limiter)])
+    async def lento(espera: float = 0.0):
+        await asyncio.sleep(espera)
+        return {"ok": True}
+
+    return app
+
+
+def _rechazos(name: str, reason: str) -> float:
+    return admission.REJECTED._values.get((name, reason), 0)
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_token_bucket_por_cliente():
+    limiter = admission.Limiter("t_rate", concurrency=10, queue=0, wait=1, rate=1, burst=2)
+    async with AsyncClient(transport=ASGITransport(app=_app(limiter)), base_url="http://t") as client:
+        codes = [(await client.post("/lento")).status_code for _ in range(3)]
+        assert codes == [200, 200, 429]
+        r = await client.post("/lento")
+        assert r.status_code == 429
+        assert int(r.headers["Retry-After"]) >= 1
+
+    # otro cliente tiene su propio bucket
+    limiter.take_token("10.0.0.2")
+    assert _rechazos("t_rate", "rate") == 2
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_concurrencia_acotada_con_cola_y_espera():
+    limiter = admission.Limiter("t_conc", concurrency=1, queue=1, wait=0.2)
+    async with AsyncClient(transport=ASGITransport(app=_app(limiter)), base_url="http://t") as client:
+        codes = await asyncio.gather(
+            client.post("/lento", params={"espera": 0.5}),  # toma el turno
+            client.post("/lento"),                          # espera y vence: 503
+            client.post("/lento"),                          # cola llena: 503
+        )
+    assert sorted(r.status_code for r in codes) == [200, 503, 503]
+    assert all("Retry-After" in r.headers for r in codes if r.status_code == 503)
+    assert _rechazos("t_conc", "timeout") == 1
+    assert _rechazos("t_conc", "queue_full") == 1
+    assert limiter.in_flight == 0 and not limiter._waiters
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_turno_pasa_al_siguiente_en_cola():
+    limiter = admission.Limiter("t_fifo", concurrency=1, queue=5, wait=2)
+    orden = []
+
+    async def turno(n: int):
+        await limiter.acquire()
+        orden.append(n)
+        await asyncio.sleep(0.01)
+        limiter.release()
+
+    await asyncio.gather(*(turno(n) for n in range(4)))
+    assert orden == [0, 1, 2, 3]
+    assert limiter.in_flight == 0
+
+
+@pytest.mark.unit
+def test_metricas_prometheus():
+    text = metrics.render()
+    assert 'admission_in_flight{limiter="auth"} 0' in text
+    assert 'admission_queue_depth{limiter="orders"} 0' in text
+    assert "# TYPE admission_rejected_total counter" in text
+
+
+@pytest.mark.unit
+def test_configuracion_por_entorno(monkeypatch):
+    monkeypatch.setenv("ADMISSION_DEMO_CONCURRENCY", "3")
+    monkeypatch.setenv("ADMISSION_DEMO_RATE", "0")
+    limiter = admission.Limiter.from_env("demo", concurrency=8, queue=4, wait=1.0, rate=5.0, burst=10)
+    assert (limiter.concurrency, limiter.queue, limiter.rate) == (3, 4, 0.0)
+    limiter.take_token("x")  # RATE=0: sin bucket
+
+
+@pytest.mark.unit
+def test_buckets_desactivados_por_defecto():
+    # JMeter: 50 hilos desde un mismo host no deben recibir 429 en el login
+    auth = admission.limiters["auth"]
+    assert all(l.rate == 0 for l in admission.limiters.values())
+    for _ in range(50):
+        auth.take_token("127.0.0.1")
+    assert auth.stats()["clients"] == 0
@@ -0,0 +1,62 @@
+from datetime import date, timedelta
+
+import pytest
+from bson import ObjectId
+
+from app import analytics
+from app import database as dbmod
+
+FACET = {
+    "estados": [
+        {"_id": {"dia": "2025-01-01", "status": "PAID"}, "pedidos": 2, "revenue": 30.0},
+        {"_id": {"dia": "2025-01-01", "status": "CANCELLED"}, "pedidos": 1, "revenue": 99.0},
+        {"_id": {"dia": "2025-01-02", "status": "CREATED"}, "pedidos": 1, "revenue": 10.0},
+    ],
+    "productos": [
+        {"_id": {"dia": "2025-01-01", "producto_id": "a"}, "nombre": "Pan", "qty": 5, "revenue": 10.0},
+        {"_id": {"dia": "2025-01-01", "producto_id": "b"}, "nombre": "Torta", "qty": 1, "revenue": 20.0},
+        {"_id": {"dia": "2025-01-02", "producto_id": "a"}, "nombre": "Pan", "qty": 5, "revenue": 10.0},
+    ],
+}
+
+
+@pytest.mark.unit
+def test_resumen_desde_dias():
+    days = analytics.days_from_facet(FACET, ["2025-01-01", "2025-01-02", "2025-01-03"])
+    assert days["2025-01-03"]["pedidos"] == 0  # los días sin ventas también se materializan
+    out = analytics.summarize(list(days.values()), top=1)
+
+    assert out["revenue_total"] == 40.0 and out["pedidos"] == 3
+    assert out["ticket_promedio"] == 13.33
+    assert out["pedidos_por_estado"] == {"PAID": 2, "CANCELLED": 1, "CREATED": 1}
+    assert [p["producto_id"] for p in out["top_productos"]["por_qty"]] == ["a"]
+    assert [p["producto_id"] for p in out["top_productos"]["por_revenue"]] == ["a"]
+    assert out["top_productos"]["por_qty"][0]["qty"] == 10
+    assert [d["revenue"] for d in out["revenue_por_dia"]] == [30.0, 10.0, 0.0]
+
+
+@pytest.mark.functional
+@pytest.mark.asyncio
+async def test_rollup_incremental_e_invalidacion(client):
+    db = dbmod.db
+    dia = date(2001, 2, 3)
+    ts = analytics.day_start_utc(dia) + timedelta(hours=12)
+    await db[analytics.ROLLUP].delete_many({"_id": {"$regex": "^2001-02-0"}})
+    await db.pedidos.delete_many({"code": {"$regex": "^TEST-2001"}})
+    oid = (await db.pedidos.insert_one({
+        "code": "TEST-2001-1", "userId": ObjectId(), "status": "PAID", "total": 12.5, "createdAt": ts,
+        "items": [{"producto_id": "p1", "nombre": "Pan", "qty": 5, "subtotal": 12.5}],
+    })).inserted_id
+
+    out = await analytics.sales_analytics(db, dia, dia + timedelta(2))
+    assert out["revenue_total"] == 12.5 and out["pedidos"] == 1
+    assert await db[analytics.ROLLUP].count_documents({"_id": {"$in": ["2001-02-03", "2001-02-04"]}}) == 2
+
+    # El rollup se usa tal cual: un cambio sin invalidar no se ve...
+    await db.pedidos.update_one({"_id": oid}, {"$set": {"status": "CANCELLED"}})
+    assert (await analytics.sales_analytics(db, dia, dia + timedelta(1)))["pedidos"] == 1
+    # ...y tras invalidar ese día se recalcula
+    await analytics.invalidate_day(db, ts.replace(tzinfo=None))
+    out = await analytics.sales_analytics(db, dia, dia + timedelta(1))
+    assert out["pedidos"] == 0 and out["pedidos_por_estado"] == {"CANCELLED": 1}
+    await db.pedidos.delete_one({"_id": oid})
@@ -10,6 +10,22 @@ async def test_password_hash_roundtrip():
     assert verify_password(plain, hashed)
     assert not verify_password("otra_clave", hashed)
 
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_password_hash_async_en_pool():
+    import asyncio
+    from app import security
+
+    hashed = await security.hash_password_async("demo123")
+    calls = security.hash_stats["calls"]
+    ok, ko = await asyncio.gather(
+        security.verify_password_async("demo123", hashed),
+        security.verify_password_async("otra_clave", hashed),
+    )
+    assert ok and not ko
+    assert security.hash_stats["calls"] == calls + 2
+    assert security.hash_stats["in_flight"] == 0 and security.hash_stats["waiting"] == 0
+
 @pytest.mark.functional
 @pytest.mark.asyncio
 async def test_register_login_me_flow(client):
@@ -43,3 +59,69 @@ async def test_login_fail_password_incorrecta(client):
         "password": "incorrecta"
     })
     assert res.status_code == status.HTTP_401_UNAUTHORIZED
+
+@pytest.mark.unit
+def test_decode_token_cachea_claims_hasta_exp():
+    from fastapi import HTTPException
+    from app.routers import auth
+
+    token = auth.create_access_token({"sub": "abc"}, expires_hours=1)
+    data = auth.decode_token(token)
+    assert data["sub"] == "abc"
+    # segunda verificación servida desde el cache (mismo objeto)
+    assert auth.decode_token(token) is data
+
+    expirado = auth.create_access_token({"sub": "abc"}, expires_hours=-1)
+    with pytest.raises(HTTPException) as exc:
+        auth.decode_token(expirado)
+    assert exc.value.detail == "Token expirado"
+    assert auth._token_cache.get(expirado) is None
+
+    with pytest.raises(HTTPException) as exc:
+        auth.decode_token(token + "x")
+    assert exc.value.status_code == 401
+
+@pytest.mark.functional
+@pytest.mark.asyncio
+async def test_update_me_devuelve_post_imagen(client):
+    email = f"user_upd_{id(object())}@example.com"
+    await client.post("/api/auth/register", json={
+        "email": email, "password": "demo123", "nombre": "Antes",
+        "telefono": "999999999", "direccion": "Calle Falsa 123",
+    })
+    token = (await client.post("/api/auth/login", json={"email": email, "password": "demo123"})).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+
+    r = await client.put("/api/auth/me", headers=headers, json={"nombre": "Después"})
+    assert r.status_code == status.HTTP_200_OK
+    body = r.json()
+    assert body["nombre"] == "Después" and body["email"] == email
+    assert "password_hash" not in body
+
+    me = (await client.get("/api/auth/me", headers=headers)).json()
+    assert me == body
+
+@pytest.mark.functional
+@pytest.mark.asyncio
+async def test_cache_de_usuario_sin_hash_ni_avatar(client):
+    from app.routers import auth
+
+    email = f"user_cache_{id(object())}@example.com"
+    await client.post("/api/auth/register", json={
+        "email": email, "password": "demo123", "nombre": "Cache",
+        "telefono": "999999999", "direccion": "Calle Falsa 123",
+    })
+    token = (await client.post("/api/auth/login", json={"email": email, "password": "demo123"})).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    uid = auth.decode_token(token)["sub"]
+
+    assert (await client.get("/api/auth/me", headers=headers)).status_code == status.HTTP_200_OK
+    cached = auth._user_cache.get(uid)
+    assert cached["email"] == email
+    assert "password_hash" not in cached and "avatarUrl" not in cached
+
+    r = await client.patch("/api/auth/change-password", headers=headers,
+                           json={"current_password": "demo123", "new_password": "nueva123"})
+    assert r.status_code == status.HTTP_200_OK
+    r = await client.post("/api/auth/login", json={"email": email, "password": "nueva123"})
+    assert r.status_code == status.HTTP_200_OK
@@ -0,0 +1,57 @@
+import pytest
+
+from app import cache as cachemod
+from app.cache import TTLCache
+
+
+@pytest.mark.unit
+def test_ttl_cache_get_set_y_lru():
+    c = TTLCache(maxsize=2, ttl=60)
+    c.set("a", 1)
+    c.set("b", 2)
+    assert c.get("a") == 1          # "a" pasa a ser la más reciente
+    c.set("c", 3)                   # expulsa "b"
+    assert c.get("b") is None
+    assert c.get("a") == 1 and c.get("c") == 3
+    assert len(c) == 2
+
+
+@pytest.mark.unit
+def test_ttl_cache_expira(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cachemod.time, "monotonic", lambda: now[0])
+    c = TTLCache(maxsize=10, ttl=5)
+    c.set("k", "v")
+    c.set("corto", "x", ttl=1)
+    now[0] += 2
+    assert c.get("corto") is None
+    assert c.get("k") == "v"
+    now[0] += 4
+    assert c.get("k") is None
+    assert c.misses == 2 and c.hits == 1
+
+
+@pytest.mark.unit
+def test_ttl_cache_clear_y_pop():
+    c = TTLCache()
+    c.set("a", 1)
+    assert c.pop("a") == 1
+    assert c.pop("a", "nada") == "nada"
+    c.set("b", 2)
+    c.clear()
+    assert c.get("b") is None
+
+
+@pytest.mark.unit
+def test_ttl_cache_no_guarda_lecturas_anteriores_a_una_invalidacion():
+    c = TTLCache()
+    gen = c.generation           # request A: miss, empieza a leer de Mongo
+    c.clear()                    # escritura admin: invalida
+    assert c.set("k", "viejo", generation=gen) is False
+    assert c.get("k") is None
+
+    gen = c.generation
+    assert c.set("k", "nuevo", generation=gen) is True
+    c.pop("otra")                # pop también invalida
+    assert c.set("k", "viejo", generation=gen) is False
+    assert c.get("k") == "nuevo"
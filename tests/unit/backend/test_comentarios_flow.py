@@ -27,3 +27,77 @@ async def test_flow_login_comentar_y_listar(client):
     c = rcom.json()
     assert c["producto_id"] == producto_id
     assert c["rating"] == 5
+
+
+@pytest.mark.asyncio
+async def test_comentarios_paginados_y_batch(client):
+    rlogin = await client.post("/api/auth/login", json={
+        "email": "demo@saborreal.com",
+        "password": "demo123"
+    })
+    token = rlogin.json()["access_token"]
+    prods = (await client.get("/api/productos")).json()
+    producto_id = prods[0]["_id"]
+
+    for i in range(3):
+        await client.post(
+            "/api/comentarios",
+            headers={"Authorization": f"Bearer {token}"},
+            json={"producto_id": producto_id, "texto": f"Comentario {i}", "rating": 4},
+        )
+
+    r1 = await client.get("/api/comentarios", params={"producto_id": producto_id, "limit": 2})
+    assert r1.status_code == status.HTTP_200_OK
+    assert len(r1.json()) == 2
+    cursor = r1.headers.get("x-next-cursor")
+    assert cursor
+
+    r2 = await client.get(
+        "/api/comentarios",
+        params={"producto_id": producto_id, "limit": 2, "cursor": cursor},
+    )
+    assert r2.status_code == status.HTTP_200_OK
+    ids1 = {c["_id"] for c in r1.json()}
+    assert not ids1 & {c["_id"] for c in r2.json()}
+
+    rb = await client.get("/api/comentarios/batch", params={"producto_id": [producto_id], "k": 2})
+    assert rb.status_code == status.HTTP_200_OK
+    top = rb.json()[producto_id]
+    assert [c["_id"] for c in top] == [c["_id"] for c in r1.json()]
+
+
+@pytest.mark.asyncio
+async def test_listado_condicional_solo_por_etag(client):
+    rlogin = await client.post("/api/auth/login", json={
+        "email": "demo@saborreal.com",
+        "password": "demo123"
+    })
+    token = rlogin.json()["access_token"]
+    producto_id = (await client.get("/api/productos")).json()[0]["_id"]
+    params = {"producto_id": producto_id}
+
+    r1 = await client.get("/api/comentarios", params=params)
+    assert "last-modified" not in r1.headers
+    etag = r1.headers["etag"]
+    assert (await client.get("/api/comentarios", params=params, headers={"If-None-Match": etag})).status_code == 304
+
+    # un comentario en el mismo segundo cambia el ETag
+    await client.post(
+        "/api/comentarios",
+        headers={"Authorization": f"Bearer {token}"},
+        json={"producto_id": producto_id, "texto": "Otro más", "rating": 3},
+    )
+    r2 = await client.get("/api/comentarios", params=params, headers={"If-None-Match": etag})
+    assert r2.status_code == status.HTTP_200_OK
+    assert r2.headers["etag"] != etag
+
+
+@pytest.mark.unit
+def test_batch_lee_k_por_producto():
+    from app.routers.comentarios import _batch_pipeline
+
+    pipeline = _batch_pipeline(["a", "b", "c"], 3)
+    ramas = [pipeline[:4]] + [s["$unionWith"]["pipeline"] for s in pipeline[4:]]
+    assert [r[0]["$match"]["producto_id"] for r in ramas] == ["a", "b", "c"]
+    assert all({"$limit": 3} in r for r in ramas)
+    assert not any("$group" in s for s in pipeline)
@@ -0,0 +1,44 @@
+from datetime import datetime, timezone
+from email.utils import format_datetime
+
+import pytest
+from starlette.requests import Request
+
+from app.conditional import conditional_response, make_etag
+
+
+def _request(headers: dict) -> Request:
+    raw = [(k.lower().encode(), v.encode()) for k, v in headers.items()]
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": raw})
+
+
+@pytest.mark.unit
+def test_etag_estable_y_fuerte():
+    assert make_etag(b"[]") == make_etag(b"[]")
+    assert make_etag(b"[]") != make_etag(b"[1]")
+    assert not make_etag(b"[]").startswith("W/")
+
+
+@pytest.mark.unit
+def test_if_none_match_devuelve_304():
+    body = b'[{"a":1}]'
+    etag = make_etag(body)
+    res = conditional_response(_request({"If-None-Match": f'"otro", {etag}'}), body)
+    assert res.status_code == 304 and res.body == b""
+    assert res.headers["etag"] == etag
+
+    res = conditional_response(_request({"If-None-Match": '"otro"'}), body)
+    assert res.status_code == 200 and res.body == body
+
+
+@pytest.mark.unit
+def test_if_modified_since():
+    lm = datetime(2025, 1, 1, 12, 0, 0)  # naive, como lo entrega Motor
+    later = format_datetime(datetime(2025, 1, 1, 12, 0, 5, tzinfo=timezone.utc), usegmt=True)
+    earlier = format_datetime(datetime(2025, 1, 1, 11, 0, tzinfo=timezone.utc), usegmt=True)
+
+    res = conditional_response(_request({"If-Modified-Since": later}), b"[]", last_modified=lm)
+    assert res.status_code == 304
+    res = conditional_response(_request({"If-Modified-Since": earlier}), b"[]", last_modified=lm)
+    assert res.status_code == 200
+    assert res.headers["last-modified"] == "Wed, 01 Jan 2025 12:00:00 GMT"
@@ -0,0 +1,105 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+from pymongo.errors import DuplicateKeyError
+
+from app import database, idempotency
+
+
+class _Coll:
+    """Colección en memoria con lo que usa idempotency (find_one/insert/update/delete por _id)."""
+
+    def __init__(self):
+        self.docs = {}
+
+    async def find_one(self, q):
+        doc = self.docs.get(q["_id"])
+        return dict(doc) if doc else None
+
+    async def insert_one(self, doc):
+        if doc["_id"] in self.docs:
+            raise DuplicateKeyError("dup")
+        self.docs[doc["_id"]] = dict(doc)
+
+    async def update_one(self, q, update):
+        self.docs[q["_id"]].update(update["$set"])
+
+    async def delete_one(self, q):
+        doc = self.docs.get(q["_id"])
+        if doc and doc["status"] == q["status"]:
+            del self.docs[q["_id"]]
+
+
+@pytest.fixture
+def coll(monkeypatch):
+    c = _Coll()
+    monkeypatch.setattr(database, "db", {idempotency.COLLECTION: c})
+    monkeypatch.setattr(idempotency, "_done", idempotency.TTLCache(maxsize=10, ttl=60))
+    return c
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_duplicados_concurrentes_esperan_a_la_primera(coll):
+    llamadas = []
+
+    async def crear():
+        llamadas.append(1)
+        await asyncio.sleep(0.05)
+        return {"_id": "p1"}
+
+    res = await asyncio.gather(*(idempotency.execute("k", "fp", crear) for _ in range(5)))
+    assert llamadas == [1]
+    assert [body for body, _ in res] == [{"_id": "p1"}] * 5
+    assert sorted(replayed for _, replayed in res) == [False, True, True, True, True]
+    assert coll.docs["k"]["status"] == idempotency.DONE
+
+    # otro worker (LRU vacío) repite desde Mongo sin ejecutar
+    idempotency._done.clear()
+    assert await idempotency.execute("k", "fp", crear) == ({"_id": "p1"}, True)
+    assert llamadas == [1]
+
+    with pytest.raises(HTTPException) as exc:
+        await idempotency.execute("k", "otro", crear)
+    assert exc.value.status_code == 422
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_fallo_libera_la_clave(coll):
+    async def falla():
+        await asyncio.sleep(0.01)
+        raise HTTPException(400, "Producto no disponible")
+
+    res = await asyncio.gather(
+        *(idempotency.execute("k", "fp", falla) for _ in range(2)), return_exceptions=True,
+    )
+    assert all(isinstance(r, HTTPException) and r.status_code == 400 for r in res)
+    assert "k" not in coll.docs and not idempotency._inflight
+
+    async def ok():
+        return {"_id": "p2"}
+
+    assert await idempotency.execute("k", "fp", ok) == ({"_id": "p2"}, False)
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_clave_pendiente_de_otro_worker(coll, monkeypatch):
+    monkeypatch.setattr(idempotency, "IDEMPOTENCY_WAIT", 0.2)
+    coll.docs["k"] = {"_id": "k", "status": idempotency.PENDING, "fingerprint": "fp"}
+
+    async def nunca():
+        raise AssertionError("no debe ejecutarse")
+
+    with pytest.raises(HTTPException) as exc:
+        await idempotency.execute("k", "fp", nunca)
+    assert exc.value.status_code == 409 and exc.value.headers["Retry-After"] == "1"
+
+    async def termina():
+        await asyncio.sleep(0.05)
+        coll.docs["k"].update(status=idempotency.DONE, body={"_id": "p3"})
+
+    res, _ = await asyncio.gather(idempotency.execute("k", "fp", nunca), termina())
+    assert res == ({"_id": "p3"}, True)
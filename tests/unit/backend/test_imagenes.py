@@ -0,0 +1,98 @@
+import base64
+
+import pytest
+from fastapi import HTTPException, status
+
+from app import migrate_images
+from app.images import blob_digest, check_image
+
+# GIF 1x1 transparente
+GIF = base64.b64decode("R0lGODlhAQABAIAAAAAAAP///yH5BAEAAAAALAAAAAABAAEAAAIBRAA7")
+
+
+@pytest.mark.unit
+def test_blob_digest_acepta_rutas_relativas_y_absolutas():
+    h = "a" * 64
+    assert blob_digest(f"/api/imagenes/{h}") == h
+    assert blob_digest(f"https://api.example.com/api/imagenes/{h}") == h
+    assert blob_digest("/img/croissant.jpg") is None
+    assert blob_digest(None) is None
+
+
+@pytest.mark.unit
+def test_solo_rasters_con_magic_bytes_coherentes():
+    assert check_image("image/gif", GIF) == "image/gif"
+    assert check_image("image/jpg", b"\xff\xd8\xff\xe0rest") == "image/jpeg"
+    with pytest.raises(ValueError):
+        check_image("image/svg+xml", b"<svg onload=alert(1)>")
+    with pytest.raises(ValueError):
+        check_image("image/png", b"<html><script>alert(1)</script>")  # tipo declarado falso
+
+
+@pytest.mark.functional
+@pytest.mark.asyncio
+async def test_avatar_se_guarda_en_almacen_y_se_sirve(client):
+    r = await client.post("/api/auth/login", json={"email": "demo@saborreal.com", "password": "demo123"})
+    headers = {"Authorization": f"Bearer {r.json()['access_token']}"}
+
+    data_url = "data:image/gif;base64," + base64.b64encode(GIF).decode()
+    r = await client.put("/api/auth/me", json={"avatarUrl": data_url}, headers=headers)
+    assert r.status_code == status.HTTP_200_OK, r.text
+    ref = r.json()["avatarUrl"]
+    assert ref.startswith("/api/imagenes/")
+
+    r = await client.get(ref)
+    assert r.status_code == status.HTTP_200_OK
+    assert r.content == GIF
+    assert r.headers["content-type"] == "image/gif"
+    assert "immutable" in r.headers["cache-control"]
+    assert r.headers["x-content-type-options"] == "nosniff"
+    assert r.headers["content-security-policy"] == "sandbox"
+
+    r = await client.get(ref, headers={"If-None-Match": r.headers["etag"]})
+    assert r.status_code == status.HTTP_304_NOT_MODIFIED
+
+
+@pytest.mark.functional
+@pytest.mark.asyncio
+async def test_avatar_svg_rechazado(client):
+    r = await client.post("/api/auth/login", json={"email": "demo@saborreal.com", "password": "demo123"})
+    headers = {"Authorization": f"Bearer {r.json()['access_token']}"}
+    svg = base64.b64encode(b"<svg xmlns='http://www.w3.org/2000/svg' onload='alert(1)'/>").decode()
+    r = await client.put("/api/auth/me", json={"avatarUrl": f"data:image/svg+xml;base64,{svg}"}, headers=headers)
+    assert r.status_code == status.HTTP_415_UNSUPPORTED_MEDIA_TYPE
+
+
+class _Coll:
+    """Colección mínima para la migración: find async + update_one/bulk_write."""
+
+    name = "pedidos"
+
+    def __init__(self, docs):
+        self.docs = docs
+        self.updated = []
+
+    async def find(self, *_):
+        for doc in self.docs:
+            yield doc
+
+    async def update_one(self, flt, update):
+        self.updated.append(flt["_id"])
+        return type("R", (), {"modified_count": 1})()
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_migracion_omite_documentos_con_imagen_invalida(monkeypatch):
+    async def externalize(value):
+        if value and "svg" in value:
+            raise HTTPException(status_code=415, detail="Imagen inválida")
+        return "/api/imagenes/x"
+
+    monkeypatch.setattr(migrate_images, "externalize_image", externalize)
+    coll = _Coll([
+        {"_id": 1, "items": [{"imagenUrl": "data:image/svg+xml;base64,AA=="}]},
+        {"_id": 2, "items": [{"imagenUrl": "data:image/gif;base64,AA=="}]},
+    ])
+    assert await migrate_images._migrate_order_items(coll) == (1, 1)
+    assert coll.updated == [2]
@@ -0,0 +1,113 @@
+import pytest
+from datetime import datetime
+
+from bson import ObjectId
+from pymongo.errors import OperationFailure
+
+from app import database as dbmod
+from app.pagination import encode_cursor, keyset_query, keyset_sort
+from app.pricing import products_query
+from app.routers.comentarios import _batch_pipeline
+from app.routers.orders import _OPEN_ORDERS_QUERY
+
+pytestmark = pytest.mark.functional
+
+_CURSOR = encode_cursor(datetime(2025, 1, 1), ObjectId())
+
+# (colección, filtro, sort) tal como los emiten los routers
+QUERY_SHAPES = [
+    ("productos", {"activo": True}, [("nombre", 1)]),
+    ("productos", {"categoria": "pan", "activo": True}, [("nombre", 1)]),
+    ("productos", {"categoria": "pan"}, [("nombre", 1)]),
+    ("productos", {}, [("nombre", 1)]),
+    ("clientes", {"email": "demo@saborreal.com"}, None),
+    ("comentarios", {"producto_id": str(ObjectId())}, [("creadoAt", -1), ("_id", -1)]),
+    ("pedidos", {"userId": ObjectId()}, [("createdAt", -1), ("_id", -1)]),
+    ("pedidos", {"usuario_id": str(ObjectId())}, [("creadoAt", -1)]),
+    ("pedidos", {"createdAt": {"$type": "date"}}, [("createdAt", -1), ("_id", -1)]),
+    ("pedidos", {"createdAt": {"$type": "date", "$gte": datetime(2025, 1, 1)}, "status": "PAID"},
+     [("createdAt", -1), ("_id", -1)]),
+    ("pedidos", {"code": "SR-20250101-000001", "userId": ObjectId()}, None),
+    # Páginas siguientes: keyset_query agrega el $or "después del cursor"
+    ("comentarios", keyset_query({"producto_id": str(ObjectId())}, "creadoAt", _CURSOR), keyset_sort("creadoAt")),
+    ("pedidos", keyset_query({"userId": ObjectId()}, "createdAt", _CURSOR), keyset_sort("createdAt")),
+    ("pedidos", keyset_query({"createdAt": {"$type": "date"}}, "createdAt", _CURSOR), keyset_sort("createdAt")),
+    ("pedidos", keyset_query({"createdAt": {"$type": "date"}, "status": "PAID"}, "createdAt", _CURSOR),
+     keyset_sort("createdAt")),
+    # Snapshot del tablero en vivo (status $in)
+    ("pedidos", _OPEN_ORDERS_QUERY, keyset_sort("createdAt")),
+    # pricing.fetch_products: _id $in (+ activo)
+    ("productos", products_query([str(ObjectId()), str(ObjectId())]), None),
+]
+
+# (colección, pipeline) de las agregaciones de los routers
+PIPELINE_SHAPES = [
+    ("comentarios", _batch_pipeline([str(ObjectId()), str(ObjectId())], 3)),
+]
+
+
+def _stages(plan: dict) -> list[str]:
+    out = [plan.get("stage")]
+    for key in ("inputStage", "queryPlan"):
+        if key in plan:
+            out += _stages(plan[key])
+    for child in plan.get("inputStages", []):
+        out += _stages(child)
+    return [s for s in out if s]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("coll, query, sort", QUERY_SHAPES)
+async def test_consultas_de_routers_usan_indice(client, coll, query, sort):
+    cursor = dbmod.db[coll].find(query)
+    if sort:
+        cursor = cursor.sort(sort)
+    plan = (await cursor.explain())["queryPlanner"]["winningPlan"]
+    stages = _stages(plan)
+    assert "IXSCAN" in stages, stages
+    assert "COLLSCAN" not in stages, stages
+    assert "SORT" not in stages, stages
+
+
+def _pipeline_plan(explain: dict) -> dict:
+    # Con todo el pipeline empujado a la consulta el plan va arriba; si no,
+    # en la etapa $cursor
+    if "queryPlanner" in explain:
+        return explain["queryPlanner"]["winningPlan"]
+    return explain["stages"][0]["$cursor"]["queryPlanner"]["winningPlan"]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("coll, pipeline", PIPELINE_SHAPES)
+async def test_agregaciones_de_routers_usan_indice(client, coll, pipeline):
+    explain = await dbmod.db.command(
+        {"explain": {"aggregate": coll, "pipeline": pipeline, "cursor": {}}, "verbosity": "queryPlanner"}
+    )
+    stages = _stages(_pipeline_plan(explain))
+    assert "IXSCAN" in stages, stages
+    assert "COLLSCAN" not in stages, stages
+    assert "SORT" not in stages, stages
+
+
+class _FailingColl:
+    """create_indexes que falla con los índices únicos (como con duplicados)."""
+
+    def __init__(self, created: list):
+        self.created = created
+
+    async def create_indexes(self, models):
+        if any(m.document.get("unique") for m in models):
+            raise OperationFailure("E11000 duplicate key", code=11000)
+        self.created += [m.document["name"] for m in models]
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_indice_unico_fallido_tumba_el_arranque():
+    from app.indexes import INDEXES, ensure_indexes
+
+    created: list = []
+    db = {name: _FailingColl(created) for name in INDEXES}
+    with pytest.raises(RuntimeError, match="pedidos.code_1"):
+        await ensure_indexes(db)
+    assert "createdAt_-1__id_-1" in created  # el resto sí se crea
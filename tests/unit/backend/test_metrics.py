@@ -0,0 +1,94 @@
+import pytest
+from fastapi import FastAPI, HTTPException
+from httpx import ASGITransport, AsyncClient
+
+from app import metrics
+
+
+def _app() -> FastAPI:
+    app = FastAPI()
+    app.add_middleware(metrics.MetricsMiddleware)
+
+    @app.get("/items/{item_id}")
+    async def item(item_id: str):
+        metrics.record_mongo_time(0.003)  # como lo haría el CommandListener
+        if item_id == "x":
+            raise HTTPException(404, "no")
+        return {"id": item_id}
+
+    return app
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_middleware_etiqueta_por_plantilla_de_ruta():
+    async with AsyncClient(transport=ASGITransport(app=_app()), base_url="http://test") as ac:
+        for path in ("/items/1", "/items/2", "/items/x", "/nada"):
+            await ac.get(path)
+
+    labels = ("GET", "/items/{item_id}")
+    assert metrics.REQUEST_SECONDS._series[labels][-1] > 0
+    assert metrics.RESPONSES._values[("GET", "/items/{item_id}", 200)] >= 2
+    assert metrics.RESPONSES._values[("GET", "/items/{item_id}", 404)] >= 1
+    assert metrics.RESPONSES._values[("GET", metrics.UNMATCHED_ROUTE, 404)] >= 1
+    assert metrics.IN_FLIGHT._values[()] == 0
+
+    text = metrics.render()
+    assert 'http_request_duration_seconds_bucket{method="GET",route="/items/{item_id}",le="+Inf"}' in text
+    assert 'http_request_mongo_seconds_count{method="GET",route="/items/{item_id}"}' in text
+    assert "/items/1" not in text
+
+
+@pytest.mark.unit
+def test_histograma_acumula_buckets():
+    h = metrics.Histogram("h", "test", ("a",), buckets=(0.1, 1.0))
+    for v in (0.05, 0.1, 0.5, 3.0):
+        h.observe(v, ("x",))
+    lines = list(h.samples())
+    assert lines[:3] == ['h_bucket{a="x",le="0.1"} 2', 'h_bucket{a="x",le="1.0"} 3', 'h_bucket{a="x",le="+Inf"} 4']
+    assert lines[-1] == 'h_count{a="x"} 4'
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_endpoints_de_metricas_apagados_sin_token(monkeypatch):
+    from app.main import app
+    from app.routers import internal
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        monkeypatch.setattr(internal, "METRICS_TOKEN", "")
+        assert (await ac.get("/metrics")).status_code == 404
+        assert (await ac.get("/internal/metrics")).status_code == 404
+
+        monkeypatch.setattr(internal, "METRICS_TOKEN", "s3cret")
+        assert (await ac.get("/metrics")).status_code == 403
+        r = await ac.get("/metrics", headers={"X-Metrics-Token": "s3cret"})
+        assert r.status_code == 200 and "http_requests_in_flight" in r.text
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_sse_fuera_de_la_latencia_y_del_gauge():
+    from fastapi.responses import StreamingResponse
+
+    app = FastAPI()
+    app.add_middleware(metrics.MetricsMiddleware)
+    abiertos = []
+
+    @app.get("/eventos")
+    async def eventos():
+        async def gen():
+            abiertos.append(metrics.SSE_OPEN._values[("/eventos",)])
+            abiertos.append(metrics.IN_FLIGHT._values[()])
+            yield "data: 1\n\n"
+        return StreamingResponse(gen(), media_type="text/event-stream")
+
+    antes = metrics.IN_FLIGHT._values.get((), 0)
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        r = await ac.get("/eventos")
+    assert r.status_code == 200
+    assert abiertos == [1, antes]  # mientras dura cuenta como SSE, no como request en curso
+    assert ("GET", "/eventos") not in metrics.REQUEST_SECONDS._series
+    assert metrics.SSE_SECONDS._series[("/eventos",)][-1] > 0
+    assert metrics.SSE_OPEN._values[("/eventos",)] == 0
+    assert metrics.IN_FLIGHT._values[()] == antes
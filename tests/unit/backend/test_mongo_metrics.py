@@ -0,0 +1,54 @@
+import pytest
+from pymongo import monitoring
+
+from app import database
+from app.mongo_metrics import MongoMetrics, PoolMetrics
+from app import mongo_metrics
+
+ADDR = ("db", 27017)
+
+
+@pytest.mark.unit
+def test_pool_en_uso_y_espera(monkeypatch):
+    m = MongoMetrics()
+    monkeypatch.setattr(mongo_metrics, "metrics", m)
+    pool = PoolMetrics()
+
+    pool.pool_created(monitoring.PoolCreatedEvent(ADDR, {"maxPoolSize": 5}))
+    pool.connection_created(monitoring.ConnectionCreatedEvent(ADDR, 1))
+    pool.connection_check_out_started(monitoring.ConnectionCheckOutStartedEvent(ADDR))
+    snap = m.snapshot()["pool"]["servers"]["db:27017"]
+    assert snap["waiting"] == 1 and snap["in_use"] == 0
+
+    pool.connection_checked_out(monitoring.ConnectionCheckedOutEvent(ADDR, 1, 0.25))
+    pool.connection_check_out_started(monitoring.ConnectionCheckOutStartedEvent(ADDR))
+    pool.connection_check_out_failed(monitoring.ConnectionCheckOutFailedEvent(ADDR, "timeout", 1.0))
+    pool.connection_checked_in(monitoring.ConnectionCheckedInEvent(ADDR, 1))
+
+    snap = m.snapshot()["pool"]
+    server = snap["servers"]["db:27017"]
+    assert server == {"open": 1, "in_use": 0, "max_in_use": 1, "waiting": 0, "max_pool_size": 5}
+    assert snap["checkout_wait"]["count"] == 2 and snap["checkout_wait"]["max_ms"] == 1000.0
+    assert snap["checkout_failures"] == {"timeout": 1}
+
+
+@pytest.mark.unit
+def test_latencia_por_comando():
+    m = MongoMetrics()
+    m.record_command("find", 0.002)
+    m.record_command("find", 0.004, ok=False)
+    find = m.snapshot()["commands"]["find"]
+    assert find["count"] == 2 and find["failures"] == 1
+    assert find["avg_ms"] == 3.0 and find["max_ms"] == 4.0
+
+
+@pytest.mark.unit
+def test_client_options_desde_entorno(monkeypatch):
+    monkeypatch.setenv("MONGO_MAX_POOL", "20")
+    monkeypatch.setenv("MONGO_COMPRESSORS", "zstd,zlib")
+    monkeypatch.setenv("MONGO_W", "majority")
+    monkeypatch.delenv("MONGO_MIN_POOL", raising=False)
+    opts = database.client_options()
+    assert opts["maxPoolSize"] == 20 and opts["w"] == "majority"
+    assert opts["compressors"] == "zstd,zlib"
+    assert "minPoolSize" not in opts
@@ -34,3 +34,156 @@ async def test_create_order_and_list(client):
     assert r.status_code == 200
     arr = r.json()
     assert any(o["code"] == created["code"] for o in arr)
+
+
+@pytest.mark.anyio
+async def test_create_order_fusiona_lineas_repetidas(client):
+    r = await client.post("/api/auth/login", json={"email": "demo@saborreal.com", "password": "demo123"})
+    token = r.json()["access_token"]
+    prod = (await client.get("/api/productos")).json()[0]
+
+    payload = {
+        "items": [
+            {"producto_id": prod["_id"], "qty": 1},
+            {"producto_id": prod["_id"], "qty": 2},
+        ],
+        "delivery_nombre": "Cliente Demo",
+        "delivery_telefono": "999999999",
+        "delivery_direccion": "Calle de prueba 123",
+    }
+    r = await client.post("/api/orders", json=payload, headers={"Authorization": f"Bearer {token}"})
+    assert r.status_code == status.HTTP_201_CREATED, r.text
+    assert r.json()["total"] == round(prod["precio"] * 3, 2)
+
+    r = await client.get(f"/api/orders/{r.json()['_id']}", headers={"Authorization": f"Bearer {token}"})
+    items = r.json()["items"]
+    assert len(items) == 1 and items[0]["qty"] == 3
+
+
+@pytest.mark.anyio
+async def test_codigos_unicos_en_concurrencia_y_busqueda_por_code(client):
+    import asyncio
+
+    r = await client.post("/api/auth/login", json={"email": "demo@saborreal.com", "password": "demo123"})
+    headers = {"Authorization": f"Bearer {r.json()['access_token']}"}
+    prod = (await client.get("/api/productos")).json()[0]
+    payload = {
+        "items": [{"producto_id": prod["_id"], "qty": 1}],
+        "delivery_nombre": "Cliente Demo",
+        "delivery_telefono": "999999999",
+        "delivery_direccion": "Calle de prueba 123",
+    }
+
+    res = await asyncio.gather(*[client.post("/api/orders", json=payload, headers=headers) for _ in range(10)])
+    codes = [x.json()["code"] for x in res]
+    assert len(set(codes)) == 10
+    assert all(c.startswith("SR-") and len(c.rsplit("-", 1)[1]) >= 6 for c in codes)
+
+    r = await client.get(f"/api/orders/by-code/{codes[0]}", headers=headers)
+    assert r.status_code == 200 and r.json()["code"] == codes[0]
+    r = await client.get("/api/orders/by-code/SR-19990101-000001", headers=headers)
+    assert r.status_code == 404
+
+
+@pytest.mark.anyio
+async def test_idempotency_key_repite_la_respuesta(client):
+    import asyncio
+    import uuid
+
+    from app import database
+
+    r = await client.post("/api/auth/login", json={"email": "demo@saborreal.com", "password": "demo123"})
+    headers = {"Authorization": f"Bearer {r.json()['access_token']}", "Idempotency-Key": str(uuid.uuid4())}
+    prod = (await client.get("/api/productos")).json()[0]
+    payload = {
+        "items": [{"producto_id": prod["_id"], "qty": 1}],
+        "delivery_nombre": "Cliente Demo",
+        "delivery_telefono": "999999999",
+        "delivery_direccion": "Calle de prueba 123",
+    }
+
+    res = await asyncio.gather(*[client.post("/api/orders", json=payload, headers=headers) for _ in range(3)])
+    assert [x.status_code for x in res] == [201, 201, 201]
+    assert len({x.json()["_id"] for x in res}) == 1
+    assert sum(x.headers.get("Idempotent-Replayed") == "true" for x in res) == 2
+    assert await database.db.pedidos.count_documents({"code": res[0].json()["code"]}) == 1
+
+    r = await client.post("/api/orders", json=payload, headers=headers)
+    assert r.json() == res[0].json() and r.headers["Idempotent-Replayed"] == "true"
+
+    # misma clave, otro carrito
+    r = await client.post("/api/orders", json={**payload, "notas": "otra"}, headers=headers)
+    assert r.status_code == 422
+
+
+@pytest.mark.anyio
+async def test_pedido_legacy_migrado_entra_en_listado_admin(client):
+    from datetime import datetime, timezone
+
+    from app import database
+    from app.migrate_orders import backfill_legacy_orders
+    from app.pagination import keyset_query
+    from app.routers.orders import _LIST_PROJECTION, _order_shape, _orders_adapter
+
+    # Forma de un documento creado por /api/pedidos antes de la migración
+    creado = datetime(2002, 3, 4, 15, 0, tzinfo=timezone.utc)
+    oid = (await database.db.pedidos.insert_one({
+        "usuario_id": "legacy-user", "items": [], "total": 3.0,
+        "estado": "pagado", "creadoAt": creado,
+    })).inserted_id
+    try:
+        assert await backfill_legacy_orders(database.db) >= 1
+        assert await backfill_legacy_orders(database.db) == 0  # idempotente
+
+        query = keyset_query({"createdAt": {"$type": "date"}, "status": "PAID"}, "createdAt", None)
+        docs = await database.list_collection("pedidos").find(
+            {**query, "_id": oid}, _LIST_PROJECTION,
+        ).to_list(length=None)
+        assert len(docs) == 1
+        out = _orders_adapter.validate_python([_order_shape(docs[0])])[0]
+        assert out.status == "PAID" and out.code.startswith("SR-20020304-")
+    finally:
+        await database.db.pedidos.delete_one({"_id": oid})
+
+
+@pytest.mark.unit
+def test_estado_legacy_a_status():
+    from app.migrate_orders import legacy_status
+
+    assert legacy_status("creado") == "CREATED"
+    assert legacy_status("Entregado") == "DELIVERED"
+    assert legacy_status("PAID") == "PAID"
+    assert legacy_status(None) == "CREATED"
+
+
+@pytest.mark.anyio
+async def test_codes_viejos_no_chocan_y_duplicados_se_renumeran(client):
+    from datetime import datetime, timezone
+
+    from app import database
+    from app.counters import next_order_code
+    from app.migrate_orders import bump_code_counters, dedupe_order_codes
+
+    class _DB:  # colección aparte: en pedidos el índice único ya impide duplicados
+        pedidos = database.db.pedidos_migracion_test
+        counters = database.db.counters
+
+    dia = datetime(2003, 4, 5, 10, 11, 12, tzinfo=timezone.utc)
+    viejo = "SR-20030405-101112"  # formato HHMMSS anterior al contador
+    await _DB.pedidos.drop()
+    await database.db.counters.delete_one({"_id": "pedidos:20030405"})
+    await _DB.pedidos.insert_many([
+        {"code": viejo, "createdAt": dia},
+        {"code": viejo, "createdAt": dia.replace(second=13)},
+    ])
+    try:
+        assert await bump_code_counters(_DB) == 1
+        assert await next_order_code(dia) == "SR-20030405-101113"
+
+        assert await dedupe_order_codes(_DB) == 1
+        docs = await _DB.pedidos.find().sort("createdAt", 1).to_list(length=None)
+        assert docs[0]["code"] == viejo  # el más antiguo lo conserva
+        assert docs[1]["code"] == "SR-20030405-101114" and docs[1]["codeAnterior"] == viejo
+    finally:
+        await _DB.pedidos.drop()
+        await database.db.counters.delete_one({"_id": "pedidos:20030405"})
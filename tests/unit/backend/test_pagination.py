@@ -0,0 +1,59 @@
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+from fastapi import HTTPException, status
+
+from app import pagination
+
+
+@pytest.mark.unit
+def test_cursor_roundtrip_y_filtro():
+    ts, oid = datetime(2025, 3, 1, 10, 30, 0, 123000), ObjectId()
+    cur = pagination.encode_cursor(ts, oid)
+    assert "=" not in cur
+    assert pagination.decode_cursor(cur) == (ts, oid)
+
+    q = pagination.keyset_query({"userId": 1}, "createdAt", cur)
+    assert q["userId"] == 1
+    assert q["$or"] == [{"createdAt": {"$lt": ts}}, {"createdAt": ts, "_id": {"$lt": oid}}]
+    assert pagination.keyset_query({"a": 1}, "createdAt", None) == {"a": 1}
+
+
+@pytest.mark.unit
+def test_cursor_invalido_es_400():
+    with pytest.raises(HTTPException) as exc:
+        pagination.decode_cursor("no-es-un-cursor")
+    assert exc.value.status_code == 400
+
+
+@pytest.mark.unit
+def test_page_size_acotado():
+    assert pagination.page_size(None) == pagination.DEFAULT_PAGE_SIZE
+    assert pagination.page_size(10_000) == pagination.MAX_PAGE_SIZE
+
+
+@pytest.mark.functional
+@pytest.mark.asyncio
+async def test_my_orders_pagina_con_cursor(client):
+    r = await client.post("/api/auth/login", json={"email": "demo@saborreal.com", "password": "demo123"})
+    headers = {"Authorization": f"Bearer {r.json()['access_token']}"}
+    prod = (await client.get("/api/productos")).json()[0]
+    payload = {
+        "items": [{"producto_id": prod["_id"], "qty": 1}],
+        "delivery_nombre": "Cliente Demo",
+        "delivery_telefono": "999999999",
+        "delivery_direccion": "Calle de prueba 123",
+    }
+    for _ in range(3):
+        r = await client.post("/api/orders", json=payload, headers=headers)
+        assert r.status_code == status.HTTP_201_CREATED
+
+    r = await client.get("/api/orders", params={"limit": 2}, headers=headers)
+    first = r.json()
+    assert len(first) == 2
+    nxt = r.headers["x-next-cursor"]
+
+    r = await client.get("/api/orders", params={"limit": 2, "cursor": nxt}, headers=headers)
+    second = r.json()
+    assert second and not {o["_id"] for o in first} & {o["_id"] for o in second}
@@ -0,0 +1,192 @@
+import pytest
+from fastapi import status
+
+pytestmark = pytest.mark.functional
+
+
+async def _login(client):
+    r = await client.post("/api/auth/login", json={"email": "demo@saborreal.com", "password": "demo123"})
+    assert r.status_code == status.HTTP_200_OK
+    return {"Authorization": f"Bearer {r.json()['access_token']}"}
+
+
+@pytest.mark.asyncio
+async def test_pedido_sin_stock_no_descuenta_nada(client):
+    headers = await _login(client)
+    prods = (await client.get("/api/productos")).json()
+    assert len(prods) >= 2, "se necesitan al menos dos productos del seed"
+    ok, escaso = prods[0], prods[1]
+
+    payload = {
+        "items": [
+            {"producto_id": ok["_id"], "qty": 1},
+            {"producto_id": escaso["_id"], "qty": escaso["stock"] + 1},
+        ],
+        "delivery_nombre": "Cliente Demo",
+    }
+    r = await client.post("/api/pedidos", json=payload, headers=headers)
+    assert r.status_code == status.HTTP_409_CONFLICT, r.text
+    conflictos = r.json()["detail"]["conflictos"]
+    assert [c["producto_id"] for c in conflictos] == [escaso["_id"]]
+
+    after = {p["_id"]: p["stock"] for p in (await client.get("/api/productos")).json()}
+    assert after[ok["_id"]] == ok["stock"]
+    assert after[escaso["_id"]] == escaso["stock"]
+
+
+@pytest.mark.asyncio
+async def test_pedido_reserva_stock(client):
+    headers = await _login(client)
+    prod = (await client.get("/api/productos")).json()[0]
+
+    payload = {"items": [{"producto_id": prod["_id"], "qty": 1}], "delivery_nombre": "Cliente Demo"}
+    r = await client.post("/api/pedidos", json=payload, headers=headers)
+    assert r.status_code == status.HTTP_201_CREATED, r.text
+
+    after = {p["_id"]: p["stock"] for p in (await client.get("/api/productos")).json()}
+    assert after[prod["_id"]] == prod["stock"] - 1
+
+
+async def _productos_de_prueba(db, *stocks):
+    res = await db.productos.insert_many([
+        {"nombre": f"Reserva test {i}", "precio": 1.0, "stock": s, "activo": False}
+        for i, s in enumerate(stocks)
+    ])
+    return res.inserted_ids
+
+
+async def _stock_y_tokens(db, ids):
+    docs = {d["_id"]: d async for d in db.productos.find({"_id": {"$in": ids}})}
+    return [(docs[i]["stock"], docs[i].get("_reservas", [])) for i in ids]
+
+
+async def _falla_la_ultima_linea(db):
+    from app import inventory
+
+    # Las dos primeras líneas se descuentan; la última no (stock 1 < 3)
+    ids = await _productos_de_prueba(db, 5, 4, 1)
+    try:
+        conflictos = await inventory.reserve({ids[0]: 2, ids[1]: 4, ids[2]: 3})
+        assert [c["producto_id"] for c in conflictos] == [str(ids[2])]
+        assert conflictos[0]["disponible"] == 1
+        stock = [s for s, _ in await _stock_y_tokens(db, ids)]
+        assert stock == [5, 4, 1]  # las líneas anteriores quedaron restauradas
+    finally:
+        await db.productos.delete_many({"_id": {"$in": ids}})
+
+
+@pytest.mark.asyncio
+async def test_reserva_parcial_se_compensa_sin_transacciones(client, monkeypatch):
+    from app import database, inventory
+
+    monkeypatch.setattr(inventory, "_supports_txn", False)
+    await _falla_la_ultima_linea(database.db)
+
+
+@pytest.mark.asyncio
+async def test_reserva_parcial_aborta_la_transaccion(client, monkeypatch):
+    from app import database, inventory
+
+    monkeypatch.setattr(inventory, "_supports_txn", None)
+    if not await inventory._transactions_available():
+        pytest.skip("Mongo sin replica set: no hay transacciones")
+    await _falla_la_ultima_linea(database.db)
+
+
+class _Admin:
+    def __init__(self, *replies):
+        self.replies = list(replies)
+
+    async def command(self, name):
+        reply = self.replies.pop(0)
+        if isinstance(reply, Exception):
+            raise reply
+        return reply
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_error_transitorio_no_desactiva_transacciones(monkeypatch):
+    from pymongo.errors import AutoReconnect
+
+    from app import database, inventory
+
+    admin = _Admin(AutoReconnect("red"), {"setName": "rs0"})
+    monkeypatch.setattr(database, "client", type("C", (), {"admin": admin})())
+    monkeypatch.setattr(inventory, "_supports_txn", None)
+    assert await inventory._transactions_available() is False  # esta vez, sin transacción
+    assert inventory._supports_txn is None                    # ...pero no se cachea
+    assert await inventory._transactions_available() is True
+
+
+@pytest.mark.asyncio
+async def test_reserva_ok_es_un_solo_update(client):
+    from app import database, inventory
+
+    db = database.db
+    ids = await _productos_de_prueba(db, 500)
+    try:
+        for _ in range(inventory.RESERVATION_WINDOW + 5):
+            assert await inventory.reserve({ids[0]: 1}) == []
+        [(stock, tokens)] = await _stock_y_tokens(db, ids)
+        assert stock == 500 - inventory.RESERVATION_WINDOW - 5
+        assert len(tokens) == inventory.RESERVATION_WINDOW  # acotado por $slice
+    finally:
+        await db.productos.delete_many({"_id": {"$in": ids}})
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_transaccion_no_soportada_cae_a_compensacion(monkeypatch):
+    from pymongo.errors import OperationFailure
+
+    from app import database, inventory
+
+    class _Session:
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, *exc):
+            return False
+
+        async def with_transaction(self, fn):
+            raise OperationFailure("Transaction numbers are only allowed on a replica set member", code=20)
+
+    class _Client:
+        async def start_session(self):
+            return _Session()
+
+    llamadas = []
+
+    async def _reserve(lines, session=None, compensate=False):
+        llamadas.append(compensate)
+        return []
+
+    monkeypatch.setattr(database, "client", _Client())
+    monkeypatch.setattr(inventory, "_supports_txn", True)
+    monkeypatch.setattr(inventory, "_reserve", _reserve)
+    assert await inventory.reserve({"p": 1}) == []
+    assert llamadas == [True] and inventory._supports_txn is False
+
+
+@pytest.mark.asyncio
+async def test_fallo_del_contador_devuelve_el_stock(client, monkeypatch):
+    from bson import ObjectId
+
+    from app import database
+    from app.routers import pedidos
+
+    async def contador_caido(now=None):
+        raise RuntimeError("counters no disponible")
+
+    headers = await _login(client)
+    prod = (await client.get("/api/productos")).json()[0]
+    antes = (await database.db.productos.find_one({"_id": ObjectId(prod["_id"])}))["stock"]
+
+    monkeypatch.setattr(pedidos, "next_order_code", contador_caido)
+    payload = {"items": [{"producto_id": prod["_id"], "qty": 1}], "delivery_nombre": "Cliente Demo"}
+    with pytest.raises(RuntimeError):
+        await client.post("/api/pedidos", json=payload, headers=headers)
+
+    despues = (await database.db.productos.find_one({"_id": ObjectId(prod["_id"])}))["stock"]
+    assert despues == antes
@@ -0,0 +1,30 @@
+import pytest
+from bson import ObjectId
+from fastapi import HTTPException
+
+from app import pricing
+from app.schemas import CartItem
+
+
+@pytest.mark.unit
+def test_merge_lines_fusiona_repetidos_en_orden():
+    a, b = str(ObjectId()), str(ObjectId())
+    items = [CartItem(producto_id=a, qty=1), CartItem(producto_id=b, qty=2), CartItem(producto_id=a, qty=3)]
+    assert list(pricing.merge_lines(items).items()) == [(a, 4), (b, 2)]
+
+
+@pytest.mark.unit
+def test_snapshot_line_redondea_subtotal():
+    prod = {"_id": ObjectId(), "nombre": "Croissant", "precio": 2.2, "imagenUrl": "/img/croissant.jpg"}
+    line = pricing.snapshot_line(prod, 3)
+    assert line["producto_id"] == str(prod["_id"])
+    assert line["precio"] == 2.2 and line["qty"] == 3
+    assert line["subtotal"] == 6.6
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_fetch_products_rechaza_ids_invalidos():
+    with pytest.raises(HTTPException) as exc:
+        await pricing.fetch_products(["no-es-un-id"])
+    assert exc.value.status_code == 400
@@ -16,3 +16,61 @@ async def test_listar_productos_filtrado_pan(client):
     assert res.status_code == status.HTTP_200_OK
     data = res.json()
     assert all((p.get("categoria") or "").lower() == "pan" for p in data)
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_listar_productos_etag_304(client):
+    res = await client.get("/api/productos")
+    assert res.status_code == status.HTTP_200_OK
+    etag = res.headers.get("etag")
+    assert etag and res.headers.get("last-modified")
+
+    res = await client.get("/api/productos", headers={"If-None-Match": etag})
+    assert res.status_code == status.HTTP_304_NOT_MODIFIED
+    assert res.content == b""
+
+@pytest.mark.unit
+def test_imagen_ref_y_data_url():
+    from app.images import parse_data_url, product_image_ref, is_product_image_ref
+
+    pid = "0123456789abcdef01234567"
+    assert product_image_ref(pid, "data:image/png;base64,iVBORw0K") == f"/api/productos/{pid}/imagen"
+    assert product_image_ref(pid, "/img/croissant.jpg") == "/img/croissant.jpg"
+    assert is_product_image_ref(f"http://127.0.0.1:8000/api/productos/{pid}/imagen")
+    assert not is_product_image_ref("/img/croissant.jpg")
+
+    mime, data = parse_data_url("data:image/gif;base64,R0lGODlh")
+    assert mime == "image/gif" and data.startswith(b"GIF89a")
+    with pytest.raises(ValueError):
+        parse_data_url("data:text/plain,hola")
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_listar_productos_sin_data_urls(client):
+    res = await client.get("/api/productos")
+    assert res.status_code == status.HTTP_200_OK
+    assert not any((p.get("imagenUrl") or "").startswith("data:") for p in res.json())
+
+@pytest.mark.functional
+@pytest.mark.asyncio
+async def test_imagen_producto_solo_rasters(client):
+    from app import database
+
+    gif = "data:image/gif;base64,R0lGODlhAQABAIAAAAAAAP///yH5BAEAAAAALAAAAAABAAEAAAIBRAA7"
+    svg = "data:image/svg+xml;base64,PHN2ZyBvbmxvYWQ9YWxlcnQoMSk+"
+    res = await database.db.productos.insert_many([
+        {"nombre": "Imagen gif", "activo": False, "imagenUrl": gif},
+        {"nombre": "Imagen svg", "activo": False, "imagenUrl": svg},
+    ])
+    ok_id, svg_id = res.inserted_ids
+    try:
+        r = await client.get(f"/api/productos/{ok_id}/imagen")
+        assert r.status_code == status.HTTP_200_OK
+        assert r.headers["content-type"] == "image/gif"
+        assert r.headers["x-content-type-options"] == "nosniff"
+        assert r.headers["content-security-policy"] == "sandbox"
+
+        r = await client.get(f"/api/productos/{svg_id}/imagen")
+        assert r.status_code == status.HTTP_415_UNSUPPORTED_MEDIA_TYPE
+    finally:
+        await database.db.productos.delete_many({"_id": {"$in": res.inserted_ids}})
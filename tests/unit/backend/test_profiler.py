@@ -0,0 +1,75 @@
+import asyncio
+
+import pytest
+from fastapi import FastAPI
+from httpx import ASGITransport, AsyncClient
+
+from app import profiler, security
+
+
+def _app() -> FastAPI:
+    app = FastAPI()
+    app.add_middleware(profiler.ProfilerMiddleware)
+
+    @profiler.profiled("calcular")
+    async def calcular():
+        profiler.record_span("mongo.find", 0.002)  # como lo haría el CommandListener
+
+    @app.post("/orders/{oid}")
+    @profiler.profiled("handler")
+    async def crear(oid: str, espera: float = 0.0):
+        await calcular()
+        await security.hash_password_async("demo123")
+        await asyncio.sleep(espera)
+        return {"oid": oid}
+
+    return app
+
+
+@pytest.fixture
+def perfilando(monkeypatch):
+    monkeypatch.setitem(profiler.config, "enabled", True)
+    monkeypatch.setitem(profiler.config, "sample_rate", 1.0)
+    monkeypatch.setitem(profiler.config, "keep", 2)
+    monkeypatch.setattr(profiler, "store", profiler.TraceStore())
+    return profiler.store
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_arbol_de_spans_y_collapsed(perfilando):
+    async with AsyncClient(transport=ASGITransport(app=_app()), base_url="http://test") as ac:
+        r = await ac.post("/orders/abc")
+    assert r.json() == {"oid": "abc"}  # el decorador conserva la firma del endpoint
+
+    (trace,) = perfilando.traces("/orders/{oid}")
+    d = trace.to_dict()
+    assert d["method"] == "POST" and d["status"] == 200
+    (handler,) = d["spans"]["children"]
+    assert handler["name"] == "handler"
+    names = [c["name"] for c in handler["children"]]
+    assert names == ["calcular", "hash_password.wait", "hash_password.run"]
+    assert handler["children"][0]["children"][0]["name"] == "mongo.find"
+
+    lines = trace.collapsed()
+    assert any(l.startswith("POST /orders/{oid};request;handler;calcular;mongo.find ") for l in lines)
+    assert all(int(l.rsplit(" ", 1)[1]) > 0 for l in lines)
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_guarda_solo_las_mas_lentas(perfilando):
+    async with AsyncClient(transport=ASGITransport(app=_app()), base_url="http://test") as ac:
+        for espera in (0.0, 0.03, 0.0, 0.02, 0.0):
+            await ac.post("/orders/x", params={"espera": espera})
+    traces = perfilando.traces("POST /orders/{oid}")
+    assert len(traces) == 2
+    assert traces[0].root.duration >= 0.03
+    assert traces[1].root.duration >= 0.02
+
+
+@pytest.mark.unit
+def test_span_sin_request_muestreada_no_hace_nada():
+    with profiler.span("x") as s:
+        assert s is None
+    profiler.record_span("mongo.find", 0.1)  # no explota fuera de una traza
@@ -0,0 +1,38 @@
+import pytest
+from fastapi import status
+
+from app.ratings import rating_inc
+from app.schemas import RatingStats
+
+
+@pytest.mark.unit
+def test_rating_inc_y_promedio():
+    assert rating_inc(4) == {"$inc": {
+        "rating_stats.count": 1, "rating_stats.sum": 4, "rating_stats.hist.4": 1,
+    }}
+    assert RatingStats(count=4, sum=17, hist={"4": 3, "5": 1}).avg == 4.25
+    assert RatingStats().avg is None
+
+
+@pytest.mark.functional
+@pytest.mark.asyncio
+async def test_comentario_actualiza_rating_stats(client):
+    r = await client.post("/api/auth/login", json={"email": "demo@saborreal.com", "password": "demo123"})
+    headers = {"Authorization": f"Bearer {r.json()['access_token']}"}
+    prod = (await client.get("/api/productos")).json()[0]
+    antes = (prod.get("rating_stats") or {}).get("count", 0)
+
+    r = await client.post(
+        "/api/comentarios",
+        headers=headers,
+        json={"producto_id": prod["_id"], "texto": "Excelente", "rating": 4},
+    )
+    assert r.status_code == status.HTTP_201_CREATED, r.text
+
+    r = await client.get("/api/comentarios/ratings", params={"producto_id": prod["_id"]})
+    stats = r.json()[prod["_id"]]
+    assert stats["count"] == antes + 1
+    assert stats["hist"]["4"] >= 1
+
+    prod = next(p for p in (await client.get("/api/productos")).json() if p["_id"] == prod["_id"])
+    assert prod["rating_stats"]["count"] == antes + 1
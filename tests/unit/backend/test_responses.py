@@ -0,0 +1,69 @@
+import json
+from datetime import datetime, timezone
+
+import pytest
+from bson import ObjectId
+
+from app import responses
+from app.routers.comentarios import _comentario_shape, _comentarios_adapter
+from app.routers.orders import _order_shape, _orders_adapter
+from app.routers.productos import _producto_shape, _productos_adapter
+
+PRODUCTOS = [
+    {"_id": str(ObjectId()), "nombre": "Croissant", "precio": 3, "stock": 5, "activo": True,
+     "imagenUrl": "/img/croissant.jpg", "categoria": "pan",
+     "rating_stats": {"count": 3, "sum": 13, "hist": {"4": 2, "5": 1}}},
+    {"_id": str(ObjectId()), "nombre": "Alfajor", "precio": 1.5, "activo": False},
+]
+PEDIDOS = [
+    {"_id": ObjectId(), "code": "SR-1", "total": 12, "status": "PAID",
+     "createdAt": datetime(2025, 1, 2, 3, 4, 5, 678000)},
+    {"_id": ObjectId(), "code": "SR-2", "total": 7.5, "status": "CREATED",
+     "createdAt": datetime(2025, 1, 2, 3, 4, 5, tzinfo=timezone.utc)},
+]
+COMENTARIOS = [
+    {"_id": str(ObjectId()), "producto_id": str(ObjectId()), "usuario_id": str(ObjectId()),
+     "texto": "Muy rico", "rating": 5, "creadoAt": datetime(2025, 3, 1, 12, 0, 0, 123000), "extra": 1},
+]
+
+CASOS = [
+    (_productos_adapter, _producto_shape, PRODUCTOS),
+    (_orders_adapter, _order_shape, PEDIDOS),
+    (_comentarios_adapter, _comentario_shape, COMENTARIOS),
+]
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("adapter,shape,docs", CASOS)
+def test_salida_de_confianza_igual_a_la_validada(monkeypatch, adapter, shape, docs):
+    monkeypatch.setattr(responses, "TRUST_MONGO_OUTPUT", False)
+    validado = responses.encode_list(adapter, docs, shape)
+
+    monkeypatch.setattr(responses, "TRUST_MONGO_OUTPUT", True)
+    monkeypatch.setattr(responses, "FAST_JSON", False)
+    assert responses.encode_list(adapter, docs, shape) == validado
+
+    if responses.orjson is not None:
+        monkeypatch.setattr(responses, "FAST_JSON", True)
+        assert json.loads(responses.encode_list(adapter, docs, shape)) == json.loads(validado)
+
+
+@pytest.mark.unit
+def test_dumps_serializa_objectid_y_fechas(monkeypatch):
+    oid = ObjectId()
+    obj = {"_id": oid, "t": datetime(2025, 1, 1, tzinfo=timezone.utc)}
+    for fast in (False, responses.orjson is not None):
+        monkeypatch.setattr(responses, "FAST_JSON", fast)
+        assert json.loads(responses.dumps(obj)) == {"_id": str(oid), "t": "2025-01-01T00:00:00Z"}
+
+
+@pytest.mark.unit
+def test_modo_listado_decodifica_objectid_como_str():
+    import bson
+    from app.database import LIST_CODEC_OPTIONS
+
+    raw = b"".join(bson.encode(d) for d in PEDIDOS)
+    docs = bson.decode_all(raw, LIST_CODEC_OPTIONS)
+    assert all(isinstance(d["_id"], str) for d in docs)
+    assert responses.encode_list(_orders_adapter, docs, _order_shape) == \
+        responses.encode_list(_orders_adapter, bson.decode_all(raw), _order_shape)
@@ -0,0 +1,46 @@
+import pytest
+
+from app import database as dbmod
+from app import seed as seedmod
+
+
+@pytest.mark.unit
+def test_operaciones_de_productos_sin_conflicto():
+    ops = seedmod.product_ops()
+    assert len(ops) == len(seedmod.PRODUCTOS)
+    for op in ops:
+        update = op._doc
+        # Mongo rechaza el mismo campo en $set y $setOnInsert
+        assert not set(update["$set"]) & set(update["$setOnInsert"])
+        assert op._upsert
+
+
+@pytest.mark.functional
+@pytest.mark.asyncio
+async def test_seed_se_salta_si_la_version_es_la_actual(client):
+    db = dbmod.db
+    # el lifespan del fixture ya sembró
+    marker = await db.meta.find_one({"_id": seedmod.SEED_MARKER})
+    assert marker["version"] == seedmod.SEED_VERSION
+    assert await seedmod.seed(db) is False
+
+    await db.meta.update_one({"_id": seedmod.SEED_MARKER}, {"$set": {"version": 0}})
+    assert await seedmod.seed(db) is True
+    assert await db.productos.count_documents({"nombre": {"$in": list(seedmod.IMAGES)}}) == len(seedmod.PRODUCTOS)
+    assert await db.clientes.count_documents({"email": seedmod.DEMO_EMAIL}) == 1
+
+
+@pytest.mark.functional
+@pytest.mark.asyncio
+async def test_seed_no_siembra_si_otro_worker_tiene_el_marcador(client):
+    db = dbmod.db
+    await db.meta.update_one({"_id": seedmod.SEED_MARKER}, {"$set": {"version": 0}})
+    assert await seedmod._claim(db) is True
+    # el segundo reclamo pierde mientras el primero no venza ni termine
+    assert await seedmod.seed(db) is False
+
+    await db.meta.update_one({"_id": seedmod.SEED_MARKER}, {"$unset": {"claimedAt": ""}})
+    assert await seedmod.seed(db) is True
+    marker = await db.meta.find_one({"_id": seedmod.SEED_MARKER})
+    assert marker["version"] == seedmod.SEED_VERSION
+    assert "claimedAt" not in marker
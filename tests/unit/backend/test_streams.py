@@ -0,0 +1,261 @@
+from datetime import datetime, timezone
+
+import pytest
+from bson import ObjectId
+from httpx import ASGITransport, AsyncClient
+
+from app import streams
+from app.main import app
+from app.routers.orders import _pedido_change
+from app.routers.productos import _producto_change, productos_hub
+
+
+def _hub(**kw) -> streams.ChangeStreamHub:
+    return streams.ChangeStreamHub("productos", lambda c: c, **kw)
+
+
+def _ev(n: int) -> streams.Event:
+    return streams.Event(f"tok{n}", "producto", {"n": n})
+
+
+def _drain(sub: streams.Subscriber) -> list[streams.Event]:
+    out = []
+    while not sub.queue.empty():
+        out.append(sub.queue.get_nowait())
+    return out
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_reanuda_desde_last_event_id():
+    hub = _hub()
+    for n in range(5):
+        hub._publish(_ev(n))
+
+    sub = hub.subscribe("tok2")
+    assert [e.id for e in _drain(sub)] == ["tok3", "tok4"]
+
+    hub._publish(_ev(5))
+    assert [e.data for e in _drain(sub)] == [{"n": 5}]
+
+    # Token que ya salió del buffer (u otro worker): reset
+    otro = hub.subscribe("tok-viejo")
+    assert [e.type for e in _drain(otro)] == [streams.RESET]
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_buffer_circular_acotado():
+    hub = _hub(buffer=3)
+    for n in range(5):
+        hub._publish(_ev(n))
+    assert hub.stats()["buffered"] == 3
+    assert [e.type for e in _drain(hub.subscribe("tok0"))] == [streams.RESET]
+    assert [e.id for e in _drain(hub.subscribe("tok2"))] == ["tok3", "tok4"]
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_cliente_lento_recibe_reset():
+    hub = _hub(queue_size=3)
+    sub = hub.subscribe()
+    for n in range(4):
+        hub._publish(_ev(n))
+    assert [e.type for e in _drain(sub)] == [streams.RESET]
+    assert sub.dropped == 1
+
+    hub.unsubscribe(sub)
+    hub._publish(_ev(9))
+    assert sub.queue.empty()
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_transform_que_falla_no_corta_el_stream():
+    publicados = []
+
+    def transform(change):
+        if change.get("roto"):
+            raise KeyError("nombre")
+        return {"ok": True}
+
+    hub = streams.ChangeStreamHub("productos", transform, on_publish=publicados.append)
+    sub = hub.subscribe()
+    hub._dispatch({"_id": {"_data": "a"}, "roto": True})
+    hub._dispatch({"_id": {"_data": "b"}})
+    assert [e.id for e in _drain(sub)] == ["b"]
+    assert publicados == [{"ok": True}]
+
+
+@pytest.mark.unit
+def test_format_sse():
+    assert streams.format_sse(streams.Event("t1", "producto", {"a": 1})) == (
+        'id: t1\nevent: producto\ndata: {"a":1}\n\n'
+    )
+    assert streams.format_sse(streams.Event(None, streams.RESET, {})) == "event: reset\ndata: {}\n\n"
+
+
+def _change(op, doc=None, updated=None, removed=None):
+    oid = ObjectId()
+    change = {"_id": {"_data": "x"}, "operationType": op, "documentKey": {"_id": oid}}
+    if doc is not None:
+        change["fullDocument"] = {"_id": oid, **doc}
+    if op == "update":
+        change["updateDescription"] = {"updatedFields": updated or {}, "removedFields": removed or []}
+    return change
+
+
+_DOC = {"nombre": "Pan", "precio": 2, "stock": 5, "activo": True, "categoria": "pan", "imagenUrl": "data:image/png;base64,AA=="}
+
+
+@pytest.mark.unit
+def test_producto_change_payloads():
+    ins = _change("insert", _DOC)
+    out = _producto_change(ins)
+    pid = str(ins["documentKey"]["_id"])
+    assert out["op"] == "insert"
+    assert out["producto"]["_id"] == pid
+    assert out["producto"]["imagenUrl"] == f"/api/productos/{pid}/imagen"  # nunca el data URL
+
+    upd = _producto_change(_change("update", _DOC, updated={"stock": 5, "rating_stats.count": 3}))
+    assert upd["op"] == "update"
+    assert set(upd["set"]) == {"stock", "rating_stats"}
+
+    baja = _producto_change(_change("update", {**_DOC, "activo": False}, updated={"activo": False}))
+    assert baja["set"] == {"activo": False, "disponible": False}
+
+    # Reservas de stock sin cambio de campos públicos: no se publica
+    assert _producto_change(_change("update", _DOC, updated={"_reservas": ["t"]})) is None
+    # El doc ya no existía al hacer el lookup
+    assert _producto_change(_change("update", None, updated={"stock": 1})) is None
+
+    borrado = _change("delete")
+    assert _producto_change(borrado) == {"op": "delete", "_id": str(borrado["documentKey"]["_id"])}
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_stream_no_disponible_responde_503():
+    productos_hub.available = False
+    try:
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://t") as client:
+            r = await client.get("/api/productos/stream")
+        assert r.status_code == 503
+    finally:
+        productos_hub.available = True
+
+
+class _Request:
+    """Lo único que usa sse_response: is_disconnected()."""
+
+    def __init__(self, turnos: int):
+        self.turnos = turnos
+
+    async def is_disconnected(self) -> bool:
+        self.turnos -= 1
+        return self.turnos < 0
+
+
+async def _leer(response) -> list[str]:
+    return [chunk async for chunk in response.body_iterator]
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_sse_snapshot_al_conectar_y_en_reset():
+    hub = _hub()
+    hub._publish(_ev(1))
+    snaps = []
+
+    async def snapshot():
+        snaps.append(1)
+        return streams.Event(None, "snapshot", [len(snaps)])
+
+    # Sin Last-Event-ID: primero el snapshot, luego los cambios
+    resp = streams.sse_response(_Request(1), hub, None, snapshot=snapshot)
+    hub._publish(_ev(2))
+    chunks = await _leer(resp)
+    assert chunks[0].startswith("retry:")
+    assert chunks[1] == "event: snapshot\ndata: [1]\n\n"
+    assert chunks[2].startswith("id: tok2\nevent: producto")
+
+    # Token conocido: se reanuda sin snapshot
+    chunks = await _leer(streams.sse_response(_Request(1), hub, "tok1", snapshot=snapshot))
+    assert [c.split("\n")[0] for c in chunks[1:]] == ["id: tok2"]
+    assert len(snaps) == 1
+
+    # Cliente lento: el reset se convierte en un snapshot nuevo
+    hub.queue_size = 1
+    resp = streams.sse_response(_Request(1), hub, "tok2", snapshot=snapshot)
+    hub._publish(_ev(3))
+    hub._publish(_ev(4))
+    chunks = await _leer(resp)
+    assert chunks[1] == "event: snapshot\ndata: [2]\n\n"
+    assert hub.stats()["subscribers"] == 0
+
+
+@pytest.mark.unit
+def test_pedido_change_payloads():
+    doc = {"code": "SR-20260101-000001", "total": 12.5, "status": "CREATED",
+           "createdAt": datetime(2026, 1, 1, tzinfo=timezone.utc)}
+    alta = _pedido_change(_change("insert", doc))
+    assert alta["op"] == "upsert"
+    assert alta["pedido"]["code"] == doc["code"]
+    assert alta["pedido"]["creadoAt"] == doc["createdAt"]
+
+    pagado = _pedido_change(_change("update", {**doc, "status": "PAID"}, updated={"status": "PAID", "estado": "PAID"}))
+    assert pagado["pedido"]["status"] == "PAID"
+
+    assert _pedido_change(_change("update", doc, updated={"notas": "x"})) is None
+    # Pedidos legacy aún sin migrar (sin createdAt) no están en el tablero
+    assert _pedido_change(_change("insert", {"total": 1, "creadoAt": doc["createdAt"]})) is None
+    assert _pedido_change(_change("delete"))["op"] == "delete"
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_tablero_exige_ticket():
+    from app.routers.auth import create_access_token
+
+    jwt = create_access_token({"sub": str(ObjectId()), "rol": "admin"})
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://t") as client:
+        r = await client.get("/api/admin/orders/stream")
+        assert r.status_code == 401
+        # El JWT en la query ya no abre el stream: sólo un ticket
+        r = await client.get("/api/admin/orders/stream", params={"token": jwt})
+        assert r.status_code == 401
+
+
+@pytest.mark.functional
+@pytest.mark.asyncio
+async def test_ticket_de_stream_un_solo_uso(client):
+    from app import database
+
+    await client.post("/api/auth/register", json={
+        "email": "admin_stream@example.com", "password": "demo123", "nombre": "Admin",
+    })
+    await database.db.clientes.update_one({"email": "admin_stream@example.com"}, {"$set": {"rol": "admin"}})
+    r = await client.post("/api/auth/login", json={"email": "admin_stream@example.com", "password": "demo123"})
+    headers = {"Authorization": f"Bearer {r.json()['access_token']}"}
+
+    r = await client.post("/api/admin/orders/stream-ticket", headers=headers)
+    assert r.status_code == 200 and r.json()["expires_in"] > 0
+    ticket = r.json()["ticket"]
+
+    user_id = await streams.redeem_ticket(ticket, "admin:orders:stream")
+    assert user_id is not None
+    assert await streams.redeem_ticket(ticket, "admin:orders:stream") is None  # ya canjeado
+    r = await client.get("/api/admin/orders/stream", params={"ticket": ticket})
+    assert r.status_code == 401
+
+
+@pytest.mark.unit
+def test_valoraciones_no_vacian_el_catalogo():
+    from app.cache import catalog_cache
+    from app.routers.productos import _invalidate_catalog
+
+    catalog_cache.set("k", "v")
+    _invalidate_catalog({"op": "update", "_id": "x", "set": {"rating_stats": {"count": 3}}})
+    assert catalog_cache.get("k") == "v"
+    _invalidate_catalog({"op": "update", "_id": "x", "set": {"stock": 4, "rating_stats": {}}})
+    assert catalog_cache.get("k") is None